@@ -0,0 +1,183 @@
+from __future__ import annotations
+import random
+from bisect import bisect_right
+from typing import Dict, List
+
+Manifest = Dict[str, List[str]]
+VersionedManifest = Dict[str, Dict[str, List[str]]]
+
+
+def _name(i: int) -> str:
+    return f"pkg{i}"
+
+
+def chain(length: int) -> Manifest:
+    """
+    Generates a single chain ``pkg0 -> pkg1 -> ... -> pkg{length}``.
+
+    Args:
+        length (int): Number of edges.
+
+    Returns:
+        Manifest: The manifest.
+    """
+    deps = {_name(i): [_name(i + 1)] for i in range(length)}
+    deps[_name(length)] = []
+    return deps
+
+
+def fan_out(width: int) -> Manifest:
+    """
+    Generates one root that depends directly on ``width`` leaves.
+
+    Args:
+        width (int): Number of leaves.
+
+    Returns:
+        Manifest: The manifest.
+    """
+    leaves = [_name(i) for i in range(1, width + 1)]
+    deps = {_name(0): leaves}
+    deps.update((leaf, []) for leaf in leaves)
+    return deps
+
+
+def diamonds(depth: int) -> Manifest:
+    """
+    Generates a stack of ``depth`` diamonds sharing their tips.
+
+    The number of paths from the root doubles with every diamond, while the
+    number of packages only grows linearly.
+
+    Args:
+        depth (int): Number of stacked diamonds.
+
+    Returns:
+        Manifest: The manifest.
+    """
+    deps: Manifest = {}
+    for level in range(depth):
+        top, bottom = f"tip{level}", f"tip{level + 1}"
+        left, right = f"left{level}", f"right{level}"
+        deps[top] = [left, right]
+        deps[left] = [bottom]
+        deps[right] = [bottom]
+    deps[f"tip{depth}"] = []
+    return deps
+
+
+def random_dag(size: int, degree: int = 3, seed: int = 0) -> Manifest:
+    """
+    Generates a random acyclic graph with uniformly chosen dependencies.
+
+    Package ``i`` depends on up to ``degree`` packages with a higher index,
+    so the graph never contains a cycle.
+
+    Args:
+        size (int): Number of packages.
+        degree (int): Number of dependencies of every package.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        Manifest: The manifest.
+    """
+    rng = random.Random(seed)
+    deps: Manifest = {}
+    for i in range(size):
+        later = size - i - 1
+        picks = rng.sample(range(i + 1, size), min(degree, later))
+        deps[_name(i)] = [_name(j) for j in picks]
+    return deps
+
+
+def power_law(
+    size: int, degree: int = 3, exponent: float = 1.2, seed: int = 0
+) -> Manifest:
+    """
+    Generates a graph shaped like a real package ecosystem.
+
+    A few core packages are depended upon by almost everything, while most
+    packages have no dependents at all. The number of dependencies of every
+    package is drawn around ``degree``, and the dependencies are chosen with
+    a probability that falls off with the package rank as a power law.
+    Packages only depend on packages of a lower rank, so the graph is
+    acyclic.
+
+    Args:
+        size (int): Number of packages.
+        degree (int): Average number of dependencies of every package.
+        exponent (float): Exponent of the popularity distribution.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        Manifest: The manifest.
+    """
+    rng = random.Random(seed)
+    cumulative: List[float] = []
+    total = 0.0
+    for rank in range(size):
+        total += (rank + 1) ** -exponent
+        cumulative.append(total)
+    deps: Manifest = {}
+    for i in range(size):
+        count = min(i, rng.randint(0, 2 * degree))
+        # Dict keys keep the draw order and drop repeated picks.
+        picks: Dict[int, None] = {}
+        while len(picks) < count:
+            picks[bisect_right(cumulative, rng.random() * cumulative[i - 1])] = None
+        deps[_name(i)] = [_name(j) for j in picks]
+    return deps
+
+
+def version_space(
+    size: int,
+    versions: int = 20,
+    degree: int = 3,
+    conflict: float = 0.3,
+    seed: int = 0,
+) -> VersionedManifest:
+    """
+    Generates a versioned manifest with many overlapping version ranges.
+
+    Every package has ``versions`` releases ``1.0`` to ``{versions}.0``, and
+    every release depends on version ranges of up to ``degree`` packages with
+    a higher index. One release of every package is picked in advance, and
+    its ranges always contain the picked releases of its dependencies, so a
+    solution exists. The ranges of the other releases miss the picked
+    releases with probability ``conflict``, so newer releases often lead
+    into conflicts that only show several levels further down.
+
+    Args:
+        size (int): Number of packages.
+        versions (int): Number of releases of every package.
+        degree (int): Number of dependencies of every release.
+        conflict (float): Probability that a range misses the picked
+            release of its package.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        VersionedManifest: The manifest.
+    """
+    rng = random.Random(seed)
+    picked = [rng.randint(1, versions) for _ in range(size)]
+    manifest: VersionedManifest = {}
+    for i in range(size):
+        releases: Dict[str, List[str]] = {}
+        later = size - i - 1
+        for version in range(1, versions + 1):
+            requires = []
+            for j in rng.sample(range(i + 1, size), min(degree, later)):
+                target = picked[j]
+                if version != picked[i] and rng.random() < conflict:
+                    # A range that excludes the picked release.
+                    if target > 1 and (target == versions or rng.random() < 0.5):
+                        low, high = rng.randint(1, target - 1), target
+                    else:
+                        low, high = target + 1, rng.randint(target + 2, versions + 2)
+                else:
+                    low = rng.randint(1, target)
+                    high = rng.randint(target + 1, versions + 2)
+                requires.append(f"{_name(j)}>={low},<{high}")
+            releases[f"{version}.0"] = requires
+        manifest[_name(i)] = releases
+    return manifest
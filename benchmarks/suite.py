@@ -0,0 +1,312 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from dep_resolver.cli import run
+from dep_resolver.diff import diff_graphs
+from dep_resolver.graph import CompactGraph
+from dep_resolver.printer import print_dependency_graph
+from dep_resolver.resolver import resolve_dependencies
+from dep_resolver.versions import parse_versioned_manifest, solve
+
+from . import generators
+from .generators import Manifest, VersionedManifest
+
+Results = Dict[str, Dict[str, float]]
+
+#: Default relative slowdown or memory growth reported as a regression.
+DEFAULT_THRESHOLD = 0.25
+
+
+class Benchmark(NamedTuple):
+    """
+    A single measured operation.
+
+    Attributes:
+        name (str): Unique name, ``<operation>/<graph>``.
+        setup (Callable[[], Any]): Prepares the input; not measured.
+        func (Callable[[Any], Any]): The measured operation.
+    """
+
+    name: str
+    setup: Callable[[], Any]
+    func: Callable[[Any], Any]
+
+
+def build_suite(scale: float = 1.0) -> List[Benchmark]:
+    """
+    Builds the benchmarks for the resolver, the version solver, the graph
+    diff, the printer and the CLI.
+
+    Graph sizes are chosen so the printed trees stay bounded: shapes whose
+    number of paths explodes are printed in dedupe mode.
+
+    Args:
+        scale (float): Factor applied to every graph size.
+
+    Returns:
+        List[Benchmark]: The benchmarks.
+    """
+
+    def size(n: int) -> int:
+        return max(1, int(n * scale))
+
+    graphs: Dict[str, Callable[[], Manifest]] = {
+        "chain-100k": lambda: generators.chain(size(100_000)),
+        "fan-out-100k": lambda: generators.fan_out(size(100_000)),
+        "diamonds-10k": lambda: generators.diamonds(size(10_000)),
+        "random-dag-50k": lambda: generators.random_dag(size(50_000)),
+        "power-law-50k": lambda: generators.power_law(size(50_000)),
+    }
+    suite = [
+        Benchmark(f"resolve/{name}", make, resolve_dependencies)
+        for name, make in graphs.items()
+    ]
+
+    printed: Dict[str, Callable[[], Manifest]] = {
+        "chain-1k": lambda: generators.chain(size(1_000)),
+        "fan-out-100k": graphs["fan-out-100k"],
+        "diamonds-16": lambda: generators.diamonds(16),
+    }
+    for name, make in printed.items():
+        suite.append(Benchmark(f"print/{name}", _resolved(make), _print()))
+    for name in ("random-dag-50k", "power-law-50k"):
+        suite.append(
+            Benchmark(
+                f"print-dedupe/{name}", _resolved(graphs[name]), _print(dedupe=True)
+            )
+        )
+
+    versioned: Dict[str, Callable[[], VersionedManifest]] = {
+        "versions-1k": lambda: generators.version_space(size(1_000)),
+        "wide-versions-1k": lambda: generators.version_space(
+            size(1_000), versions=100, conflict=0.5
+        ),
+        "conflicts-2k": lambda: generators.version_space(
+            size(2_000), versions=30, conflict=0.5
+        ),
+    }
+    for name, make_versioned in versioned.items():
+        suite.append(Benchmark(f"solve/{name}", _parsed(make_versioned), solve))
+
+    for name in ("random-dag-50k", "power-law-50k"):
+        suite.append(Benchmark(f"diff/{name}", _edited(graphs[name]), _diff))
+
+    suite.append(Benchmark("cli/chain-1k", _manifest(printed["chain-1k"]), _cli()))
+    suite.append(
+        Benchmark(
+            "cli-dedupe/power-law-50k",
+            _manifest(graphs["power-law-50k"]),
+            _cli("--dedupe"),
+        )
+    )
+    suite.append(
+        Benchmark(
+            "cli-order/versions-1k",
+            _manifest(versioned["versions-1k"]),
+            _cli("--order"),
+        )
+    )
+    return suite
+
+
+def _parsed(make: Callable[[], VersionedManifest]) -> Callable[[], Any]:
+    return lambda: parse_versioned_manifest(make())
+
+
+def _edited(make: Callable[[], Manifest]) -> Callable[[], Any]:
+    def setup() -> Any:
+        # Drops the last dependency of one package in the middle of the graph.
+        manifest = make()
+        new = dict(manifest)
+        pkg = list(manifest)[len(manifest) // 2]
+        new[pkg] = manifest[pkg][:-1]
+        return CompactGraph.from_mapping(manifest), CompactGraph.from_mapping(new)
+
+    return setup
+
+
+def _diff(graphs: Any) -> None:
+    diff_graphs(*graphs)
+
+
+def _resolved(make: Callable[[], Manifest]) -> Callable[[], Any]:
+    return lambda: resolve_dependencies(make())
+
+
+def _print(dedupe: bool = False) -> Callable[[Any], None]:
+    def func(resolved: Any) -> None:
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            print_dependency_graph(resolved, dedupe=dedupe, stream=devnull)
+
+    return func
+
+
+def _manifest(
+    make: Callable[[], Union[Manifest, VersionedManifest]],
+) -> Callable[[], str]:
+    def setup() -> str:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(make(), f)
+        return path
+
+    return setup
+
+
+def _cli(*options: str) -> Callable[[str], None]:
+    def func(path: str) -> None:
+        argv = sys.argv
+        sys.argv = ["dep_resolver", path, *options]
+        try:
+            with open(os.devnull, "w", encoding="utf-8") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    if run() != 0:
+                        raise RuntimeError(f"The CLI failed on {path}")
+        finally:
+            sys.argv = argv
+            os.unlink(path)
+
+    return func
+
+
+def measure(
+    benchmark: Benchmark, repeat: int = 3, memory: bool = True
+) -> Dict[str, float]:
+    """
+    Times a benchmark and measures its peak memory.
+
+    The time is the best of ``repeat`` runs. Peak memory is measured in a
+    separate run with tracemalloc, which would otherwise slow the timed runs
+    down.
+
+    Args:
+        benchmark (Benchmark): The benchmark.
+        repeat (int): Number of timed runs.
+        memory (bool): Also measure the peak memory.
+
+    Returns:
+        Dict[str, float]: ``seconds`` and, if measured, ``peak_bytes``.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        arg = benchmark.setup()
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.func(arg)
+        best = min(best, time.perf_counter() - start)
+        del arg
+    result = {"seconds": best}
+    if memory:
+        arg = benchmark.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            benchmark.func(arg)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def compare(results: Results, baseline: Results, threshold: float) -> List[str]:
+    """
+    Finds the measurements that regressed against a baseline.
+
+    Benchmarks or measurements missing from either side are skipped.
+
+    Args:
+        results (Results): The new measurements by benchmark name.
+        baseline (Results): The stored measurements by benchmark name.
+        threshold (float): Allowed relative growth, e.g. 0.25 for 25%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if old and value > old * (1 + threshold):
+                regressions.append(
+                    f"{name} {metric}: {old:.6g} -> {value:.6g} "
+                    f"(+{(value / old - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Dependency Resolver benchmarks")
+    parser.add_argument(
+        "--filter", default="", help="Only run benchmarks whose name matches"
+    )
+    parser.add_argument(
+        "--repeat", default=3, type=int, help="Number of timed runs per benchmark"
+    )
+    parser.add_argument(
+        "--scale", default=1.0, type=float, help="Factor applied to all graph sizes"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip peak memory measurements"
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this results file")
+    parser.add_argument(
+        "--threshold",
+        default=DEFAULT_THRESHOLD,
+        type=float,
+        help="Allowed relative regression against the baseline",
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"The baseline was measured with --scale {baseline.get('scale')}")
+            return 2
+
+    pattern = re.compile(args.filter)
+    results: Results = {}
+    for benchmark in build_suite(args.scale):
+        if not pattern.search(benchmark.name):
+            continue
+        result = measure(benchmark, args.repeat, not args.no_memory)
+        results[benchmark.name] = result
+        line = f"{benchmark.name:32} {result['seconds']:10.4f} s"
+        if "peak_bytes" in result:
+            line += f" {result['peak_bytes'] / (1024 * 1024):10.1f} MiB"
+        print(line, flush=True)
+
+    if args.output:
+        document = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "benchmarks": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline["benchmarks"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 0
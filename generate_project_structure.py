@@ -1,6 +1,27 @@
 import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 import pathspec
 
+START_MARKER = "<!-- PROJECT STRUCTURE START -->"
+END_MARKER = "<!-- PROJECT STRUCTURE END -->"
+
+# Ignored in addition to the patterns of .gitignore
+EXTRA_IGNORE_PATTERNS = [
+    "_static",
+    "_templates",
+    "__pycache__",
+    "htmlcov",
+    "dep_resolver.egg-info",
+    "venv",
+    "build",
+]
+
+# Directories listed in the tree without their contents
+COLLAPSED_DIRECTORIES = {"test_data"}
+
 
 def load_gitignore(gitignore_path=".gitignore", allowed_entries=None):
     """Load ignore patterns from .gitignore file if it exists, and add exceptions."""
@@ -16,126 +37,108 @@ def load_gitignore(gitignore_path=".gitignore", allowed_entries=None):
     return patterns
 
 
-def generate_tree(start_path=".", ignore_patterns_list=None):
-    """Generate directory tree, ignoring files and directories based on patterns."""
-    tree = []
-    if ignore_patterns_list is None:
-        ignore_patterns_list = []
-
-    # Append extra ignore patterns
-    extra_ignore_patterns = [
-        "_static",
-        "_templates",
-        "__pycache__",
-        "htmlcov",
-        "dep_resolver.egg-info",
-        "venv",
-        "build",
-    ]
-    ignore_patterns_list.extend(extra_ignore_patterns)
+def iter_tree(start_path=".", ignore_patterns_list=None, allowed_entries=(), jobs=None):
+    """Yield the lines of the directory tree, ignoring entries based on patterns.
 
+    Directories are scanned concurrently in a thread pool: every scan starts
+    the scans of its subdirectories right away, while the lines are yielded in
+    sorted order as soon as the directories they describe have been read.
+    """
+    patterns = list(ignore_patterns_list or []) + EXTRA_IGNORE_PATTERNS
     # Create pathspec object for matching ignore patterns using 'gitignore' syntax
-    ignore_spec = pathspec.PathSpec.from_lines("gitignore", ignore_patterns_list)
-
-    root_dir_name = os.path.basename(os.path.abspath(start_path))
-    tree.append(root_dir_name + "/")
-
-    def inner(dir_path, prefix=""):
-        try:
-            contents = os.listdir(dir_path)
-        except PermissionError:
-            return
-
-        # Exclude hidden files and directories unless they are allowed entries
-        contents = [
-            entry
-            for entry in contents
-            if not entry.startswith(".") or entry in allowed_entries
-        ]
-
-        # Separate directories and files
-        dirs = [d for d in contents if os.path.isdir(os.path.join(dir_path, d))]
-        files = [f for f in contents if os.path.isfile(os.path.join(dir_path, f))]
-
-        # Prepare relative paths for matching
-        rel_paths_dirs = [
-            os.path.relpath(os.path.join(dir_path, d), start_path) + "/" for d in dirs
-        ]
-        rel_paths_files = [
-            os.path.relpath(os.path.join(dir_path, f), start_path) for f in files
-        ]
-
-        # Normalize file paths
-        rel_paths_dirs = [os.path.normpath(path) for path in rel_paths_dirs]
-        rel_paths_files = [os.path.normpath(path) for path in rel_paths_files]
-
-        # Filter out ignored directories
-        dirs = [
-            d
-            for d, rel_path in zip(dirs, rel_paths_dirs)
-            if not ignore_spec.match_file(rel_path)
-        ]
-
-        # Filter out ignored files
-        files = [
-            f
-            for f, rel_path in zip(files, rel_paths_files)
-            if not ignore_spec.match_file(rel_path)
-        ]
-
-        # Sort directories and files alphabetically
-        dirs.sort()
-        files.sort()
-
-        # Prepare pointers
-        entries = dirs + files
-        if entries:
-            pointers = ["├── "] * (len(entries) - 1) + ["└── "]
-        else:
-            pointers = []
-
-        # Process directories
-        for i, directory in enumerate(dirs):
-            path = os.path.join(dir_path, directory)
-
-            # Skip contents of 'test_data/', but include the directory itself
-            if directory == "test_data":
-                tree.append(prefix + pointers[i] + directory + "/")
-                continue
-
-            tree.append(prefix + pointers[i] + directory + "/")
-            extension = "│   " if pointers[i] == "├── " else "    "
-            inner(path, prefix + extension)
-
-        # Process files
-        for i, filename in enumerate(files):
-            idx = len(dirs) + i
-            tree.append(prefix + pointers[idx] + filename)
-
-    inner(start_path)
-    return "\n".join(tree)
-
-
-def update_readme(tree_str):
-    """Update the README.md file with the generated directory tree."""
-    with open("README.md", "r") as f:
-        content = f.read()
+    ignore_spec = pathspec.PathSpec.from_lines("gitignore", patterns)
+    allowed_entries = frozenset(allowed_entries)
+
+    with ThreadPoolExecutor(jobs) as executor:
+
+        def scan(dir_path, rel_path):
+            """List the sorted subdirectories and files of a directory.
+
+            Returns (dirs, files, children), where children holds the pending
+            scans of the subdirectories that are expanded in the tree.
+            """
+            dirs = []
+            files = []
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        # Exclude hidden entries unless they are allowed entries
+                        if name.startswith(".") and name not in allowed_entries:
+                            continue
+                        # The entry type is cached by scandir on most platforms
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            continue
+                        if is_dir:
+                            # Ignored directories are pruned before descending
+                            if not ignore_spec.match_file(rel_path + name + "/"):
+                                dirs.append(name)
+                        elif entry.is_file():
+                            if not ignore_spec.match_file(rel_path + name):
+                                files.append(name)
+            except PermissionError:
+                pass
+            dirs.sort()
+            files.sort()
+            children = [
+                None
+                if name in COLLAPSED_DIRECTORIES
+                else executor.submit(
+                    scan, os.path.join(dir_path, name), rel_path + name + "/"
+                )
+                for name in dirs
+            ]
+            return dirs, files, children
+
+        def walk(listing, prefix):
+            dirs, files, children = listing.result()
+            last = len(dirs) + len(files) - 1
+            for i, (directory, child) in enumerate(zip(dirs, children)):
+                yield prefix + ("└── " if i == last else "├── ") + directory + "/"
+                if child is not None:
+                    extension = "    " if i == last else "│   "
+                    yield from walk(child, prefix + extension)
+            for i, filename in enumerate(files, len(dirs)):
+                yield prefix + ("└── " if i == last else "├── ") + filename
+
+        yield os.path.basename(os.path.abspath(start_path)) + "/"
+        yield from walk(executor.submit(scan, start_path, ""), "")
+
+
+def generate_tree(start_path=".", ignore_patterns_list=None, allowed_entries=()):
+    """Generate directory tree, ignoring files and directories based on patterns."""
+    return "\n".join(iter_tree(start_path, ignore_patterns_list, allowed_entries))
 
-    start_marker = "<!-- PROJECT STRUCTURE START -->"
-    end_marker = "<!-- PROJECT STRUCTURE END -->"
 
-    new_content = (
-        content.split(start_marker)[0]
-        + start_marker
-        + "\n\n```plaintext\n"
-        + tree_str
-        + "\n```\n\n"
-        + end_marker
-        + content.split(end_marker)[1]
-    )
+def update_readme(tree_lines, readme_path="README.md"):
+    """Update the README.md file with the generated directory tree.
 
-    with open("README.md", "w") as f:
-        f.write(new_content)
+    The tree is streamed line by line into a temporary file, which then
+    replaces the README, so an interrupted run leaves it untouched.
+    """
+    if isinstance(tree_lines, str):
+        tree_lines = tree_lines.splitlines()
+    with open(readme_path, "r") as f:
+        content = f.read()
+    head = content.split(START_MARKER)[0]
+    tail = content.split(END_MARKER)[1]
+
+    # A hidden name keeps the temporary file out of the tree being written
+    directory, name = os.path.split(os.path.abspath(readme_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with open(fd, "w") as f:
+            f.write(head + START_MARKER + "\n\n```plaintext\n")
+            for line in tree_lines:
+                f.write(line + "\n")
+            f.write("```\n\n" + END_MARKER + tail)
+        shutil.copymode(readme_path, tmp_path)
+        os.replace(tmp_path, readme_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 if __name__ == "__main__":
@@ -143,7 +146,5 @@ if __name__ == "__main__":
     allowed_entries = [".gitignore", ".github", ".pre-commit-config.yaml"]
     # Load .gitignore patterns with exceptions
     ignore_patterns_list = load_gitignore(allowed_entries=allowed_entries)
-    # Generate the directory tree
-    tree = generate_tree(".", ignore_patterns_list)
-    # Update README.md with the tree structure
-    update_readme(tree)
+    # Stream the directory tree into README.md
+    update_readme(iter_tree(".", ignore_patterns_list, allowed_entries))
@@ -71,7 +71,7 @@ setup(
     python_requires=">=3.8",
     entry_points={
         "console_scripts": [
-            "dep-resolver=dep_resolver.cli:run",
+            "dep-resolver=dep_resolver.cli:main",
         ],
     },
 )
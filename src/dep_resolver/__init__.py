@@ -1,4 +1,44 @@
-from .resolver import resolve_dependencies
-from .printer import print_dependency_graph
+from __future__ import annotations
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
 
-__all__ = ["resolve_dependencies", "print_dependency_graph"]
+if TYPE_CHECKING:
+    from .graph import CompactGraph
+    from .resolver import CircularDependencyError, resolve_dependencies
+    from .lazy import LazyDependencyGraph
+    from .printer import print_dependency_graph
+    from .query import QueryIndex
+
+__all__ = [
+    "CompactGraph",
+    "CircularDependencyError",
+    "resolve_dependencies",
+    "LazyDependencyGraph",
+    "print_dependency_graph",
+    "QueryIndex",
+]
+
+# Submodule defining every public name. They are imported on first access,
+# so that importing a single submodule, e.g. for the command line, does not
+# load the whole package.
+_EXPORTS = {
+    "CompactGraph": ".graph",
+    "CircularDependencyError": ".resolver",
+    "resolve_dependencies": ".resolver",
+    "LazyDependencyGraph": ".lazy",
+    "print_dependency_graph": ".printer",
+    "QueryIndex": ".query",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *__all__])
@@ -1,5 +1,5 @@
 import sys
-from dep_resolver.cli import run
+from dep_resolver.cli import main
 
 if __name__ == "__main__":
-    sys.exit(run())
+    sys.exit(main())
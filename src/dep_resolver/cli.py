@@ -1,61 +1,897 @@
+from __future__ import annotations
 import argparse
-import json
-import logging
-from pathlib import Path
-from dep_resolver.resolver import resolve_dependencies
-from dep_resolver.printer import print_dependency_graph
+import contextlib
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
+# Everything else is imported by the functions that use it, so that printing
+# the help or running a small subcommand such as "client" loads only what it
+# needs. tests/test_cli.py holds the import time of --help to a budget.
+if TYPE_CHECKING:
+    import logging
+    from pathlib import Path
+    from dep_resolver.cycles import CycleGroup
+    from dep_resolver.estimate import TreeSize
+    from dep_resolver.graph import CompactGraph
+    from dep_resolver.loader import MergedManifest
+    from dep_resolver.resolver import CircularDependencyError
+    from dep_resolver.snapshot import Snapshot
+    from dep_resolver.stats import Stats
+    from dep_resolver.versions import VersionedManifest
 
-def run() -> int:
-    parser = argparse.ArgumentParser(description="Dependency Resolver")
-    parser.add_argument("json_file", type=Path, help="Path to the JSON file")
+# Choices of the parser, spelled out so that building it does not import the
+# modules defining them; the tests check that they stay in sync.
+_TREE_FORMATS = ("text", "json")
+_GRAPH_FORMATS = ("ndjson", "dot")
+_CONFLICT_POLICIES = ("error", "first", "last", "union")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Dependency Resolver",
+        epilog="Run 'dep_resolver compile --help' to precompile a manifest into "
+        "a binary snapshot for faster startup, 'dep_resolver serve --help' "
+        "to keep it loaded in a server process, and 'dep_resolver diff --help' "
+        "to compare two manifests.",
+    )
     parser.add_argument(
-        "--log-level",
-        type=str,
-        default="WARNING",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-        help="Set the logging level",
+        "json_files",
+        nargs="+",
+        metavar="JSON_FILE",
+        help="Path to the JSON file; several files, glob patterns or directories "
+        "of *.json files are merged into one graph",
+    )
+    _add_log_level(parser)
+    parser.add_argument(
+        "--on-conflict",
+        default="error",
+        choices=_CONFLICT_POLICIES,
+        help="What to do when several JSON files define the same package: exit "
+        "with an error, keep the first or the last definition, or merge the "
+        "dependencies (default: error)",
+    )
+    parser.add_argument(
+        "--load-jobs",
+        type=int,
+        metavar="N",
+        help="Read several JSON files in N threads (default: one per file, at "
+        "most 32)",
     )
     parser.add_argument(
         "--indent-size", default=4, type=int, help="Set the indentation size for output"
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--format",
+        default="text",
+        choices=[*_TREE_FORMATS, *_GRAPH_FORMATS],
+        help="Output format: the indented text tree, nested JSON, or one line "
+        "per dependency as NDJSON or Graphviz DOT",
+    )
+    parser.add_argument(
+        "--collapse-cycles",
+        action="store_true",
+        help="Resolve the graph anyway, collapsing circular dependencies into "
+        "marked nodes",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Expand every package only once and mark later appearances as deduped",
+    )
+    parser.add_argument(
+        "--root",
+        action="append",
+        metavar="PKG",
+        help="Resolve and print only the tree of PKG (repeatable)",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=_depth,
+        metavar="N",
+        help="Resolve at most N levels of dependencies below every package "
+        "printed at the top level",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Print the number of nodes and lines of the dependency tree "
+        "instead of the tree",
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=_depth,
+        metavar="N",
+        help="Do not print dependency trees of more than N nodes (see --overflow)",
+    )
+    parser.add_argument(
+        "--overflow",
+        default="fail",
+        choices=["fail", "dedupe"],
+        help="What to do with trees over --max-nodes: exit with an error, or "
+        "print them in --dedupe mode (default: fail)",
+    )
+    parser.add_argument(
+        "--order",
+        action="store_true",
+        help="Print the topological install order in parallel layers instead of "
+        "the dependency tree",
+    )
+    parser.add_argument(
+        "--why",
+        metavar="PKG",
+        help="Print a shortest dependency path to PKG from every top-level package "
+        "that needs it",
+    )
+    parser.add_argument(
+        "--rdeps",
+        metavar="PKG",
+        help="Print every package that directly or transitively depends on PKG",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        metavar="N",
+        help="Experimental: resolve independent parts of large graphs in up to "
+        "N worker processes, one per available CPU at most (0 uses every CPU)",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=_path,
+        help="Load the graph from this snapshot instead of parsing the JSON file "
+        "while the file is unchanged (default: JSON_FILE.snap if it exists)",
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        help="Print counters, peak memory and the time of every phase to stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        type=_path,
+        help="Write cProfile statistics of the run to this file",
+    )
+    return parser
 
-    # Set up logging
-    numeric_level = getattr(logging, args.log_level.upper(), None)
-    logging.basicConfig(level=numeric_level, format="%(levelname)s:%(message)s")
-    logger = logging.getLogger(__name__)
 
+def build_compile_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="dep_resolver compile",
+        description="Precompile a JSON file into a binary snapshot",
+    )
+    parser.add_argument("json_file", type=_path, help="Path to the JSON file")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=_path,
+        help="Path of the snapshot (default: JSON_FILE.snap)",
+    )
+    parser.add_argument(
+        "--no-order",
+        action="store_true",
+        help="Do not precompute the install order",
+    )
+    _add_log_level(parser)
+    return parser
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    from dep_resolver.server import DEFAULT_POLL_INTERVAL
+
+    parser = argparse.ArgumentParser(
+        prog="dep_resolver serve",
+        description="Keep a JSON file loaded and answer JSON-RPC requests on a "
+        "Unix socket, or on stdin and stdout",
+    )
+    parser.add_argument("json_file", type=_path, help="Path to the JSON file")
+    parser.add_argument(
+        "--socket",
+        type=_path,
+        help="Listen on this Unix socket instead of reading stdin",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        default=DEFAULT_POLL_INTERVAL,
+        type=float,
+        metavar="SECONDS",
+        help="How often to check the JSON file for changes",
+    )
+    _add_log_level(parser)
+    return parser
+
+
+def build_client_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="dep_resolver client",
+        description="Send a request to a running 'dep_resolver serve --socket'",
+    )
+    parser.add_argument("--socket", type=_path, required=True, help="Server socket")
+    parser.add_argument(
+        "method",
+        help="resolve, estimate, order, why, rdeps or closure",
+    )
+    parser.add_argument(
+        "params",
+        nargs="*",
+        metavar="NAME=VALUE",
+        help="Request parameters, e.g. roots='[\"pkg1\"]' or package=pkg1; "
+        "values that are not valid JSON are sent as strings",
+    )
+    parser.add_argument(
+        "--timeout",
+        default=None,
+        type=float,
+        help="Seconds to wait for the server",
+    )
+    _add_log_level(parser)
+    return parser
+
+
+def build_diff_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="dep_resolver diff",
+        description="Compare the dependency graphs of two JSON files. Exits with "
+        "0 if they are the same, 1 if they differ and 2 on errors",
+    )
+    parser.add_argument("old_file", type=_path, help="Path to the old JSON file")
+    parser.add_argument("new_file", type=_path, help="Path to the new JSON file")
+    parser.add_argument(
+        "--format",
+        choices=("text", "json"),
+        default="text",
+        help="Output format",
+    )
+    _add_log_level(parser)
+    return parser
+
+
+def main() -> int:
+    exit_code = run()
+    try:
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away early (e.g. `head`). Point stdout at the null
+        # device so the interpreter does not report the broken pipe again
+        # when it flushes the stream at exit.
+        import os
+
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+        exit_code = 1
+    return exit_code
+
+
+def run(argv: Optional[Sequence[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in _COMMANDS:
+        return _COMMANDS[argv[0]](list(argv[1:]))
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _check_options(parser, args)
+    logger = _setup_logging(args.log_level)
+
+    stats = None
+    if args.stats:
+        from dep_resolver.stats import Stats
+
+        stats = Stats()
+    profiler = None
+    if args.profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        exit_code = _run(args, logger, stats)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            try:
+                profiler.dump_stats(args.profile)
+            except OSError as e:
+                logger.error(f"Could not write the profile: {e}")
+    if stats is not None:
+        if args.stats == "json":
+            import json
+
+            sys.stderr.write(json.dumps(stats.as_dict(), indent=2) + "\n")
+        else:
+            sys.stderr.write(stats.format())
+    return exit_code
+
+
+def _run_compile(argv: List[str]) -> int:
+    import json
+    from dep_resolver.snapshot import compile_snapshot
+
+    args = build_compile_parser().parse_args(argv)
+    logger = _setup_logging(args.log_level)
     json_file = args.json_file
     if not json_file.is_file():
         logger.error(f"File not found: {json_file}")
         return 1
+    try:
+        path = compile_snapshot(json_file, args.output, order=not args.no_order)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON file: {e}")
+        return 1
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while compiling the snapshot: {e}")
+        return 1
+    logger.info(f"Wrote snapshot: {path}")
+    return 0
+
+
+def _run_serve(argv: List[str]) -> int:
+    import asyncio
+    from dep_resolver.server import ResolverService, serve_stdio, serve_unix
+
+    args = build_serve_parser().parse_args(argv)
+    logger = _setup_logging(args.log_level)
+    if not args.json_file.is_file():
+        logger.error(f"File not found: {args.json_file}")
+        return 1
+    service = ResolverService(args.json_file)
+    if args.socket is not None:
+        server = serve_unix(service, args.socket, args.poll_interval)
+    else:
+        server = serve_stdio(service, args.poll_interval)
+    try:
+        asyncio.run(server)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        logger.error(f"Could not serve requests: {e}")
+        return 1
+    return 0
+
+
+def _run_client(argv: List[str]) -> int:
+    import json
+    from dep_resolver.client import Client, ClientError
+    from dep_resolver.output import write_chunks
 
+    parser = build_client_parser()
+    args = parser.parse_args(argv)
+    logger = _setup_logging(args.log_level)
+    params = {}
+    for param in args.params:
+        name, sep, value = param.partition("=")
+        if not sep:
+            parser.error(f"expected NAME=VALUE: {param}")
+        try:
+            params[name] = json.loads(value)
+        except ValueError:
+            params[name] = value
     try:
-        with json_file.open("r") as f:
-            dependencies = json.load(f)
-            logger.debug(f"Loaded dependencies: {dependencies}")
+        with Client(args.socket, args.timeout) as client:
+            result = client.call(args.method, **params)
+    except ClientError as e:
+        logger.error(e)
+        return 1
+    except OSError as e:
+        logger.error(f"Could not reach the server at {args.socket}: {e}")
+        return 1
+    output = result if isinstance(result, str) else json.dumps(result) + "\n"
+    try:
+        write_chunks([output])
+    except BrokenPipeError:
+        return 1
+    return 0
+
+
+def _run_diff(argv: List[str]) -> int:
+    import json
+    from dep_resolver.diff import diff_graphs, iter_diff_chunks
+    from dep_resolver.output import write_chunks
+
+    args = build_diff_parser().parse_args(argv)
+    logger = _setup_logging(args.log_level)
+    graphs = []
+    for json_file in (args.old_file, args.new_file):
+        if not json_file.is_file():
+            logger.error(f"File not found: {json_file}")
+            return 2
+        try:
+            graphs.append(_load(json_file, None, logger)[0])
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON file: {e}")
+            return 2
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while reading the file: {e}")
+            return 2
+    diff = diff_graphs(*graphs)
+    if args.format == "json":
+        chunks = iter([json.dumps(diff.as_dict(), indent=2) + "\n"])
+    else:
+        chunks = iter_diff_chunks(diff)
+    try:
+        write_chunks(chunks)
+    except BrokenPipeError:
+        return 2
+    return 1 if diff else 0
+
+
+_COMMANDS: Dict[str, Callable[[List[str]], int]] = {
+    "compile": _run_compile,
+    "serve": _run_serve,
+    "client": _run_client,
+    "diff": _run_diff,
+}
+
+
+def _add_log_level(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--log-level",
+        type=str,
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Set the logging level",
+    )
+
+
+def _check_options(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.max_depth is not None:
+        # A depth-limited tree holds different subtrees for a package
+        # depending on how deep it appears, so one of them cannot stand
+        # for the others.
+        if args.dedupe:
+            parser.error("argument --dedupe: not allowed with argument --max-depth")
+        if args.overflow == "dedupe":
+            parser.error(
+                "argument --overflow dedupe: not allowed with argument --max-depth"
+            )
+    # A selected or depth-limited tree is always resolved serially.
+    selected = None
+    if args.root is not None:
+        selected = "--root"
+    elif args.max_depth is not None:
+        selected = "--max-depth"
+    if selected is not None and args.jobs != 1:
+        parser.error(f"argument --jobs: not allowed with argument {selected}")
+    if args.estimate and args.format in _GRAPH_FORMATS:
+        # The graph formats print every dependency once, not the tree.
+        parser.error(
+            f"argument --estimate: not allowed with argument --format {args.format}"
+        )
+    # --order, --why and --rdeps print the graph itself, not a tree.
+    query = None
+    if args.order:
+        query = "--order"
+    elif args.why is not None:
+        query = "--why"
+    elif args.rdeps is not None:
+        query = "--rdeps"
+    if query is not None:
+        ignored = {
+            "--why": args.why is not None,
+            "--rdeps": args.rdeps is not None,
+            "--max-depth": args.max_depth is not None,
+            "--format": args.format != parser.get_default("format"),
+            "--dedupe": args.dedupe,
+            "--indent-size": args.indent_size != parser.get_default("indent_size"),
+            "--estimate": args.estimate,
+            "--max-nodes": args.max_nodes is not None,
+            "--jobs": args.jobs != parser.get_default("jobs"),
+        }
+        if query != "--order":
+            # --why and --rdeps go together, and cycles need no collapsing.
+            ignored.update({"--why": False, "--rdeps": False})
+            ignored["--collapse-cycles"] = args.collapse_cycles
+        for option, used in ignored.items():
+            if used:
+                parser.error(f"argument {option}: not allowed with argument {query}")
+
+
+def _depth(value: str) -> int:
+    depth = int(value)
+    if depth < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return depth
+
+
+def _path(value: str) -> Path:
+    from pathlib import Path
+
+    return Path(value)
+
+
+def _setup_logging(log_level: str) -> logging.Logger:
+    import logging
+
+    numeric_level = getattr(logging, log_level.upper(), None)
+    logging.basicConfig(level=numeric_level, format="%(levelname)s:%(message)s")
+    return logging.getLogger(__name__)
+
+
+def _run(
+    args: argparse.Namespace, logger: logging.Logger, stats: Optional[Stats]
+) -> int:
+    import json
+    from dep_resolver.loader import (
+        ManifestConflictError,
+        expand_manifest_paths,
+        load_manifests,
+    )
+    from dep_resolver.output import write_chunks
+    from dep_resolver.printer import print_dependency_graph
+    from dep_resolver.resolver import CircularDependencyError, resolve_dependencies
+    from dep_resolver.versions import is_versioned_manifest, load_versioned_manifest
+
+    try:
+        json_files = expand_manifest_paths(args.json_files)
+    except FileNotFoundError as e:
+        logger.error(str(e))
+        return 1
+
+    manifest: Optional[MergedManifest] = None
+    releases: Optional[VersionedManifest] = None
+    try:
+        with _phase(stats, "load"):
+            if len(json_files) > 1:
+                if args.snapshot is not None:
+                    logger.warning("Ignoring --snapshot with several JSON files")
+                manifest = load_manifests(json_files, args.on_conflict, args.load_jobs)
+                graph, snapshot = manifest.graph, None
+                logger.debug(f"Merged {len(json_files)} JSON files")
+            elif is_versioned_manifest(json_files[0]):
+                releases = load_versioned_manifest(json_files[0])
+                logger.debug(f"Loaded versions of {len(releases)} packages")
+            else:
+                graph, snapshot = _load(json_files[0], args.snapshot, logger)
+        if releases is None:
+            logger.debug(
+                f"Loaded {len(graph.keys)} packages with {graph.num_edges} dependencies"
+            )
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON file: {e}")
         return 1
+    except ManifestConflictError as e:
+        logger.error(f"{e}; use --on-conflict to merge them")
+        return 1
     except Exception as e:
         logger.error(f"An unexpected error occurred while reading the file: {e}")
         return 1
+    if releases is not None:
+        solved = _solve(releases, args.root, logger, stats)
+        if solved is None:
+            return 1
+        # The chosen versions of the roots are the top-level packages.
+        graph, snapshot = solved, None
+        args.root = None
+    if stats is not None:
+        stats.packages = len(graph.keys)
+        stats.dependencies = graph.num_edges
+
+    for pkg in args.root or ():
+        if pkg not in graph:
+            logger.error(f"Package not found: {pkg}")
+            return 1
+    if args.order:
+        layers = None
+        if snapshot is not None and not args.collapse_cycles and args.root is None:
+            layers = snapshot.install_order()
+        return _run_order(graph, args, logger, stats, layers, manifest)
+    if args.why is not None or args.rdeps is not None:
+        return _run_query(graph, args, logger, stats)
+
+    if args.format in _GRAPH_FORMATS:
+        return _run_graph_format(graph, args, logger, stats)
+
+    dedupe = args.dedupe
+    if args.estimate or (args.max_nodes is not None and not dedupe):
+        from dep_resolver.estimate import estimate_tree_size
+
+        try:
+            with _phase(stats, "estimate"):
+                size = estimate_tree_size(
+                    graph,
+                    collapse_cycles=args.collapse_cycles,
+                    roots=args.root,
+                    max_depth=args.max_depth,
+                    limit=None if args.estimate else args.max_nodes,
+                )
+        except CircularDependencyError as e:
+            _log_cycles(logger, graph, e, manifest)
+            return 1
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while estimating the tree: {e}")
+            return 1
+        if args.estimate:
+            return _print_estimate(size, args.format, logger)
+        if size.nodes > args.max_nodes:
+            message = (
+                f"The dependency tree has {'at least ' if size.truncated else ''}"
+                f"{size.nodes} nodes, more than --max-nodes {args.max_nodes}"
+            )
+            if args.overflow == "fail":
+                logger.error(f"{message}; use --dedupe or --format ndjson")
+                return 1
+            logger.warning(f"{message}; printing it in --dedupe mode")
+            dedupe = True
 
     try:
-        resolved_graph = resolve_dependencies(dependencies)
-    except RecursionError as e:
-        logger.error(f"An error occurred while resolving dependencies: {e}")
+        with _phase(stats, "resolve"):
+            if args.collapse_cycles:
+                from dep_resolver.cycles import find_cycles
+
+                for group in find_cycles(graph):
+                    logger.warning(f"Collapsing circular dependency: {_cycle(group)}")
+            if args.root is not None or args.max_depth is not None:
+                resolved_graph = resolve_dependencies(
+                    graph,
+                    collapse_cycles=args.collapse_cycles,
+                    stats=stats,
+                    roots=args.root,
+                    max_depth=args.max_depth,
+                )
+            elif args.jobs != 1:
+                from dep_resolver.parallel import resolve_parallel
+
+                resolved_graph = resolve_parallel(
+                    graph,
+                    jobs=args.jobs or None,
+                    collapse_cycles=args.collapse_cycles,
+                    stats=stats,
+                )
+            else:
+                resolved_graph = resolve_dependencies(
+                    graph, collapse_cycles=args.collapse_cycles, stats=stats
+                )
+    except CircularDependencyError as e:
+        _log_cycles(logger, graph, e, manifest)
         return 1
     except Exception as e:
         logger.error(f"An unexpected error occurred during dependency resolution: {e}")
         return 1
 
     try:
-        print_dependency_graph(resolved_graph, indent_size=args.indent_size)
+        with _phase(stats, "print"):
+            if args.format == "text":
+                print_dependency_graph(
+                    resolved_graph, indent_size=args.indent_size, dedupe=dedupe
+                )
+            else:
+                from dep_resolver.formats import TREE_FORMATS
+
+                write_chunks(
+                    TREE_FORMATS[args.format](resolved_graph, args.indent_size, dedupe)
+                )
+    except BrokenPipeError:
+        # The reader (e.g. `head`) has seen enough; exit quietly.
+        return 1
+    except Exception as e:
+        logger.error(
+            f"An unexpected error occurred while printing the dependency graph: {e}"
+        )
+        return 1
+    return 0
+
+
+def _solve(
+    releases: VersionedManifest,
+    roots: Optional[List[str]],
+    logger: logging.Logger,
+    stats: Optional[Stats] = None,
+) -> Optional[CompactGraph]:
+    from dep_resolver.versions import VersionConflictError, solve
+
+    try:
+        with _phase(stats, "solve"):
+            solution = solve(releases, roots)
+    except VersionConflictError as e:
+        logger.error(f"Cannot satisfy the version requirements: {e}")
+        return None
+    except ValueError as e:
+        logger.error(str(e))
+        return None
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while choosing versions: {e}")
+        return None
+    logger.debug(
+        f"Chose {len(solution.versions)} versions after {solution.decisions} "
+        f"decisions and {solution.conflicts} learned conflicts"
+    )
+    return solution.graph()
+
+
+def _load(
+    json_file: Path, snapshot_file: Optional[Path], logger: logging.Logger
+) -> Tuple[CompactGraph, Optional[Snapshot]]:
+    from pathlib import Path
+    from dep_resolver.loader import load_manifest
+    from dep_resolver.snapshot import load_snapshot, snapshot_path
+
+    path = snapshot_file if snapshot_file is not None else snapshot_path(json_file)
+    if snapshot_file is not None or Path(path).is_file():
+        try:
+            snapshot = load_snapshot(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring snapshot {path}: {e}")
+        else:
+            if snapshot.matches(json_file):
+                logger.debug(f"Loaded snapshot: {path}")
+                return snapshot.graph, snapshot
+            logger.info(f"Snapshot {path} is out of date, parsing {json_file}")
+    return load_manifest(json_file), None
+
+
+def _run_order(
+    graph: CompactGraph,
+    args: argparse.Namespace,
+    logger: logging.Logger,
+    stats: Optional[Stats] = None,
+    layers: Optional[List[List[str]]] = None,
+    manifest: Optional[MergedManifest] = None,
+) -> int:
+    from dep_resolver.order import install_order
+    from dep_resolver.printer import print_install_order
+    from dep_resolver.resolver import CircularDependencyError, prepare_graph
+
+    try:
+        with _phase(stats, "order"):
+            if layers is None:
+                if args.collapse_cycles:
+                    from dep_resolver.cycles import find_cycles
+
+                    for group in find_cycles(graph):
+                        logger.warning(
+                            f"Collapsing circular dependency: {_cycle(group)}"
+                        )
+                selected = prepare_graph(graph, args.collapse_cycles, args.root)
+                roots = None
+                if args.root is not None:
+                    roots = [selected.names[node] for node in selected.keys]
+                layers = install_order(selected, roots)
+    except CircularDependencyError as e:
+        _log_cycles(logger, graph, e, manifest)
+        return 1
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while ordering dependencies: {e}")
+        return 1
+
+    try:
+        with _phase(stats, "print"):
+            print_install_order(layers)
+    except BrokenPipeError:
+        return 1
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while printing the order: {e}")
+        return 1
+    return 0
+
+
+def _run_graph_format(
+    graph: CompactGraph,
+    args: argparse.Namespace,
+    logger: logging.Logger,
+    stats: Optional[Stats] = None,
+) -> int:
+    from dep_resolver.cycles import find_cycles
+    from dep_resolver.formats import GRAPH_FORMATS
+    from dep_resolver.output import write_chunks
+    from dep_resolver.resolver import prepare_graph
+
+    if args.collapse_cycles:
+        for group in find_cycles(graph):
+            logger.warning(f"Collapsing circular dependency: {_cycle(group)}")
+    try:
+        with _phase(stats, "print"):
+            graph = prepare_graph(graph, args.collapse_cycles, args.root)
+            write_chunks(GRAPH_FORMATS[args.format](graph, args.max_depth))
+    except BrokenPipeError:
+        return 1
     except Exception as e:
         logger.error(
             f"An unexpected error occurred while printing the dependency graph: {e}"
         )
         return 1
     return 0
+
+
+def _print_estimate(size: TreeSize, output_format: str, logger: logging.Logger) -> int:
+    from dep_resolver.output import write_chunks
+
+    lines = [
+        f"{pkg}: {nodes} node{'s' if nodes != 1 else ''}"
+        for pkg, nodes in size.roots.items()
+    ]
+    lines.append(
+        f"Total: {size.nodes} nodes, {size.lines(output_format)} lines "
+        f"of {output_format} output"
+    )
+    try:
+        write_chunks(["".join(line + "\n" for line in lines)])
+    except BrokenPipeError:
+        return 1
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while printing the result: {e}")
+        return 1
+    return 0
+
+
+def _run_query(
+    graph: CompactGraph,
+    args: argparse.Namespace,
+    logger: logging.Logger,
+    stats: Optional[Stats] = None,
+) -> int:
+    from dep_resolver.output import write_chunks
+    from dep_resolver.query import QueryIndex
+
+    for pkg in (args.why, args.rdeps):
+        if pkg is not None and pkg not in graph:
+            logger.error(f"Package not found: {pkg}")
+            return 1
+    try:
+        with _phase(stats, "index"):
+            index = QueryIndex.build(graph)
+        with _phase(stats, "query"):
+            lines: List[str] = []
+            if args.why is not None:
+                paths = index.why(args.why, args.root)
+                lines.extend(" -> ".join(path) for path in paths)
+            if args.rdeps is not None:
+                dependents = index.dependents(args.rdeps)
+                if args.root is not None:
+                    # Only the dependents that the selected packages need.
+                    needed = set(args.root)
+                    for pkg in args.root:
+                        needed.update(index.closure(pkg))
+                    dependents = [pkg for pkg in dependents if pkg in needed]
+                lines.extend(dependents)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while querying dependencies: {e}")
+        return 1
+
+    try:
+        with _phase(stats, "print"):
+            write_chunks(["".join(line + "\n" for line in lines)])
+    except BrokenPipeError:
+        return 1
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while printing the result: {e}")
+        return 1
+    return 0
+
+
+def _phase(stats: Optional[Stats], name: str) -> ContextManager[None]:
+    return stats.phase(name) if stats is not None else contextlib.nullcontext()
+
+
+def _log_cycles(
+    logger: logging.Logger,
+    graph: CompactGraph,
+    error: CircularDependencyError,
+    manifest: Optional[MergedManifest] = None,
+) -> None:
+    from dep_resolver.cycles import find_cycles
+
+    logger.error(f"An error occurred while resolving dependencies: {error}")
+    groups = find_cycles(graph)
+    for number, group in enumerate(groups, start=1):
+        logger.error(f"Cycle group {number} of {len(groups)}: {_cycle(group)}")
+        if manifest is not None:
+            sources = dict.fromkeys(manifest.source_of(pkg) for pkg in group.packages)
+            logger.error(f"  defined in: {', '.join(filter(None, sources))}")
+
+
+def _cycle(group: CycleGroup) -> str:
+    return (
+        f"{len(group.packages)} packages ({', '.join(group.packages)}): "
+        + " -> ".join(group.cycle)
+    )
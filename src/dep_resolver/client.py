@@ -0,0 +1,89 @@
+from __future__ import annotations
+import json
+import os
+import socket
+from typing import Any, Optional, Union
+
+# Only the standard library is imported here, so a client starts quickly.
+
+
+class ClientError(Exception):
+    """
+    Raised when the server answers a request with an error.
+
+    Attributes:
+        code (int): The JSON-RPC error code (see :mod:`dep_resolver.server`).
+        data (Any): Additional details sent by the server, or None.
+    """
+
+    def __init__(self, code: int, message: str, data: Any = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class Client:
+    """
+    Connection to a resolver server listening on a Unix domain socket.
+
+    The connection is kept open, so several requests pay for connecting
+    only once. Use the client as a context manager to close it.
+
+    Args:
+        path (Union[str, os.PathLike[str]]): Path of the server socket.
+        timeout (Optional[float]): Seconds to wait for the server, or None
+            to wait forever.
+    """
+
+    def __init__(
+        self, path: Union[str, "os.PathLike[str]"], timeout: Optional[float] = None
+    ) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.settimeout(timeout)
+            self._socket.connect(os.fspath(path))
+        except BaseException:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rb")
+        self._next_id = 0
+
+    def call(self, method: str, **params: Any) -> Any:
+        """
+        Sends a request and waits for its result.
+
+        Args:
+            method (str): The method name, e.g. "resolve".
+            **params (Any): The named parameters of the method.
+
+        Returns:
+            Any: The decoded result.
+
+        Raises:
+            ClientError: If the server answered with an error.
+            ConnectionError: If the server closed the connection.
+        """
+        self._next_id += 1
+        request = {"jsonrpc": "2.0", "id": self._next_id, "method": method}
+        if params:
+            request["params"] = params
+        self._socket.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+        response = json.loads(line)
+        error = response.get("error")
+        if error is not None:
+            raise ClientError(error["code"], error["message"], error.get("data"))
+        return response["result"]
+
+    def close(self) -> None:
+        """Closes the connection."""
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> Client:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
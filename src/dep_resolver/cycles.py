@@ -0,0 +1,222 @@
+from __future__ import annotations
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from .graph import CompactGraph, Dependencies, GraphBuilder, as_graph
+
+
+class CycleGroup(NamedTuple):
+    """
+    A strongly connected group of packages that depend on each other.
+
+    Attributes:
+        packages (List[str]): Members of the group in graph order.
+        cycle (List[str]): A sample cycle through the first member, starting
+            and ending with that member.
+    """
+
+    packages: List[str]
+    cycle: List[str]
+
+
+def strongly_connected_components(graph: CompactGraph) -> List[List[int]]:
+    """
+    Computes the strongly connected components with Tarjan's algorithm.
+
+    The traversal uses an explicit stack, so it runs in linear time on
+    graphs of any depth. Components are returned in reverse topological
+    order: every component comes after all the components it depends on.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+
+    Returns:
+        List[List[int]]: Node ids of every component.
+    """
+    offsets, targets = graph.offsets, graph.targets
+    size = len(graph)
+    index = [-1] * size
+    low = [0] * size
+    on_stack = bytearray(size)
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+    for start in range(size):
+        if index[start] != -1:
+            continue
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = 1
+        nodes = [start]
+        positions = [offsets[start]]
+        while nodes:
+            node = nodes[-1]
+            pos = positions[-1]
+            if pos < offsets[node + 1]:
+                positions[-1] = pos + 1
+                dep = targets[pos]
+                if index[dep] == -1:
+                    index[dep] = low[dep] = counter
+                    counter += 1
+                    stack.append(dep)
+                    on_stack[dep] = 1
+                    nodes.append(dep)
+                    positions.append(offsets[dep])
+                elif on_stack[dep] and index[dep] < low[node]:
+                    low[node] = index[dep]
+                continue
+            nodes.pop()
+            positions.pop()
+            if nodes and low[node] < low[nodes[-1]]:
+                low[nodes[-1]] = low[node]
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def find_cycles(dependencies: Union[Dependencies, CompactGraph]) -> List[CycleGroup]:
+    """
+    Finds every group of mutually dependent packages in one pass.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The dependency
+            mapping or its compact graph.
+
+    Returns:
+        List[CycleGroup]: All cyclic groups, ordered by their first member.
+    """
+    graph = as_graph(dependencies)
+    names = graph.names
+    components = strongly_connected_components(graph)
+    groups = []
+    for component in _cyclic_components(graph, components):
+        cycle = _sample_cycle(graph, component)
+        groups.append(
+            CycleGroup([names[node] for node in component], [names[n] for n in cycle])
+        )
+    return groups
+
+
+def collapse_cycles(dependencies: Union[Dependencies, CompactGraph]) -> CompactGraph:
+    """
+    Collapses every cyclic group into a single marked package.
+
+    Each group is replaced by a package named by :func:`cycle_label` that
+    depends on everything its members depend on outside the group. The
+    resulting graph is acyclic and can be resolved as usual.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The dependency
+            mapping or its compact graph.
+
+    Returns:
+        CompactGraph: The acyclic condensed graph.
+    """
+    graph = as_graph(dependencies)
+    names = graph.names
+    components = strongly_connected_components(graph)
+    component_of = [0] * len(graph)
+    for number, component in enumerate(components):
+        for node in component:
+            component_of[node] = number
+    labels: List[Optional[str]] = [None] * len(components)
+    for component in _cyclic_components(graph, components):
+        labels[component_of[component[0]]] = cycle_label(
+            [names[node] for node in component]
+        )
+
+    def name_of(node: int) -> str:
+        label = labels[component_of[node]]
+        return names[node] if label is None else label
+
+    builder = GraphBuilder()
+    collapsed: Dict[int, List[str]] = {}
+    for key in graph.keys:
+        number = component_of[key]
+        if labels[number] is None:
+            builder.add(names[key], [name_of(dep) for dep in graph.successors(key)])
+            continue
+        if number not in collapsed:
+            collapsed[number] = [
+                name_of(dep)
+                for member in sorted(components[number])
+                for dep in graph.successors(member)
+                if component_of[dep] != number
+            ]
+        builder.add(name_of(key), collapsed[number])
+    return builder.build()
+
+
+def cycle_label(packages: Sequence[str]) -> str:
+    """
+    Returns the name of the marked package standing in for a cyclic group.
+
+    Args:
+        packages (Sequence[str]): Members of the group.
+
+    Returns:
+        str: The marked package name.
+    """
+    return f"<cycle: {', '.join(packages)}>"
+
+
+def _cyclic_components(
+    graph: CompactGraph, components: List[List[int]]
+) -> List[List[int]]:
+    """
+    Selects the components that contain a cycle.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        components (List[List[int]]): All strongly connected components.
+
+    Returns:
+        List[List[int]]: Sorted members of every cyclic component, ordered by
+        their first member.
+    """
+    cyclic = []
+    for component in components:
+        if len(component) > 1 or component[0] in graph.successors(component[0]):
+            cyclic.append(sorted(component))
+    cyclic.sort()
+    return cyclic
+
+
+def _sample_cycle(graph: CompactGraph, component: List[int]) -> List[int]:
+    """
+    Finds a shortest cycle through the first member of a component.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        component (List[int]): Sorted members of a cyclic component.
+
+    Returns:
+        List[int]: The cycle, starting and ending with the first member.
+    """
+    start = component[0]
+    members = set(component)
+    parent: Dict[int, int] = {}
+    queue: Deque[int] = deque([start])
+    while queue:
+        node = queue.popleft()
+        for dep in graph.successors(node):
+            if dep == start:
+                cycle = [start]
+                while node != start:
+                    cycle.append(node)
+                    node = parent[node]
+                cycle.append(start)
+                cycle.reverse()
+                return cycle
+            if dep in members and dep not in parent:
+                parent[dep] = node
+                queue.append(dep)
+    raise ValueError("Component does not contain a cycle")
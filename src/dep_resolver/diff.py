@@ -0,0 +1,262 @@
+from __future__ import annotations
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Sequence, Tuple, Union
+
+from .graph import CompactGraph, Dependencies, as_graph
+from .output import CHUNK_LINES
+
+Edge = Tuple[str, str]
+
+
+class GraphDiff(NamedTuple):
+    """
+    Structural difference between two dependency graphs.
+
+    Attributes:
+        added (List[str]): Packages only in the new graph.
+        removed (List[str]): Packages only in the old graph.
+        added_edges (List[Edge]): Dependencies only in the new graph, as
+            (package, dependency) pairs.
+        removed_edges (List[Edge]): Dependencies only in the old graph.
+        changed (List[str]): Packages in both graphs whose resolved
+            dependency tree differs: their own dependencies changed, or
+            those of a package they depend on, directly or transitively.
+        added_top_level (List[str]): Packages in both graphs that are only
+            top-level packages of the new graph.
+        removed_top_level (List[str]): Packages in both graphs that are
+            only top-level packages of the old graph.
+    """
+
+    added: List[str]
+    removed: List[str]
+    added_edges: List[Edge]
+    removed_edges: List[Edge]
+    changed: List[str]
+    added_top_level: List[str]
+    removed_top_level: List[str]
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.added
+            or self.removed
+            or self.changed
+            or self.added_top_level
+            or self.removed_top_level
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Returns the difference as JSON-serializable lists.
+
+        Returns:
+            Dict[str, Any]: The lists by field name, edges as pairs.
+        """
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "added_edges": [list(edge) for edge in self.added_edges],
+            "removed_edges": [list(edge) for edge in self.removed_edges],
+            "changed": self.changed,
+            "added_top_level": self.added_top_level,
+            "removed_top_level": self.removed_top_level,
+        }
+
+
+def diff_graphs(
+    old: Union[Dependencies, CompactGraph], new: Union[Dependencies, CompactGraph]
+) -> GraphDiff:
+    """
+    Compares two dependency graphs without resolving either of them.
+
+    Packages are matched by name, and the dependency lists of every package
+    are compared once, so the comparison is linear in the size of the
+    graphs. Only the packages whose dependency lists differ are starting
+    points for the changed trees, which are found by walking the reverse
+    edges of the new graph from them; the walk touches only the packages
+    that depend on a change. A package whose dependency list is reordered
+    counts as changed, since its printed tree is. A package that is only
+    listed as a dependency in one graph but as a top-level package in the
+    other is reported too, since it is printed at the top level of only
+    one of them.
+
+    Args:
+        old (Union[Dependencies, CompactGraph]): The old dependency mapping
+            or its compact graph.
+        new (Union[Dependencies, CompactGraph]): The new one.
+
+    Returns:
+        GraphDiff: The differences, in the order of the new graph, then of
+        the old graph for removed packages and edges.
+    """
+    old = as_graph(old)
+    new = as_graph(new)
+    old_names = old.names
+    new_names = new.names
+    # Id in the old graph of every package of the new graph, or -1.
+    to_old = array("i", [-1]) * len(new_names)
+    matched = bytearray(len(old_names))
+    for node, name in enumerate(new_names):
+        old_node = old.get_id(name)
+        if old_node is not None:
+            to_old[node] = old_node
+            matched[old_node] = 1
+    # All dependencies of the new graph as old ids, so that every package
+    # present in both graphs compares its edges with a single slice.
+    mapped = array("i", map(to_old.__getitem__, new.targets))
+    old_offsets, old_targets = old.offsets, old.targets
+    new_offsets = new.offsets
+
+    added: List[str] = []
+    added_edges: List[Edge] = []
+    removed_edges: List[Edge] = []
+    seeds: List[int] = []
+    for node, old_node in enumerate(to_old):
+        start, end = new_offsets[node], new_offsets[node + 1]
+        if old_node < 0:
+            name = new_names[node]
+            added.append(name)
+            added_edges.extend((name, new_names[dep]) for dep in new.targets[start:end])
+            continue
+        new_deps = mapped[start:end]
+        old_deps = old_targets[old_offsets[old_node] : old_offsets[old_node + 1]]
+        if new_deps == old_deps:
+            continue
+        seeds.append(node)
+        name = new_names[node]
+        old_set = set(old_deps)
+        new_set = set(new_deps)
+        added_edges.extend(
+            (name, new_names[dep])
+            for dep, old_dep in zip(new.targets[start:end], new_deps)
+            if old_dep not in old_set
+        )
+        removed_edges.extend(
+            (name, old_names[dep]) for dep in old_deps if dep not in new_set
+        )
+    removed: List[str] = []
+    for old_node, name in enumerate(old_names):
+        if not matched[old_node]:
+            removed.append(name)
+            removed_edges.extend(
+                (name, old_names[dep]) for dep in old.successors(old_node)
+            )
+
+    old_keys = bytearray(len(old_names))
+    for old_node in old.keys:
+        old_keys[old_node] = 1
+    new_keys = bytearray(len(new_names))
+    for node in new.keys:
+        new_keys[node] = 1
+    added_top_level = [
+        new_names[node]
+        for node, old_node in enumerate(to_old)
+        if old_node >= 0 and new_keys[node] and not old_keys[old_node]
+    ]
+    removed_top_level = [
+        new_names[node]
+        for node, old_node in enumerate(to_old)
+        if old_node >= 0 and old_keys[old_node] and not new_keys[node]
+    ]
+
+    changed = _dependents(new, seeds)
+    return GraphDiff(
+        added,
+        removed,
+        added_edges,
+        removed_edges,
+        [new_names[node] for node in changed if to_old[node] >= 0],
+        added_top_level,
+        removed_top_level,
+    )
+
+
+def _dependents(graph: CompactGraph, seeds: Sequence[int]) -> List[int]:
+    """
+    Finds the seeds and every package that transitively depends on them.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        seeds (Sequence[int]): Ids of the starting packages.
+
+    Returns:
+        List[int]: The ids in ascending order.
+    """
+    if not seeds:
+        return []
+    reverse = graph.reversed()
+    seen = bytearray(len(graph))
+    queue: Deque[int] = deque(seeds)
+    for node in seeds:
+        seen[node] = 1
+    while queue:
+        for dependent in reverse.successors(queue.popleft()):
+            if not seen[dependent]:
+                seen[dependent] = 1
+                queue.append(dependent)
+    return [node for node in range(len(graph)) if seen[node]]
+
+
+def iter_diff_chunks(diff: GraphDiff, chunk_lines: int = CHUNK_LINES) -> Iterator[str]:
+    """
+    Yields a graph difference as text lines.
+
+    Added packages and edges are prefixed with "+", removed ones with "-",
+    and packages whose dependency tree changed with "~". Packages that
+    became or stopped being top-level packages are marked "(top-level)".
+    A summary line follows.
+
+    Args:
+        diff (GraphDiff): The difference.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+    """
+    lines: List[str] = []
+    sections = (
+        ("+ ", diff.added),
+        ("- ", diff.removed),
+        ("+ ", (f"{pkg} (top-level)" for pkg in diff.added_top_level)),
+        ("- ", (f"{pkg} (top-level)" for pkg in diff.removed_top_level)),
+        ("+ ", (f"{pkg} -> {dep}" for pkg, dep in diff.added_edges)),
+        ("- ", (f"{pkg} -> {dep}" for pkg, dep in diff.removed_edges)),
+        ("~ ", diff.changed),
+    )
+    for prefix, entries in sections:
+        for entry in entries:
+            lines.append(prefix + entry)
+            if len(lines) >= chunk_lines:
+                lines.append("")
+                yield "\n".join(lines)
+                lines.clear()
+    summary = (
+        f"{_count(len(diff.added), 'package')} added, {len(diff.removed)} removed; "
+        f"{_count(len(diff.added_edges), 'dependency', 'dependencies')} added, "
+        f"{len(diff.removed_edges)} removed; "
+        f"{_count(len(diff.changed), 'changed tree')}"
+    )
+    if diff.added_top_level or diff.removed_top_level:
+        summary += (
+            f"; {_count(len(diff.added_top_level), 'top-level package')} added, "
+            f"{len(diff.removed_top_level)} removed"
+        )
+    lines.append(summary)
+    lines.append("")
+    yield "\n".join(lines)
+
+
+def _count(number: int, singular: str, plural: str = "") -> str:
+    """
+    Formats a count with the matching noun.
+
+    Args:
+        number (int): The count.
+        singular (str): The noun for one.
+        plural (str): The noun for other counts; ``singular`` + "s" if
+            empty.
+
+    Returns:
+        str: E.g. "2 packages".
+    """
+    return f"{number} {singular if number == 1 else plural or singular + 's'}"
@@ -0,0 +1,242 @@
+from __future__ import annotations
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .graph import CompactGraph, Dependencies
+from .resolver import CircularDependencyError, prepare_graph
+
+
+class TreeSize(NamedTuple):
+    """
+    Size of the expanded dependency tree.
+
+    The counts are exact Python integers; for graphs of stacked diamonds
+    they grow exponentially with the depth of the graph.
+
+    Attributes:
+        nodes (int): Entries in the tree, i.e. lines of the text output.
+        expanded (int): Entries with at least one dependency.
+        roots (Dict[str, int]): Entries in the tree of every top-level
+            package, including the package itself.
+        truncated (bool): True if counting stopped at the limit passed to
+            :func:`estimate_tree_size`; all counts are then lower bounds,
+            and 0 for the top-level packages that were not counted.
+    """
+
+    nodes: int
+    expanded: int
+    roots: Dict[str, int]
+    truncated: bool = False
+
+    def lines(self, output_format: str = "text") -> int:
+        """
+        Returns the number of lines the tree is printed on.
+
+        Args:
+            output_format (str): "text" or "json", without dedupe.
+
+        Returns:
+            int: The number of output lines.
+
+        Raises:
+            ValueError: If the format does not print the tree.
+        """
+        if output_format == "text":
+            return self.nodes
+        if output_format == "json":
+            # Braces around the document, and a closing brace for every
+            # entry with dependencies.
+            return self.nodes + self.expanded + 2 if self.nodes else 1
+        raise ValueError(f"Not a tree output format: {output_format}")
+
+
+def estimate_tree_size(
+    dependencies: Union[Dependencies, CompactGraph],
+    collapse_cycles: bool = False,
+    roots: Optional[Sequence[str]] = None,
+    max_depth: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> TreeSize:
+    """
+    Counts the entries of the resolved tree without expanding it.
+
+    The number of entries below a package is one plus the sum over its
+    dependencies, so every package reachable from the top-level packages is
+    counted once, in post-order, and the cost is linear in the size of the
+    selected graph. With ``max_depth`` a package is counted once for every
+    number of levels left below it at which it is reached, which is still
+    linear for graphs whose paths to a package have similar lengths, such
+    as long chains.
+
+    The arguments select the same tree as
+    :func:`dep_resolver.resolver.resolve_dependencies`.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The initial
+            dependency mapping or its compact graph.
+        collapse_cycles (bool): Count the tree with collapsed cycles.
+        roots (Optional[Sequence[str]]): Packages to count instead of the
+            top-level packages.
+        max_depth (Optional[int]): Number of dependency levels below every
+            root.
+        limit (Optional[int]): With ``max_depth``, stop counting as soon as
+            the tree has more entries, e.g. to enforce a size cap. Without
+            ``max_depth`` counting is linear anyway and always completes, so
+            that circular dependencies are detected.
+
+    Returns:
+        TreeSize: The size of the tree.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected and
+            neither ``collapse_cycles`` nor ``max_depth`` is set.
+        KeyError: If a root does not appear in the graph.
+        ValueError: If ``max_depth`` is negative.
+    """
+    if max_depth is not None and max_depth < 0:
+        raise ValueError(f"max_depth must not be negative: {max_depth}")
+    graph = prepare_graph(dependencies, collapse_cycles, roots)
+    truncated = False
+    if max_depth is None:
+        counts, expanded = _count_paths(graph)
+    else:
+        counts, expanded, truncated = _count_paths_limited(graph, max_depth, limit)
+    names = graph.names
+    keys = graph.keys
+    return TreeSize(
+        sum([counts[key] for key in keys]),
+        sum([expanded[key] for key in keys]),
+        {names[key]: counts[key] for key in keys},
+        truncated,
+    )
+
+
+def _count_paths(graph: CompactGraph) -> Tuple[List[int], List[int]]:
+    """
+    Counts the tree entries below every package reachable from the keys.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+
+    Returns:
+        Tuple[List[int], List[int]]: Entries and expanded entries of the
+        tree of every package, indexed by id; 0 for unreachable packages.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected.
+    """
+    size = len(graph)
+    counts = [0] * size
+    expanded = [0] * size
+    on_path = bytearray(size)
+    names = graph.names
+    stack: List[Tuple[int, Iterator[int]]] = []
+    for key in graph.keys:
+        if counts[key]:
+            continue
+        on_path[key] = 1
+        stack.append((key, iter(graph.successors(key))))
+        while stack:
+            node, dep_iter = stack[-1]
+            for dep in dep_iter:
+                if counts[dep]:
+                    continue
+                if on_path[dep]:
+                    path = [pkg for pkg, _ in stack]
+                    cycle = path[path.index(dep) :] + [dep]
+                    raise CircularDependencyError([names[pkg] for pkg in cycle])
+                on_path[dep] = 1
+                stack.append((dep, iter(graph.successors(dep))))
+                break
+            else:
+                stack.pop()
+                on_path[node] = 0
+                deps = graph.successors(node)
+                if deps:
+                    counts[node] = 1 + sum([counts[dep] for dep in deps])
+                    expanded[node] = 1 + sum([expanded[dep] for dep in deps])
+                else:
+                    counts[node] = 1
+    return counts, expanded
+
+
+def _count_paths_limited(
+    graph: CompactGraph, max_depth: int, limit: Optional[int] = None
+) -> Tuple[List[int], List[int], bool]:
+    """
+    Counts the tree entries below every key down to a fixed depth.
+
+    The counts are memoized by package and number of levels left below it,
+    and computed in post-order with an explicit stack, so long chains do not
+    hit the recursion limit. The levels left decrease along every path, so
+    circular dependencies end at the depth limit like all other paths.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        max_depth (int): Number of dependency levels below every key.
+        limit (Optional[int]): Stop once the tree has more entries.
+
+    Returns:
+        Tuple[List[int], List[int], bool]: Entries and expanded entries of
+        the depth-limited tree of every key, indexed by id and 0 for other
+        packages, and whether counting stopped at ``limit``.
+    """
+    size = len(graph)
+    counts = [0] * size
+    expanded = [0] * size
+    # Entries and expanded entries by package and levels left below it.
+    memo: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    leaf = (1, 0)
+    total = 0
+    for key in graph.keys:
+        if (key, max_depth) in memo:
+            counts[key], expanded[key] = memo[key, max_depth]
+            total += counts[key]
+            continue
+        deps = graph.successors(key) if max_depth else ()
+        # Package, levels left below it, whether it has dependencies within
+        # the limit, and an iterator over them; the sums of their counts
+        # are kept in two parallel lists.
+        stack: List[Tuple[int, int, bool, Iterator[int]]] = [
+            (key, max_depth, bool(deps), iter(deps))
+        ]
+        node_sums = [0]
+        expanded_sums = [0]
+        while stack:
+            below = stack[-1][1] - 1
+            for dep in stack[-1][3]:
+                cached = memo.get((dep, below)) if below else leaf
+                if cached is None:
+                    deps = graph.successors(dep)
+                    stack.append((dep, below, bool(deps), iter(deps)))
+                    node_sums.append(0)
+                    expanded_sums.append(0)
+                    break
+                node_sums[-1] += cached[0]
+                expanded_sums[-1] += cached[1]
+            else:
+                node, remaining, has_deps, _ = stack.pop()
+                below_expanded = expanded_sums.pop()
+                result = (
+                    1 + node_sums.pop(),
+                    1 + below_expanded if has_deps else 0,
+                )
+                memo[node, remaining] = result
+                if limit is not None and total + result[0] > limit:
+                    # The tree of ``key`` has at least as many entries.
+                    counts[key], expanded[key] = result
+                    return counts, expanded, True
+                if stack:
+                    node_sums[-1] += result[0]
+                    expanded_sums[-1] += result[1]
+        counts[key], expanded[key] = memo[key, max_depth]
+        total += counts[key]
+    return counts, expanded, False
@@ -0,0 +1,265 @@
+from __future__ import annotations
+from collections import deque
+from json.encoder import encode_basestring
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from .graph import CompactGraph
+from .output import CHUNK_LINES
+from .printer import iter_tree_chunks
+from .resolver import DependencyGraph
+
+#: Writes a resolved dependency graph, given the indentation size and
+#: whether to expand every package only once.
+TreeWriter = Callable[[Mapping[str, DependencyGraph], int, bool], Iterator[str]]
+
+#: Writes the edges of a graph reachable from its top-level packages,
+#: given the maximum depth.
+GraphWriter = Callable[[CompactGraph, Optional[int]], Iterator[str]]
+
+
+def iter_json_chunks(
+    resolved_graph: Mapping[str, DependencyGraph],
+    indent_size: int = 4,
+    dedupe: bool = False,
+    chunk_lines: int = CHUNK_LINES,
+) -> Iterator[str]:
+    """
+    Yields a resolved dependency graph as nested JSON objects in chunks.
+
+    The output matches ``json.dumps(resolved_graph, indent=indent_size,
+    ensure_ascii=False)``, but it is written with an explicit stack, so
+    arbitrarily deep graphs do not hit the recursion limit and are never
+    held in memory as a single string. In dedupe mode, later appearances of
+    a package whose dependencies were already written have the value
+    ``null``.
+
+    Args:
+        resolved_graph (Mapping[str, DependencyGraph]): The resolved
+            dependency graph.
+        indent_size (int): Number of spaces for indentation.
+        dedupe (bool): Expand every package only once.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+    """
+    if not resolved_graph:
+        yield "{}\n"
+        return
+    quoted: Dict[str, str] = {}
+    expanded: Set[str] = set()
+    prefixes = [""]
+    lines: List[str] = []
+    append = lines.append
+    # The last line gets a comma if a sibling follows, so it is held back.
+    pending = "{"
+    stack = [iter(resolved_graph.items())]
+    first = True
+    while stack:
+        depth = len(stack)
+        if len(prefixes) == depth:
+            prefixes.append(" " * indent_size * depth)
+        prefix = prefixes[depth]
+        for pkg, sub_deps in stack[-1]:
+            key = quoted.get(pkg)
+            if key is None:
+                key = quoted[pkg] = encode_basestring(pkg)
+            append(pending if first else pending + ",")
+            first = False
+            if not sub_deps:
+                pending = prefix + key + ": {}"
+                continue
+            if dedupe:
+                if pkg in expanded:
+                    pending = prefix + key + ": null"
+                    continue
+                expanded.add(pkg)
+            pending = prefix + key + ": {"
+            stack.append(iter(sub_deps.items()))
+            first = True
+            break
+        else:
+            stack.pop()
+            append(pending)
+            pending = prefixes[depth - 1] + "}"
+            first = False
+        if len(lines) >= chunk_lines:
+            lines.append("")
+            yield "\n".join(lines)
+            lines.clear()
+    append(pending)
+    lines.append("")
+    yield "\n".join(lines)
+
+
+def iter_ndjson_chunks(
+    graph: CompactGraph,
+    max_depth: Optional[int] = None,
+    chunk_lines: int = CHUNK_LINES,
+) -> Iterator[str]:
+    """
+    Yields the dependency edges of a graph as newline-delimited JSON.
+
+    Every edge is written once as ``{"from": "pkg", "to": "dep"}``, straight
+    from the adjacency arrays; the dependency tree is never expanded.
+    Packages without dependencies are written as ``{"from": "pkg",
+    "to": null}``.
+
+    Args:
+        graph (CompactGraph): The dependency graph. Only packages reachable
+            from its top-level packages are written.
+        max_depth (Optional[int]): Only write the dependencies of packages
+            fewer than this many levels below a top-level package.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+    """
+    names = graph.names
+    quoted: List[Optional[str]] = [None] * len(graph)
+    lines: List[str] = []
+    append = lines.append
+    for node, deps in _expanded_nodes(graph, max_depth):
+        source = quoted[node]
+        if source is None:
+            source = quoted[node] = encode_basestring(names[node])
+        if not deps:
+            append('{"from": ' + source + ', "to": null}')
+        for dep in deps:
+            target = quoted[dep]
+            if target is None:
+                target = quoted[dep] = encode_basestring(names[dep])
+            append('{"from": ' + source + ', "to": ' + target + "}")
+        if len(lines) >= chunk_lines:
+            lines.append("")
+            yield "\n".join(lines)
+            lines.clear()
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
+
+
+def iter_dot_chunks(
+    graph: CompactGraph,
+    max_depth: Optional[int] = None,
+    chunk_lines: int = CHUNK_LINES,
+) -> Iterator[str]:
+    """
+    Yields a graph as a Graphviz DOT digraph.
+
+    Every edge is written once, straight from the adjacency arrays; the
+    dependency tree is never expanded. Packages without dependencies are
+    written as node statements, so top-level packages without any edges
+    still appear.
+
+    Args:
+        graph (CompactGraph): The dependency graph. Only packages reachable
+            from its top-level packages are written.
+        max_depth (Optional[int]): Only write the dependencies of packages
+            fewer than this many levels below a top-level package.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+    """
+    names = graph.names
+    quoted: List[Optional[str]] = [None] * len(graph)
+    lines = ["digraph dependencies {"]
+    append = lines.append
+    for node, deps in _expanded_nodes(graph, max_depth):
+        source = quoted[node]
+        if source is None:
+            source = quoted[node] = _dot_id(names[node])
+        if not deps:
+            append("    " + source + ";")
+        for dep in deps:
+            target = quoted[dep]
+            if target is None:
+                target = quoted[dep] = _dot_id(names[dep])
+            append("    " + source + " -> " + target + ";")
+        if len(lines) >= chunk_lines:
+            lines.append("")
+            yield "\n".join(lines)
+            lines.clear()
+    lines.append("}")
+    lines.append("")
+    yield "\n".join(lines)
+
+
+#: Writers of resolved dependency graphs, by format name.
+TREE_FORMATS: Dict[str, TreeWriter] = {
+    "text": iter_tree_chunks,
+    "json": iter_json_chunks,
+}
+
+#: Writers that stream from the adjacency arrays, by format name.
+GRAPH_FORMATS: Dict[str, GraphWriter] = {
+    "ndjson": iter_ndjson_chunks,
+    "dot": iter_dot_chunks,
+}
+
+
+def _expanded_nodes(
+    graph: CompactGraph, max_depth: Optional[int]
+) -> Iterator[Tuple[int, Sequence[int]]]:
+    """
+    Yields every package reachable from the top-level packages once.
+
+    Packages are visited breadth-first, so the top-level packages come
+    first, in their original order.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        max_depth (Optional[int]): Skip packages this many or more levels
+            below a top-level package. With 0, only the top-level packages
+            are yielded, without their dependencies.
+
+    Yields:
+        Tuple[int, Sequence[int]]: The id of the next package and the ids of
+        its dependencies.
+    """
+    seen = bytearray(len(graph))
+    queue: Deque[int] = deque()
+    for key in graph.keys:
+        if not seen[key]:
+            seen[key] = 1
+            queue.append(key)
+    if max_depth == 0:
+        for key in queue:
+            yield key, ()
+        return
+    depth = 0
+    while queue and (max_depth is None or depth < max_depth):
+        for _ in range(len(queue)):
+            node = queue.popleft()
+            deps = graph.successors(node)
+            yield node, deps
+            for dep in deps:
+                if not seen[dep]:
+                    seen[dep] = 1
+                    queue.append(dep)
+        depth += 1
+
+
+def _dot_id(name: str) -> str:
+    """
+    Quotes a package name as a DOT identifier.
+
+    Args:
+        name (str): The package name.
+
+    Returns:
+        str: The double-quoted identifier.
+    """
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
@@ -0,0 +1,274 @@
+from __future__ import annotations
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+Dependencies = Mapping[str, Sequence[str]]
+
+
+class CompactGraph:
+    """
+    Dependency graph with interned package names and CSR adjacency.
+
+    Every package name is interned to an integer id. The dependencies of
+    node ``i`` are ``targets[offsets[i]:offsets[i + 1]]``, both stored as
+    ``array('i')`` buffers. Top-level packages of the manifest are listed in
+    ``keys`` in their original order; packages that only appear as
+    dependencies are nodes without outgoing edges.
+
+    Attributes:
+        names (Sequence[str]): Package name of every node, indexed by id.
+        keys (Sequence[int]): Ids of the top-level packages in manifest order.
+        offsets (Sequence[int]): Start of every node's edges in ``targets``,
+            followed by the total number of edges.
+        targets (Sequence[int]): Concatenated dependency ids of all nodes.
+    """
+
+    __slots__ = ("names", "keys", "offsets", "targets", "_index")
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        keys: Sequence[int],
+        offsets: Sequence[int],
+        targets: Sequence[int],
+        index: Optional[Mapping[str, int]] = None,
+    ) -> None:
+        self.names = names
+        self.keys = keys
+        self.offsets = offsets
+        self.targets = targets
+        if index is None:
+            index = {name: node for node, name in enumerate(names)}
+        self._index = index
+
+    @classmethod
+    def from_mapping(cls, dependencies: Dependencies) -> CompactGraph:
+        """
+        Builds a graph from a package-to-dependencies mapping.
+
+        Args:
+            dependencies (Dependencies): The dependency mapping, e.g. as
+                loaded from a JSON manifest.
+
+        Returns:
+            CompactGraph: The compact graph.
+        """
+        builder = GraphBuilder()
+        for pkg, deps in dependencies.items():
+            builder.add(pkg, deps)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._index
+
+    @property
+    def num_edges(self) -> int:
+        """int: Total number of dependency edges."""
+        return self.offsets[len(self.names)]
+
+    def id_of(self, name: str) -> int:
+        """
+        Returns the id of a package.
+
+        Args:
+            name (str): The package name.
+
+        Returns:
+            int: The interned id.
+
+        Raises:
+            KeyError: If the package does not appear in the graph.
+        """
+        return self._index[name]
+
+    def get_id(self, name: str) -> Optional[int]:
+        """
+        Returns the id of a package, or None if it is not in the graph.
+
+        Args:
+            name (str): The package name.
+
+        Returns:
+            Optional[int]: The interned id.
+        """
+        return self._index.get(name)
+
+    def successors(self, node: int) -> Sequence[int]:
+        """
+        Returns the dependency ids of a node.
+
+        Args:
+            node (int): The node id.
+
+        Returns:
+            Sequence[int]: Ids of the direct dependencies.
+        """
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def reversed(self) -> CompactGraph:
+        """
+        Returns the graph with every edge reversed.
+
+        The reversed graph shares the names and keys of this graph; the
+        successors of a node are the packages that depend on it.
+
+        Returns:
+            CompactGraph: The reversed graph.
+        """
+        size = len(self.names)
+        offsets, targets = self.offsets, self.targets
+        counts = array("i", bytes(4 * (size + 1)))
+        for dep in targets:
+            counts[dep + 1] += 1
+        for node in range(size):
+            counts[node + 1] += counts[node]
+        reverse_offsets = array("i", counts)
+        reverse_targets = array("i", bytes(4 * len(targets)))
+        for node in range(size):
+            for pos in range(offsets[node], offsets[node + 1]):
+                dep = targets[pos]
+                reverse_targets[counts[dep]] = node
+                counts[dep] += 1
+        return CompactGraph(
+            self.names, self.keys, reverse_offsets, reverse_targets, self._index
+        )
+
+    def with_keys(self, keys: Sequence[int]) -> CompactGraph:
+        """
+        Returns the same graph with different top-level packages.
+
+        The new graph shares all arrays with this one.
+
+        Args:
+            keys (Sequence[int]): Ids of the new top-level packages.
+
+        Returns:
+            CompactGraph: The graph.
+        """
+        return CompactGraph(self.names, keys, self.offsets, self.targets, self._index)
+
+    def to_mapping(self) -> Dict[str, List[str]]:
+        """
+        Converts the graph back to a package-to-dependencies mapping.
+
+        Returns:
+            Dict[str, List[str]]: The dependency mapping of the top-level
+            packages.
+        """
+        names = self.names
+        return {
+            names[key]: [names[dep] for dep in self.successors(key)]
+            for key in self.keys
+        }
+
+
+class GraphBuilder:
+    """
+    Incrementally builds a CompactGraph from package definitions.
+
+    Packages are added one at a time, so a manifest never has to be held in
+    memory as a dictionary. Redefining a package replaces its dependencies
+    but keeps its original position, like a JSON object with duplicate keys.
+    Repeated dependencies within one list are kept once.
+    """
+
+    __slots__ = ("_names", "_index", "_keys", "_deps")
+
+    def __init__(self) -> None:
+        self._names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._keys = array("i")
+        self._deps: List[Optional[array[int]]] = []
+
+    def intern(self, name: str) -> int:
+        """
+        Returns the id of a package name, assigning a new one if needed.
+
+        Args:
+            name (str): The package name.
+
+        Returns:
+            int: The interned id.
+        """
+        node = self._index.get(name)
+        if node is None:
+            node = len(self._names)
+            self._index[name] = node
+            self._names.append(name)
+            self._deps.append(None)
+        return node
+
+    def add(self, pkg: str, deps: Iterable[str]) -> int:
+        """
+        Adds a top-level package and its direct dependencies.
+
+        Args:
+            pkg (str): The package name.
+            deps (Iterable[str]): Names of the direct dependencies.
+
+        Returns:
+            int: The id of the package.
+        """
+        node = self.intern(pkg)
+        if self._deps[node] is None:
+            self._keys.append(node)
+        unique_deps = dict.fromkeys(deps)
+        self._deps[node] = array("i", [self.intern(dep) for dep in unique_deps])
+        return node
+
+    def build(self) -> CompactGraph:
+        """
+        Finalizes the CSR buffers.
+
+        Returns:
+            CompactGraph: The built graph.
+        """
+        offsets = array("i", [0])
+        targets = array("i")
+        for deps in self._deps:
+            if deps is not None:
+                targets.extend(deps)
+            offsets.append(len(targets))
+        return CompactGraph(self._names, self._keys, offsets, targets, self._index)
+
+
+def as_graph(dependencies: Union[Dependencies, CompactGraph]) -> CompactGraph:
+    """
+    Returns the input as a CompactGraph, building one from a mapping if needed.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): A dependency mapping
+            or an already built graph.
+
+    Returns:
+        CompactGraph: The compact graph.
+    """
+    if isinstance(dependencies, CompactGraph):
+        return dependencies
+    return CompactGraph.from_mapping(dependencies)
+
+
+def as_array(values: Sequence[int]) -> "array[int]":
+    """
+    Returns a sequence of ids as an ``array('i')``, copying it if needed.
+
+    Graphs loaded from a snapshot hold ``memoryview`` objects, which cannot
+    be pickled; buffers are copied with a single memory copy.
+
+    Args:
+        values (Sequence[int]): The ids.
+
+    Returns:
+        array[int]: The ids, or ``values`` itself if it already is one.
+    """
+    if isinstance(values, array) and values.typecode == "i":
+        return values
+    result = array("i")
+    if isinstance(values, memoryview) and values.format == "i":
+        result.frombytes(values.cast("B"))
+    else:
+        result.extend(values)
+    return result
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from typing import Iterator, Mapping, Optional, OrderedDict, Union
+
+from . import cycles
+from .graph import CompactGraph, Dependencies, as_graph
+from .resolver import DependencyGraph, resolve_package
+
+#: Default number of resolved subtrees kept by a LazyDependencyGraph.
+DEFAULT_MAX_SUBTREES = 4096
+
+
+class _LRUMemo(OrderedDict[int, DependencyGraph]):
+    """Resolver memo that returns None for packages it does not hold."""
+
+    def __missing__(self, node: int) -> None:
+        return None
+
+
+class LazyDependencyGraph(Mapping[str, DependencyGraph]):
+    """
+    Resolved dependency graph that resolves packages on first access.
+
+    The view behaves like the result of
+    :func:`dep_resolver.resolver.resolve_dependencies`: it has the same
+    keys in the same order, every value is the nested dictionary of a
+    package's dependencies, and it compares equal to the eager result. A
+    package is only resolved when it is looked up. Its subtree and the
+    subtrees of all packages resolved along the way are kept in a
+    least-recently-used cache, so later lookups reuse them.
+
+    The cache holds at most ``max_subtrees`` subtrees; older ones are
+    dropped after every lookup and resolved again when needed. Subtrees
+    still referenced by the caller or by a cached parent stay in memory,
+    so the bound limits what the view itself keeps alive rather than the
+    size of a single subtree.
+
+    Circular dependencies are only detected when a package whose
+    dependencies contain the cycle is looked up.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The initial
+            dependency mapping or its compact graph.
+        collapse_cycles (bool): Resolve the graph even if it contains cycles
+            (see :func:`dep_resolver.resolver.resolve_dependencies`).
+        max_subtrees (Optional[int]): Maximum number of cached subtrees, or
+            None for no limit.
+
+    Attributes:
+        graph (CompactGraph): The graph the packages are resolved from.
+    """
+
+    def __init__(
+        self,
+        dependencies: Union[Dependencies, CompactGraph],
+        collapse_cycles: bool = False,
+        max_subtrees: Optional[int] = DEFAULT_MAX_SUBTREES,
+    ) -> None:
+        graph = as_graph(dependencies)
+        if collapse_cycles:
+            graph = cycles.collapse_cycles(graph)
+        self.graph = graph
+        self._max_subtrees = max_subtrees
+        self._memo = _LRUMemo()
+        self._on_path = bytearray(len(graph))
+        self._is_key = bytearray(len(graph))
+        for key in graph.keys:
+            self._is_key[key] = 1
+
+    def __getitem__(self, pkg: str) -> DependencyGraph:
+        """
+        Resolves a top-level package, or returns its cached subtree.
+
+        Args:
+            pkg (str): The package name.
+
+        Returns:
+            DependencyGraph: The resolved dependencies of the package.
+
+        Raises:
+            KeyError: If the package is not a top-level package.
+            CircularDependencyError: If the dependencies of the package
+                contain a cycle.
+        """
+        node = self.graph.get_id(pkg)
+        if node is None or not self._is_key[node]:
+            raise KeyError(pkg)
+        memo = self._memo
+        cached = memo.get(node)
+        if cached is not None:
+            memo.move_to_end(node)
+            return cached
+        try:
+            sub_deps = resolve_package(node, self.graph, memo, self._on_path)
+        except Exception:
+            # The flags of the abandoned path are still set.
+            self._on_path = bytearray(len(self.graph))
+            raise
+        finally:
+            if self._max_subtrees is not None:
+                while len(memo) > self._max_subtrees:
+                    memo.popitem(last=False)
+        return sub_deps
+
+    def __contains__(self, pkg: object) -> bool:
+        node = self.graph.get_id(pkg) if isinstance(pkg, str) else None
+        return node is not None and bool(self._is_key[node])
+
+    def __iter__(self) -> Iterator[str]:
+        names = self.graph.names
+        return (names[key] for key in self.graph.keys)
+
+    def __len__(self) -> int:
+        return len(self.graph.keys)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} packages)"
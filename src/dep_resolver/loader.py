@@ -0,0 +1,453 @@
+from __future__ import annotations
+import glob
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .graph import CompactGraph, GraphBuilder
+
+#: Number of characters read from the manifest at a time.
+CHUNK_SIZE = 1 << 16
+
+#: How to handle a package defined in more than one manifest: raise a
+#: ManifestConflictError, keep the first or the last definition, or merge
+#: the dependency lists.
+CONFLICT_POLICIES = ("error", "first", "last", "union")
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+Check = Callable[[str, Any], Optional[str]]
+
+
+class ManifestDecodeError(json.JSONDecodeError):
+    """
+    Raised when a manifest is not a valid JSON object of dependency lists.
+
+    Unlike a plain JSONDecodeError, the position refers to the whole file,
+    even though only a small part of it is held in memory.
+
+    Attributes:
+        msg (str): The unformatted error message.
+        pos (int): Character offset of the error in the file.
+        lineno (int): Line of the error, starting at 1.
+        colno (int): Column of the error, starting at 1.
+    """
+
+    def __init__(self, msg: str, pos: int, lineno: int, colno: int) -> None:
+        ValueError.__init__(self, f"{msg}: line {lineno} column {colno} (char {pos})")
+        self.msg = msg
+        self.doc = ""
+        self.pos = pos
+        self.lineno = lineno
+        self.colno = colno
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return self.__class__, (self.msg, self.pos, self.lineno, self.colno)
+
+
+class ManifestConflictError(ValueError):
+    """
+    Raised when two manifests define the same package.
+
+    Attributes:
+        package (str): The package name.
+        sources (Tuple[str, str]): Paths of the first and second manifest
+            defining it.
+    """
+
+    def __init__(self, package: str, first: str, second: str) -> None:
+        super().__init__(f"Package {package!r} is defined in {first} and {second}")
+        self.package = package
+        self.sources = (first, second)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return self.__class__, (self.package, *self.sources)
+
+
+class MergedManifest(NamedTuple):
+    """
+    Dependency graph merged from several manifests.
+
+    Attributes:
+        graph (CompactGraph): The merged graph.
+        sources (List[str]): Paths of the manifests, in load order.
+        origins (Dict[str, int]): Index in ``sources`` of the manifest
+            that defined every top-level package. With the "union" policy
+            it is the first manifest defining the package.
+    """
+
+    graph: CompactGraph
+    sources: List[str]
+    origins: Dict[str, int]
+
+    def source_of(self, pkg: str) -> Optional[str]:
+        """
+        Returns the manifest that defined a package.
+
+        Args:
+            pkg (str): The package name.
+
+        Returns:
+            Optional[str]: The path, or None if the package only appears as
+            a dependency.
+        """
+        index = self.origins.get(pkg)
+        return None if index is None else self.sources[index]
+
+
+def load_manifest(
+    source: Union[str, "os.PathLike[str]", IO[str]], chunk_size: int = CHUNK_SIZE
+) -> CompactGraph:
+    """
+    Loads a JSON manifest straight into a CompactGraph.
+
+    The top-level object is parsed one package at a time, so memory is
+    bounded by the size of the graph rather than the size of the JSON text.
+
+    Args:
+        source (Union[str, os.PathLike[str], IO[str]]): Path of the manifest
+            or an open text stream.
+        chunk_size (int): Number of characters read at a time.
+
+    Returns:
+        CompactGraph: The dependency graph.
+
+    Raises:
+        ManifestDecodeError: If the manifest is malformed or a package's
+            dependencies are not a list of package names.
+    """
+    builder = GraphBuilder()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8") as f:
+            for pkg, deps in iter_manifest(f, _check_dependencies, chunk_size):
+                builder.add(pkg, deps)
+    else:
+        for pkg, deps in iter_manifest(source, _check_dependencies, chunk_size):
+            builder.add(pkg, deps)
+    return builder.build()
+
+
+def expand_manifest_paths(
+    patterns: Sequence[Union[str, "os.PathLike[str]"]],
+) -> List[Path]:
+    """
+    Expands manifest paths, glob patterns and directories into files.
+
+    Directories stand for every ``*.json`` file below them. Glob patterns
+    support ``**``. The matches of every pattern are sorted, and files
+    matched more than once are only listed the first time.
+
+    Args:
+        patterns (Sequence[Union[str, os.PathLike[str]]]): Files, glob
+            patterns or directories.
+
+    Returns:
+        List[Path]: The manifest files.
+
+    Raises:
+        FileNotFoundError: If a pattern matches no file.
+    """
+    paths: Dict[Path, None] = {}
+    for pattern in patterns:
+        pattern = os.fspath(pattern)
+        if os.path.isdir(pattern):
+            matches = sorted(Path(pattern).rglob("*.json"))
+        elif glob.has_magic(pattern):
+            matches = sorted(map(Path, glob.glob(pattern, recursive=True)))
+        else:
+            matches = [Path(pattern)] if os.path.isfile(pattern) else []
+        matches = [path for path in matches if path.is_file()]
+        if not matches:
+            raise FileNotFoundError(f"File not found: {pattern}")
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+def load_manifests(
+    sources: Sequence[Union[str, "os.PathLike[str]"]],
+    conflict: str = "error",
+    jobs: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> MergedManifest:
+    """
+    Loads several manifests concurrently and merges them into one graph.
+
+    Every manifest is parsed in a thread pool; the results are merged in
+    the order of ``sources``, so the merged graph does not depend on which
+    file finished first. Top-level packages keep the position of their
+    first definition.
+
+    Args:
+        sources (Sequence[Union[str, os.PathLike[str]]]): Paths of the
+            manifests.
+        conflict (str): One of :data:`CONFLICT_POLICIES`.
+        jobs (Optional[int]): Number of threads. Defaults to one per
+            manifest, at most 32.
+        chunk_size (int): Number of characters read at a time.
+
+    Returns:
+        MergedManifest: The merged graph and the source of every package.
+
+    Raises:
+        ManifestDecodeError: If a manifest is malformed. The message starts
+            with the path of the manifest.
+        ManifestConflictError: If two manifests define the same package and
+            ``conflict`` is "error".
+        ValueError: If ``conflict`` is not a known policy.
+    """
+    if conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy: {conflict}")
+    paths = [os.fspath(source) for source in sources]
+
+    def read(path: str) -> List[Tuple[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return list(iter_manifest(f, _check_dependencies, chunk_size))
+        except ManifestDecodeError as e:
+            raise ManifestDecodeError(f"{path}: {e.msg}", e.pos, e.lineno, e.colno)
+
+    workers = jobs or min(32, len(paths)) or 1
+    with ThreadPoolExecutor(workers) as executor:
+        manifests = list(executor.map(read, paths))
+
+    merged: Dict[str, List[str]] = {}
+    origins: Dict[str, int] = {}
+    for index, pairs in enumerate(manifests):
+        for pkg, deps in pairs:
+            origin = origins.get(pkg)
+            if origin is None or origin == index:
+                # Repeated keys within one manifest behave as in load_manifest.
+                merged[pkg] = deps
+                origins[pkg] = index
+            elif conflict == "error":
+                raise ManifestConflictError(pkg, paths[origin], paths[index])
+            elif conflict == "last":
+                merged[pkg] = deps
+                origins[pkg] = index
+            elif conflict == "union":
+                merged[pkg] = merged[pkg] + deps
+    builder = GraphBuilder()
+    for pkg, deps in merged.items():
+        builder.add(pkg, deps)
+    return MergedManifest(builder.build(), paths, origins)
+
+
+def iter_manifest(
+    fp: IO[str], check: Optional[Check] = None, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields the key-value pairs of a top-level JSON object one at a time.
+
+    Args:
+        fp (IO[str]): Text stream positioned at the start of the document.
+        check (Optional[Check]): Called with every pair; returns an error
+            message if the value is not acceptable.
+        chunk_size (int): Number of characters read at a time.
+
+    Yields:
+        Tuple[str, Any]: The next key and its decoded value.
+
+    Raises:
+        ManifestDecodeError: If the document is malformed or ``check``
+            rejects a value.
+    """
+    reader = _Reader(fp, chunk_size)
+    if reader.peek() != "{":
+        raise reader.error("Expecting '{'")
+    reader.advance()
+    if reader.peek() == "}":
+        reader.advance()
+    else:
+        while True:
+            if reader.peek() != '"':
+                raise reader.error("Expecting property name enclosed in double quotes")
+            key = reader.decode()
+            if reader.peek() != ":":
+                raise reader.error("Expecting ':' delimiter")
+            reader.advance()
+            reader.peek()
+            location = reader.location()
+            value = reader.decode()
+            if check is not None:
+                message = check(key, value)
+                if message is not None:
+                    raise ManifestDecodeError(message, *location)
+            yield key, value
+            char = reader.peek()
+            reader.advance()
+            if char == "}":
+                break
+            if char != ",":
+                raise reader.error("Expecting ',' delimiter", reader.pos - 1)
+    if reader.peek() != "":
+        raise reader.error("Extra data")
+
+
+def _check_dependencies(pkg: str, deps: Any) -> Optional[str]:
+    """
+    Checks that a package maps to a list of package names.
+
+    Args:
+        pkg (str): The package name.
+        deps (Any): The decoded value.
+
+    Returns:
+        Optional[str]: The error message, or None if the value is valid.
+    """
+    if not isinstance(deps, list) or not all(isinstance(dep, str) for dep in deps):
+        return f"Dependencies of {pkg!r} must be a list of package names"
+    return None
+
+
+class _Reader:
+    """
+    Buffered cursor over a text stream that tracks line and column numbers.
+
+    Only the unparsed tail of the stream is kept in memory; the consumed
+    prefix is dropped whenever more text is read.
+    """
+
+    __slots__ = (
+        "_fp",
+        "_chunk_size",
+        "_buf",
+        "pos",
+        "_eof",
+        "_offset",
+        "_line",
+        "_col",
+    )
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, fp: IO[str], chunk_size: int) -> None:
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self.pos = 0
+        self._eof = False
+        # File position, line and column of the first buffered character.
+        self._offset = 0
+        self._line = 1
+        self._col = 1
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or "" at the end."""
+        while True:
+            match = _WHITESPACE.match(self._buf, self.pos)
+            self.pos = match.end()  # type: ignore[union-attr]
+            if self.pos < len(self._buf):
+                return self._buf[self.pos]
+            if not self._read(self._chunk_size):
+                return ""
+
+    def advance(self) -> None:
+        """Consumes the character returned by :meth:`peek`."""
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """
+        Decodes the JSON value at the cursor, reading more text as needed.
+
+        Returns:
+            Any: The decoded value.
+
+        Raises:
+            ManifestDecodeError: If the value is malformed.
+        """
+        last_error = None
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self.pos)
+            except json.JSONDecodeError as e:
+                error = (e.msg, self._offset + e.pos)
+                truncated = e.pos >= len(self._buf) - 1 or e.msg.startswith(
+                    "Unterminated string"
+                )
+                if (truncated or error != last_error) and self._read(
+                    len(self._buf) - self.pos
+                ):
+                    last_error = error
+                    continue
+                raise self.error(e.msg, e.pos) from None
+            # A number at the end of the buffer might continue in the stream.
+            if end < len(self._buf) or not self._read(self._chunk_size):
+                self.pos = end
+                return value
+
+    def location(self, pos: Optional[int] = None) -> Tuple[int, int, int]:
+        """
+        Converts a buffer position to file-wide coordinates.
+
+        Args:
+            pos (Optional[int]): Position in the buffer; defaults to the
+                cursor.
+
+        Returns:
+            Tuple[int, int, int]: Character offset, line and column.
+        """
+        if pos is None:
+            pos = self.pos
+        newlines = self._buf.count("\n", 0, pos)
+        if newlines:
+            colno = pos - self._buf.rindex("\n", 0, pos)
+        else:
+            colno = self._col + pos
+        return self._offset + pos, self._line + newlines, colno
+
+    def error(self, msg: str, pos: Optional[int] = None) -> ManifestDecodeError:
+        """
+        Builds an error for a buffer position.
+
+        Args:
+            msg (str): The error message.
+            pos (Optional[int]): Position in the buffer; defaults to the
+                cursor.
+
+        Returns:
+            ManifestDecodeError: The error to raise.
+        """
+        return ManifestDecodeError(msg, *self.location(pos))
+
+    def _read(self, size: int) -> bool:
+        """
+        Appends more text to the buffer, dropping the consumed prefix.
+
+        Args:
+            size (int): Minimum number of characters to request.
+
+        Returns:
+            bool: False if the stream is exhausted.
+        """
+        if self._eof:
+            return False
+        data = self._fp.read(max(size, self._chunk_size))
+        if not data:
+            self._eof = True
+            return False
+        consumed = self.pos
+        newlines = self._buf.count("\n", 0, consumed)
+        if newlines:
+            self._line += newlines
+            self._col = consumed - self._buf.rindex("\n", 0, consumed)
+        else:
+            self._col += consumed
+        self._offset += consumed
+        self._buf = self._buf[consumed:] + data
+        self.pos = 0
+        return True
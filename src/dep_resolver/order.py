@@ -0,0 +1,79 @@
+from __future__ import annotations
+from typing import List, Optional, Sequence, Union
+
+from .cycles import find_cycles
+from .graph import CompactGraph, Dependencies, as_graph
+from .resolver import CircularDependencyError
+
+
+def install_order(
+    dependencies: Union[Dependencies, CompactGraph],
+    roots: Optional[Sequence[str]] = None,
+) -> List[List[str]]:
+    """
+    Computes a layered topological install order with Kahn's algorithm.
+
+    Every package comes after all of its dependencies. Packages within one
+    layer do not depend on each other and can be installed concurrently, so
+    the number of layers is the length of the critical path. The order is
+    computed straight from the dependency mapping without expanding the
+    dependency tree.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The dependency
+            mapping or its compact graph.
+        roots (Optional[Sequence[str]]): Order only these packages and their
+            transitive dependencies instead of every package.
+
+    Returns:
+        List[List[str]]: The layers, each in graph order.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected.
+        KeyError: If a root does not appear in the graph.
+    """
+    graph = as_graph(dependencies)
+    names = graph.names
+    offsets = graph.offsets
+    dependents = graph.reversed()
+    if roots is None:
+        selected = bytearray(b"\x01" * len(graph))
+    else:
+        selected = _reachable(graph, [graph.id_of(pkg) for pkg in roots])
+    remaining = [
+        offsets[node + 1] - offsets[node] if selected[node] else -1
+        for node in range(len(graph))
+    ]
+    layer = [node for node, count in enumerate(remaining) if count == 0]
+    layers: List[List[str]] = []
+    placed = 0
+    while layer:
+        layers.append([names[node] for node in layer])
+        placed += len(layer)
+        next_layer = []
+        for node in layer:
+            for dependent in dependents.successors(node):
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    next_layer.append(dependent)
+        next_layer.sort()
+        layer = next_layer
+    if placed < sum(selected):
+        for group in find_cycles(graph):
+            if selected[graph.id_of(group.packages[0])]:
+                raise CircularDependencyError(group.cycle)
+    return layers
+
+
+def _reachable(graph: CompactGraph, roots: Sequence[int]) -> bytearray:
+    """Flags the roots and every package they transitively depend on."""
+    seen = bytearray(len(graph))
+    stack = list(roots)
+    for node in stack:
+        seen[node] = 1
+    while stack:
+        for dep in graph.successors(stack.pop()):
+            if not seen[dep]:
+                seen[dep] = 1
+                stack.append(dep)
+    return seen
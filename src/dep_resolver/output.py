@@ -0,0 +1,37 @@
+from __future__ import annotations
+import io
+import sys
+from typing import IO, Any, Iterable, Optional
+
+# Only the standard library is imported here, so that commands which just
+# write text, like the client, do not load the resolver.
+
+#: Approximate number of lines joined into a single write.
+CHUNK_LINES = 8192
+
+
+def write_chunks(chunks: Iterable[str], stream: Optional[IO[Any]] = None) -> None:
+    """
+    Writes text chunks to a stream.
+
+    Binary streams receive UTF-8 encoded output. If the reader closes the
+    pipe early (e.g. ``head``), the BrokenPipeError propagates for the
+    caller to handle quietly.
+
+    Args:
+        chunks (Iterable[str]): Chunks of newline-terminated lines.
+        stream (Optional[IO[Any]]): Text or binary stream to write to.
+            Defaults to ``sys.stdout``.
+
+    Raises:
+        BrokenPipeError: If the reading end of the stream was closed.
+    """
+    if stream is None:
+        stream = sys.stdout
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        for chunk in chunks:
+            stream.write(chunk.encode("utf-8"))
+    else:
+        for chunk in chunks:
+            stream.write(chunk)
+    stream.flush()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+import os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, List, Optional, Sequence, Tuple, Union
+
+from . import cycles
+from .graph import CompactGraph, Dependencies, as_array, as_graph
+from .resolver import (
+    CircularDependencyError,
+    DependencyGraph,
+    PackedGraph,
+    pack_graph,
+    resolve_dependencies,
+    unpack_graph,
+)
+from .stats import Stats
+
+#: Graphs with fewer packages are resolved serially; starting the worker
+#: processes would take longer than resolving them.
+MIN_PARALLEL_PACKAGES = 50_000
+
+# The graph of the current worker process, set by _init_worker.
+_worker_graph: Optional[CompactGraph] = None
+
+
+def available_cpus() -> int:
+    """
+    Returns the number of CPUs this process may run on.
+
+    Returns:
+        int: The size of the CPU affinity mask where the platform has one,
+        otherwise the number of CPUs.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def weakly_connected_components(graph: CompactGraph) -> List[List[int]]:
+    """
+    Splits a graph into groups of packages connected by dependencies.
+
+    Edges are followed in both directions, so no package of one component
+    depends on a package of another one.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+
+    Returns:
+        List[List[int]]: Sorted node ids of every component, ordered by
+        their first member.
+    """
+    dependents = graph.reversed()
+    seen = bytearray(len(graph))
+    components = []
+    for start in range(len(graph)):
+        if seen[start]:
+            continue
+        seen[start] = 1
+        component = [start]
+        queue: Deque[int] = deque(component)
+        while queue:
+            node = queue.popleft()
+            for neighbors in (graph.successors(node), dependents.successors(node)):
+                for neighbor in neighbors:
+                    if not seen[neighbor]:
+                        seen[neighbor] = 1
+                        component.append(neighbor)
+                        queue.append(neighbor)
+        component.sort()
+        components.append(component)
+    return components
+
+
+def resolve_parallel(
+    dependencies: Union[Dependencies, CompactGraph],
+    jobs: Optional[int] = None,
+    collapse_cycles: bool = False,
+    stats: Optional[Stats] = None,
+    min_packages: int = MIN_PARALLEL_PACKAGES,
+) -> DependencyGraph:
+    """
+    Resolves independent parts of the graph in a pool of worker processes.
+
+    This is experimental. The main process still finds the components and
+    unpacks the results of the workers into one nested dictionary, which
+    takes about as long as resolving the graph serially, so it has not yet
+    been measured to be faster than :func:`resolve_dependencies`.
+
+    The graph is split into weakly connected components, which are spread
+    over ``jobs`` batches of similar size. Every worker resolves its batches
+    against a copy of the graph sent once at startup and returns them as a
+    :class:`dep_resolver.resolver.PackedGraph`; the results are merged in
+    the original key order. The result is equal to the one of
+    :func:`dep_resolver.resolver.resolve_dependencies`, which is used
+    directly for graphs smaller than ``min_packages``, with a single
+    component, or if this process may only run on a single CPU.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The initial
+            dependency mapping or its compact graph.
+        jobs (Optional[int]): Number of worker processes, at most the
+            number of CPUs available to this process, which is also the
+            default.
+        collapse_cycles (bool): Resolve the graph even if it contains cycles
+            (see :func:`dep_resolver.resolver.resolve_dependencies`).
+        stats (Optional[Stats]): Receives the resolver counters.
+        min_packages (int): Smallest graph resolved in parallel.
+
+    Returns:
+        DependencyGraph: The resolved dependency graph.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected and
+            ``collapse_cycles`` is not set.
+    """
+    graph = as_graph(dependencies)
+    if collapse_cycles:
+        graph = cycles.collapse_cycles(graph)
+    cpus = available_cpus()
+    jobs = cpus if jobs is None else min(jobs, cpus)
+    if jobs < 2 or len(graph) < min_packages:
+        return resolve_dependencies(graph, stats=stats)
+    batches = _batches(graph, weakly_connected_components(graph), jobs)
+    if len(batches) < 2:
+        return resolve_dependencies(graph, stats=stats)
+
+    data = (list(graph.names), as_array(graph.offsets), as_array(graph.targets))
+    try:
+        with ProcessPoolExecutor(
+            len(batches), initializer=_init_worker, initargs=data
+        ) as executor:
+            results = list(executor.map(_resolve_batch, batches))
+    except CircularDependencyError:
+        # Resolve serially to report the same cycle as the serial path.
+        return resolve_dependencies(graph, stats=stats)
+
+    parts: DependencyGraph = {}
+    for packed, batch_stats in results:
+        parts.update(unpack_graph(packed))
+        if stats is not None:
+            stats.nodes_expanded += batch_stats.nodes_expanded
+            stats.edges_traversed += batch_stats.edges_traversed
+            stats.memo_hits += batch_stats.memo_hits
+            stats.max_depth = max(stats.max_depth, batch_stats.max_depth)
+    names = graph.names
+    return {names[key]: parts[names[key]] for key in graph.keys}
+
+
+def _batches(
+    graph: CompactGraph, components: List[List[int]], jobs: int
+) -> List["array[int]"]:
+    """
+    Spreads the top-level packages of the components over balanced batches.
+
+    Components are assigned largest first to the batch with the fewest
+    packages so far.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        components (List[List[int]]): The weakly connected components.
+        jobs (int): Maximum number of batches.
+
+    Returns:
+        List[array[int]]: Top-level package ids of every non-empty batch, in
+        key order.
+    """
+    is_key = bytearray(len(graph))
+    for key in graph.keys:
+        is_key[key] = 1
+    sizes = [0] * jobs
+    members: List[List[int]] = [[] for _ in range(jobs)]
+    for component in sorted(components, key=len, reverse=True):
+        smallest = sizes.index(min(sizes))
+        sizes[smallest] += len(component)
+        members[smallest].extend(node for node in component if is_key[node])
+    position = array("i", bytes(4 * len(graph)))
+    for pos, key in enumerate(graph.keys):
+        position[key] = pos
+    return [
+        array("i", sorted(batch, key=position.__getitem__))
+        for batch in members
+        if batch
+    ]
+
+
+def _init_worker(
+    names: List[str], offsets: Sequence[int], targets: Sequence[int]
+) -> None:
+    global _worker_graph
+    _worker_graph = CompactGraph(names, array("i"), offsets, targets)
+
+
+def _resolve_batch(keys: Sequence[int]) -> Tuple[PackedGraph, Stats]:
+    """
+    Resolves a batch of top-level packages in a worker process.
+
+    Args:
+        keys (Sequence[int]): Ids of the top-level packages, in key order.
+
+    Returns:
+        Tuple[PackedGraph, Stats]: The packed resolved graph of the batch
+        and the resolver counters.
+    """
+    assert _worker_graph is not None
+    stats = Stats()
+    resolved = resolve_dependencies(_worker_graph.with_keys(keys), stats=stats)
+    return pack_graph(resolved), stats
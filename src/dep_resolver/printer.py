@@ -1,35 +1,224 @@
 from __future__ import annotations
-from typing import Dict
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Union,
+)
+
+from .graph import CompactGraph
+from .output import CHUNK_LINES, write_chunks
+from .resolver import CircularDependencyError
 
 DependencyGraph = Dict[str, "DependencyGraph"]
 
+DEDUPED_MARKER = " (deduped)"
+
 
 def print_dependency_graph(
-    resolved_graph: DependencyGraph, indent_size: int = 4
+    resolved_graph: Union[Mapping[str, DependencyGraph], CompactGraph],
+    indent_size: int = 4,
+    dedupe: bool = False,
+    stream: Optional[IO[Any]] = None,
 ) -> None:
     """
     Prints the resolved dependency graph.
 
+    A CompactGraph is printed straight from its adjacency arrays without
+    building the nested dictionaries first.
+
+    In dedupe mode the dependencies of a package are only printed the first
+    time the package appears. Later appearances are printed as a single
+    line marked "(deduped)", so the output grows with the number of edges
+    instead of the number of paths. Packages without dependencies are never
+    marked. This assumes that every appearance of a package has the same
+    subtree, which does not hold for a depth-limited result of
+    :func:`dep_resolver.resolver.resolve_dependencies`.
+
     Args:
-        resolved_graph (DependencyGraph): The resolved dependency graph.
+        resolved_graph (Union[Mapping[str, DependencyGraph], CompactGraph]):
+            The resolved dependency graph (e.g. a
+            :class:`dep_resolver.lazy.LazyDependencyGraph`), or the compact
+            graph to expand.
         indent_size (int): Number of spaces for indentation.
+        dedupe (bool): Expand every package only once.
+        stream (Optional[IO[Any]]): Text or binary stream to write to.
+            Defaults to ``sys.stdout``.
+
+    Raises:
+        CircularDependencyError: If a CompactGraph contains a cycle.
+        BrokenPipeError: If the reading end of the stream was closed.
     """
-    for pkg in resolved_graph:
-        _print_tree(pkg, resolved_graph[pkg], indent=0, indent_size=indent_size)
+    write_chunks(iter_tree_chunks(resolved_graph, indent_size, dedupe), stream)
 
 
-def _print_tree(
-    pkg: str, sub_deps: DependencyGraph, indent: int, indent_size: int
+def print_install_order(
+    layers: List[List[str]], stream: Optional[IO[Any]] = None
 ) -> None:
     """
-    Recursively prints the dependency tree.
+    Prints a layered install order with the width of every layer.
+
+    Args:
+        layers (List[List[str]]): Layers of packages that can be installed
+            concurrently, dependencies first.
+        stream (Optional[IO[Any]]): Text or binary stream to write to.
+            Defaults to ``sys.stdout``.
+
+    Raises:
+        BrokenPipeError: If the reading end of the stream was closed.
+    """
+    lines = [
+        f"Layer {number} (width {len(layer)}): " + ", ".join(layer)
+        for number, layer in enumerate(layers, start=1)
+    ]
+    lines.append(f"Critical path length: {len(layers)}")
+    lines.append("")
+    write_chunks(["\n".join(lines)], stream)
+
+
+def iter_tree_chunks(
+    resolved_graph: Union[Mapping[str, DependencyGraph], CompactGraph],
+    indent_size: int = 4,
+    dedupe: bool = False,
+    chunk_lines: int = CHUNK_LINES,
+) -> Iterator[str]:
+    """
+    Yields the printed dependency tree in chunks of complete lines.
+
+    The tree is walked with an explicit stack, the indentation prefix of
+    every depth is built only once, and lines are joined in batches of
+    about ``chunk_lines`` so the caller performs few, large writes.
+
+    Args:
+        resolved_graph (Union[Mapping[str, DependencyGraph], CompactGraph]):
+            The resolved dependency graph (e.g. a
+            :class:`dep_resolver.lazy.LazyDependencyGraph`), or the compact
+            graph to expand.
+        indent_size (int): Number of spaces for indentation.
+        dedupe (bool): Expand every package only once.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+
+    Raises:
+        CircularDependencyError: If a CompactGraph contains a cycle.
+    """
+    if isinstance(resolved_graph, CompactGraph):
+        return _iter_graph_chunks(resolved_graph, indent_size, dedupe, chunk_lines)
+    return _iter_mapping_chunks(resolved_graph, indent_size, dedupe, chunk_lines)
+
+
+def _iter_mapping_chunks(
+    resolved_graph: Mapping[str, DependencyGraph],
+    indent_size: int,
+    dedupe: bool,
+    chunk_lines: int,
+) -> Iterator[str]:
+    """
+    Yields the tree of a resolved dependency graph in chunks.
+
+    Args:
+        resolved_graph (Mapping[str, DependencyGraph]): The resolved
+            dependency graph.
+        indent_size (int): Number of spaces for indentation.
+        dedupe (bool): Expand every package only once.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+    """
+    prefixes = ["- "]
+    expanded: Set[str] = set()
+    lines: List[str] = []
+    append = lines.append
+    stack = [iter(resolved_graph.items())]
+    while stack:
+        prefix = prefixes[len(stack) - 1]
+        for pkg, sub_deps in stack[-1]:
+            if dedupe and sub_deps:
+                if pkg in expanded:
+                    append(prefix + pkg + DEDUPED_MARKER)
+                    continue
+                expanded.add(pkg)
+            append(prefix + pkg)
+            if sub_deps:
+                if len(prefixes) == len(stack):
+                    prefixes.append(" " * indent_size * len(stack) + "- ")
+                stack.append(iter(sub_deps.items()))
+                break
+        else:
+            stack.pop()
+        if len(lines) >= chunk_lines:
+            lines.append("")
+            yield "\n".join(lines)
+            lines.clear()
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
+
+
+def _iter_graph_chunks(
+    graph: CompactGraph, indent_size: int, dedupe: bool, chunk_lines: int
+) -> Iterator[str]:
+    """
+    Yields the trees of all top-level packages of a compact graph in chunks.
 
     Args:
-        pkg (str): Package name.
-        sub_deps (DependencyGraph): Sub-dependencies.
-        indent (int): Current indentation level.
+        graph (CompactGraph): The dependency graph.
         indent_size (int): Number of spaces for indentation.
+        dedupe (bool): Expand every package only once.
+        chunk_lines (int): Approximate number of lines per chunk.
+
+    Yields:
+        str: The next chunk of newline-terminated lines.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected.
     """
-    print(" " * indent_size * indent + "- " + pkg)
-    for sub_pkg in sub_deps:
-        _print_tree(sub_pkg, sub_deps[sub_pkg], indent + 1, indent_size)
+    names = graph.names
+    offsets = graph.offsets
+    on_path = bytearray(len(graph))
+    expanded = bytearray(len(graph))
+    prefixes = ["- "]
+    lines: List[str] = []
+    append = lines.append
+    path: List[int] = []
+    stack: List[Iterator[int]] = [iter(graph.keys)]
+    while stack:
+        prefix = prefixes[len(stack) - 1]
+        for node in stack[-1]:
+            if on_path[node]:
+                cycle = path[path.index(node) :] + [node]
+                raise CircularDependencyError([names[pkg] for pkg in cycle])
+            if offsets[node] == offsets[node + 1]:
+                append(prefix + names[node])
+                continue
+            if dedupe:
+                if expanded[node]:
+                    append(prefix + names[node] + DEDUPED_MARKER)
+                    continue
+                expanded[node] = 1
+            append(prefix + names[node])
+            if len(prefixes) == len(stack):
+                prefixes.append(" " * indent_size * len(stack) + "- ")
+            on_path[node] = 1
+            path.append(node)
+            stack.append(iter(graph.successors(node)))
+            break
+        else:
+            stack.pop()
+            if path:
+                on_path[path.pop()] = 0
+        if len(lines) >= chunk_lines:
+            lines.append("")
+            yield "\n".join(lines)
+            lines.clear()
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
@@ -0,0 +1,366 @@
+from __future__ import annotations
+import os
+import pickle
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Union
+
+from .cycles import strongly_connected_components
+from .graph import CompactGraph, Dependencies, as_array, as_graph
+
+#: Bumped whenever the layout of a saved index changes.
+FORMAT_VERSION = 1
+
+
+class QueryIndex:
+    """
+    Precomputed transitive closures for fast dependency queries.
+
+    Every package gets a bit position in reverse topological order, so the
+    dependencies of a package always have lower positions than the package
+    itself. The closure of every package is stored as a Python int used as
+    a bitset, in both directions: the packages it depends on and the
+    packages that depend on it. The bitsets of dependents use mirrored
+    positions, so in both directions a bitset is only as wide as the
+    position of the package. Members of a cycle share their closures.
+
+    Building the index costs one bitwise OR per dependency edge; afterwards
+    :meth:`depends_on` is a single bit test, and :meth:`closure` and
+    :meth:`dependents` take time proportional to the size of the answer.
+    The bitsets need up to ``len(graph) ** 2 / 8`` bytes in total, so the
+    index is meant for graphs of up to about a hundred thousand packages.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        order (Sequence[int]): Node id at every bit position.
+        cyclic (bytearray): Flags of the nodes that are part of a cycle.
+        reach (List[int]): Bitset of every node's dependencies, including
+            the node itself.
+        reverse_reach (List[int]): Bitset of every node's dependents,
+            including the node itself, in mirrored positions.
+    """
+
+    __slots__ = ("graph", "_order", "_position", "_cyclic", "_reach", "_reverse")
+
+    def __init__(
+        self,
+        graph: CompactGraph,
+        order: Sequence[int],
+        cyclic: bytearray,
+        reach: List[int],
+        reverse_reach: List[int],
+    ) -> None:
+        self.graph = graph
+        self._order = order
+        self._position = array("i", bytes(4 * len(order)))
+        for position, node in enumerate(order):
+            self._position[node] = position
+        self._cyclic = cyclic
+        self._reach = reach
+        self._reverse = reverse_reach
+
+    @classmethod
+    def build(cls, dependencies: Union[Dependencies, CompactGraph]) -> QueryIndex:
+        """
+        Builds the index of a dependency graph.
+
+        Args:
+            dependencies (Union[Dependencies, CompactGraph]): The dependency
+                mapping or its compact graph.
+
+        Returns:
+            QueryIndex: The index.
+        """
+        graph = as_graph(dependencies)
+        components = strongly_connected_components(graph)
+        order = array("i")
+        cyclic = bytearray(len(graph))
+        for component in components:
+            order.extend(component)
+            if len(component) > 1 or component[0] in graph.successors(component[0]):
+                for node in component:
+                    cyclic[node] = 1
+        position = array("i", bytes(4 * len(graph)))
+        for pos, node in enumerate(order):
+            position[node] = pos
+        reach = _reach(graph, components, position)
+        last = len(graph) - 1
+        mirrored = array("i", [last - pos for pos in position])
+        components.reverse()
+        reverse_reach = _reach(graph.reversed(), components, mirrored)
+        return cls(graph, order, cyclic, reach, reverse_reach)
+
+    def depends_on(self, pkg: str, dependency: str) -> bool:
+        """
+        Checks whether a package transitively depends on another one.
+
+        Args:
+            pkg (str): The dependent package.
+            dependency (str): The possible dependency.
+
+        Returns:
+            bool: True if ``dependency`` is in the closure of ``pkg``. A
+            package only depends on itself if it is part of a cycle.
+
+        Raises:
+            KeyError: If either package does not appear in the graph.
+        """
+        node = self.graph.id_of(pkg)
+        target = self.graph.id_of(dependency)
+        if node == target:
+            return bool(self._cyclic[node])
+        return bool(self._reach[node] >> self._position[target] & 1)
+
+    def closure(self, pkg: str) -> List[str]:
+        """
+        Returns every package that a package transitively depends on.
+
+        Args:
+            pkg (str): The package name.
+
+        Returns:
+            List[str]: The dependencies in graph order.
+
+        Raises:
+            KeyError: If the package does not appear in the graph.
+        """
+        return self._names(self.graph.id_of(pkg), reverse=False)
+
+    def dependents(self, pkg: str) -> List[str]:
+        """
+        Returns every package that transitively depends on a package.
+
+        Args:
+            pkg (str): The package name.
+
+        Returns:
+            List[str]: The dependents in graph order.
+
+        Raises:
+            KeyError: If the package does not appear in the graph.
+        """
+        return self._names(self.graph.id_of(pkg), reverse=True)
+
+    def why(self, pkg: str, roots: Optional[Sequence[str]] = None) -> List[List[str]]:
+        """
+        Explains why a package is needed.
+
+        Returns a shortest dependency path to the package from every
+        top-level package that nothing else depends on and that needs it. A
+        group of mutually dependent packages that nothing outside the group
+        depends on counts as one such package: the path starts at its first
+        top-level member.
+
+        Args:
+            pkg (str): The package name.
+            roots (Optional[Sequence[str]]): Packages to start the paths at
+                instead of the top-level packages.
+
+        Returns:
+            List[List[str]]: The paths, each starting at a top-level package
+            and ending at ``pkg``, in graph order of their first package, or
+            in the order of ``roots``.
+
+        Raises:
+            KeyError: If a package does not appear in the graph.
+        """
+        graph = self.graph
+        target = graph.id_of(pkg)
+        bit = 1 << self._position[target]
+        paths = []
+        if roots is not None:
+            starts = list(dict.fromkeys(graph.id_of(root) for root in roots))
+        else:
+            starts = []
+            groups = set()
+            for key in sorted(graph.keys):
+                if not self._is_root(key):
+                    continue  # Something else depends on this package.
+                if self._cyclic[key]:
+                    # Members of a cycle share their closure.
+                    if self._reach[key] in groups:
+                        continue
+                    groups.add(self._reach[key])
+                starts.append(key)
+        for key in starts:
+            if key == target or self._reach[key] & bit:
+                paths.append([graph.names[node] for node in self._path(key, target)])
+        return paths
+
+    def save(self, path: Union[str, "os.PathLike[str]"]) -> None:
+        """
+        Saves the index to a file.
+
+        The file is pickled, so it must only be loaded from trusted
+        locations.
+
+        Args:
+            path (Union[str, os.PathLike[str]]): The file to write.
+        """
+        graph = self.graph
+        data = (
+            FORMAT_VERSION,
+            list(graph.names),
+            as_array(graph.keys),
+            as_array(graph.offsets),
+            as_array(graph.targets),
+            self._order,
+            self._cyclic,
+            self._reach,
+            self._reverse,
+        )
+        with open(path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Union[str, "os.PathLike[str]"]) -> QueryIndex:
+        """
+        Loads an index saved with :meth:`save`.
+
+        Args:
+            path (Union[str, os.PathLike[str]]): The file to read.
+
+        Returns:
+            QueryIndex: The index.
+
+        Raises:
+            ValueError: If the file was written by an incompatible version.
+        """
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data[0] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version: {data[0]}")
+        names, keys, offsets, targets, order, cyclic, reach, reverse = data[1:]
+        graph = CompactGraph(names, keys, offsets, targets)
+        return cls(graph, order, cyclic, reach, reverse)
+
+    def _names(self, node: int, reverse: bool) -> List[str]:
+        """
+        Decodes the closure bitset of a node.
+
+        Args:
+            node (int): The node id.
+            reverse (bool): Decode the dependents instead of the
+                dependencies.
+
+        Returns:
+            List[str]: Names of the packages in the closure, without the
+            node itself unless it is part of a cycle, in graph order.
+        """
+        last = len(self._order) - 1
+        position = self._position[node]
+        if reverse:
+            bits = self._reverse[node]
+            own = last - position
+        else:
+            bits = self._reach[node]
+            own = position
+        if not self._cyclic[node]:
+            bits ^= 1 << own
+        order = self._order
+        if reverse:
+            nodes = sorted(order[last - pos] for pos in _positions(bits))
+        else:
+            nodes = sorted(order[pos] for pos in _positions(bits))
+        names = self.graph.names
+        return [names[n] for n in nodes]
+
+    def _is_root(self, node: int) -> bool:
+        """
+        Checks that only the members of its own cycle depend on a node.
+
+        Args:
+            node (int): The node id.
+
+        Returns:
+            bool: True if no package outside the cycle of the node, if any,
+            depends on it.
+        """
+        last = len(self._order) - 1
+        if not self._cyclic[node]:
+            return self._reverse[node] == 1 << (last - self._position[node])
+        # A dependent is in the same cycle if the node depends on it too.
+        reach = self._reach[node]
+        return all(
+            reach >> self._position[self._order[last - pos]] & 1
+            for pos in _positions(self._reverse[node])
+        )
+
+    def _path(self, start: int, target: int) -> List[int]:
+        """
+        Finds a shortest path between two nodes with a breadth-first search.
+
+        Only nodes that can reach the target are visited.
+
+        Args:
+            start (int): The first node; must reach ``target``.
+            target (int): The last node.
+
+        Returns:
+            List[int]: The node ids along the path.
+        """
+        bit = 1 << self._position[target]
+        parents: Dict[int, Optional[int]] = {start: None}
+        queue: Deque[int] = deque([start])
+        while target not in parents:
+            node = queue.popleft()
+            for dep in self.graph.successors(node):
+                if dep not in parents and (dep == target or self._reach[dep] & bit):
+                    parents[dep] = node
+                    queue.append(dep)
+        path = []
+        current: Optional[int] = target
+        while current is not None:
+            path.append(current)
+            current = parents[current]
+        path.reverse()
+        return path
+
+
+def _reach(
+    graph: CompactGraph, components: List[List[int]], position: Sequence[int]
+) -> List[int]:
+    """
+    Computes the reflexive transitive closure of every node as a bitset.
+
+    Args:
+        graph (CompactGraph): The graph to follow.
+        components (List[List[int]]): Strongly connected components of the
+            graph, every one after all the components it has edges to.
+        position (Sequence[int]): Bit position of every node.
+
+    Returns:
+        List[int]: Bitset of the nodes reachable from every node, including
+        the node itself. Members of one component share the same bitset.
+    """
+    offsets, targets = graph.offsets, graph.targets
+    reach = [0] * len(graph)
+    for component in components:
+        bits = 0
+        for node in component:
+            bits |= 1 << position[node]
+            for dep in targets[offsets[node] : offsets[node + 1]]:
+                # Members of the same component are still 0 here; their own
+                # bits are added by the outer loop.
+                bits |= reach[dep]
+        for node in component:
+            reach[node] = bits
+    return reach
+
+
+def _positions(bits: int) -> Iterator[int]:
+    """
+    Yields the positions of the set bits of a bitset.
+
+    Args:
+        bits (int): The bitset.
+
+    Yields:
+        int: Positions of the set bits, highest first.
+    """
+    text = bin(bits)
+    last = len(text) - 1
+    pos = text.find("1", 2)
+    while pos != -1:
+        yield last - pos
+        pos = text.find("1", pos + 1)
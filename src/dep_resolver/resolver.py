@@ -1,52 +1,441 @@
 from __future__ import annotations
-from typing import Dict, List, Set
+from array import array
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 import logging
 
+from . import cycles
+from .graph import CompactGraph, Dependencies, as_graph
+from .stats import Stats
+
 logger = logging.getLogger(__name__)
 
 DependencyGraph = Dict[str, "DependencyGraph"]
 
+#: Resolved subtrees by package id. Mappings must return None for missing
+#: ids instead of raising KeyError.
+Memo = Union[List[Optional[DependencyGraph]], MutableMapping[int, DependencyGraph]]
+
+
+class CircularDependencyError(Exception):
+    """
+    Raised when the dependency mapping contains a cycle.
+
+    Attributes:
+        cycle (List[str]): The offending path, starting and ending with the
+            same package.
+    """
+
+    def __init__(self, cycle: Sequence[str]) -> None:
+        self.cycle = list(cycle)
+        super().__init__(f"Circular dependency detected: {' -> '.join(self.cycle)}")
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return self.__class__, (self.cycle,)
+
+
+class PackedGraph(NamedTuple):
+    """
+    Flat, pickle-friendly encoding of a resolved dependency graph.
+
+    Every distinct subtree object is a node, numbered in post-order so the
+    last node is the top level. The entries of node ``i`` are
+    ``labels[offsets[i]:offsets[i + 1]]`` and point at the nodes in the same
+    slice of ``targets``. Shared subtrees are stored once and stay shared
+    after unpacking, and unlike the nested dictionaries the encoding can be
+    pickled at any depth.
+
+    Attributes:
+        labels (List[str]): Package name of every entry.
+        offsets (array): Start of every node's entries.
+        targets (array): Node id of every entry's subtree.
+    """
+
+    labels: List[str]
+    offsets: "array[int]"
+    targets: "array[int]"
 
-def resolve_dependencies(dependencies: Dict[str, List[str]]) -> DependencyGraph:
+
+def resolve_dependencies(
+    dependencies: Union[Dependencies, CompactGraph],
+    collapse_cycles: bool = False,
+    stats: Optional[Stats] = None,
+    roots: Optional[Sequence[str]] = None,
+    max_depth: Optional[int] = None,
+) -> DependencyGraph:
     """
     Resolves the full dependency graph.
 
+    Every package is resolved once and its subtree is reused wherever the
+    package appears, so equal subtrees in the result are the same object.
+
+    With ``roots`` only those packages are resolved, and with ``max_depth``
+    the traversal stops that many levels below them. Packages outside the
+    selection are never visited, so the cost grows with the selected part
+    of the graph only. Cycles are only detected within the selection.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The initial
+            dependency mapping or its compact graph.
+        collapse_cycles (bool): Resolve the graph even if it contains cycles,
+            replacing every group of mutually dependent packages with one
+            marked package (see :func:`dep_resolver.cycles.collapse_cycles`).
+        stats (Optional[Stats]): Receives the resolver counters.
+        roots (Optional[Sequence[str]]): Packages to resolve instead of the
+            top-level packages. Any package of the graph can be a root; with
+            ``collapse_cycles``, a member of a cycle selects its group.
+        max_depth (Optional[int]): Number of dependency levels to resolve
+            below every root; deeper packages are left without dependencies.
+            0 resolves the roots only.
+
+    Returns:
+        DependencyGraph: The resolved dependency graph.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected and
+            ``collapse_cycles`` is not set.
+        KeyError: If a root does not appear in the graph.
+        ValueError: If ``max_depth`` is negative.
+    """
+    if max_depth is not None and max_depth < 0:
+        raise ValueError(f"max_depth must not be negative: {max_depth}")
+    graph = prepare_graph(dependencies, collapse_cycles, roots)
+    if max_depth is not None:
+        return _resolve_limited(graph, max_depth, stats)
+    resolved = {}
+    memo: List[Optional[DependencyGraph]] = [None] * len(graph)
+    on_path = bytearray(len(graph))
+    names = graph.names
+    info = logger.isEnabledFor(logging.INFO)
+    for node in graph.keys:
+        pkg = names[node]
+        cached = memo[node]
+        if cached is None:
+            if info:
+                logger.info(f"Resolving dependencies for package: {pkg}")
+            cached = resolve_package(node, graph, memo, on_path, stats)
+        elif stats is not None:
+            stats.memo_hits += 1
+        resolved[pkg] = cached
+    return resolved
+
+
+def prepare_graph(
+    dependencies: Union[Dependencies, CompactGraph],
+    collapse_cycles: bool = False,
+    roots: Optional[Sequence[str]] = None,
+) -> CompactGraph:
+    """
+    Returns the graph to resolve, with collapsed cycles and selected roots.
+
+    Args:
+        dependencies (Union[Dependencies, CompactGraph]): The initial
+            dependency mapping or its compact graph.
+        collapse_cycles (bool): Replace every group of mutually dependent
+            packages with one marked package.
+        roots (Optional[Sequence[str]]): Packages to use as the top-level
+            packages. With ``collapse_cycles``, a member of a cycle selects
+            its group.
+
+    Returns:
+        CompactGraph: The graph. It shares the arrays of the input unless
+        cycles were collapsed.
+
+    Raises:
+        KeyError: If a root does not appear in the graph.
+    """
+    graph = as_graph(dependencies)
+    if roots is not None:
+        for pkg in roots:
+            graph.id_of(pkg)
+    if collapse_cycles:
+        if roots is not None:
+            labels = {
+                member: cycles.cycle_label(group.packages)
+                for group in cycles.find_cycles(graph)
+                for member in group.packages
+            }
+            roots = list(dict.fromkeys(labels.get(pkg, pkg) for pkg in roots))
+        graph = cycles.collapse_cycles(graph)
+    if roots is not None:
+        graph = graph.with_keys([graph.id_of(pkg) for pkg in roots])
+    return graph
+
+
+def _resolve_limited(
+    graph: CompactGraph, max_depth: int, stats: Optional[Stats] = None
+) -> DependencyGraph:
+    """
+    Resolves the top-level packages of a graph down to a fixed depth.
+
+    The subtree of a package depends on how many levels are left below it,
+    so subtrees are memoized per package and remaining depth.
+
     Args:
-        dependencies (Dict[str, List[str]]): The initial dependency mapping.
+        graph (CompactGraph): The dependency graph.
+        max_depth (int): Number of dependency levels below every top-level
+            package.
+        stats (Optional[Stats]): Receives the resolver counters.
 
     Returns:
         DependencyGraph: The resolved dependency graph.
 
     Raises:
-        RecursionError: If a circular dependency is detected.
+        CircularDependencyError: If a circular dependency is detected within
+            the depth limit.
     """
     resolved = {}
-    for pkg in dependencies:
-        visited: Set[str] = set()
-        logger.info(f"Resolving dependencies for package: {pkg}")
-        resolved[pkg] = _resolve_pkg(pkg, dependencies, visited)
+    memo: Dict[Tuple[int, int], DependencyGraph] = {}
+    on_path = bytearray(len(graph))
+    names = graph.names
+    info = logger.isEnabledFor(logging.INFO)
+    for node in graph.keys:
+        pkg = names[node]
+        sub_deps = memo.get((node, max_depth))
+        if sub_deps is None:
+            if info:
+                logger.info(f"Resolving dependencies for package: {pkg}")
+            sub_deps = _resolve_pkg_limited(
+                node, graph, memo, on_path, max_depth, stats
+            )
+        elif stats is not None:
+            stats.memo_hits += 1
+        resolved[pkg] = sub_deps
     return resolved
 
 
-def _resolve_pkg(
-    pkg: str, dependencies: Dict[str, List[str]], visited: Set[str]
+def _resolve_pkg_limited(
+    node: int,
+    graph: CompactGraph,
+    memo: Dict[Tuple[int, int], DependencyGraph],
+    on_path: bytearray,
+    max_depth: int,
+    stats: Optional[Stats] = None,
+) -> DependencyGraph:
+    """
+    Depth-limited variant of :func:`resolve_package`.
+
+    A package ``max_depth`` levels below ``node`` is added without its
+    dependencies, which are never visited.
+
+    Args:
+        node (int): The package id.
+        graph (CompactGraph): The dependency graph.
+        memo (Dict[Tuple[int, int], DependencyGraph]): Resolved subtrees
+            keyed by package id and number of levels resolved below it.
+        on_path (bytearray): Flags of the packages on the current path,
+            indexed by id. All flags are cleared again on return.
+        max_depth (int): Number of levels to resolve below ``node``.
+        stats (Optional[Stats]): Receives the resolver counters.
+
+    Returns:
+        DependencyGraph: Resolved dependencies for the package.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected.
+    """
+    names = graph.names
+    debug = logger.isEnabledFor(logging.DEBUG)
+    no_deps: Sequence[int] = ()
+    root: DependencyGraph = {}
+    on_path[node] = 1
+    path: List[int] = [node]
+    stack: List[Tuple[Iterator[int], DependencyGraph]] = [
+        (iter(graph.successors(node) if max_depth else no_deps), root)
+    ]
+    if debug:
+        logger.debug(f"Visiting package: {names[node]}")
+    expanded = 1
+    hits = 0
+    deepest = 1
+    while stack:
+        dep_iter, deps = stack[-1]
+        # Levels left below the dependencies of the package on top.
+        remaining = max_depth - len(path)
+        for dep in dep_iter:
+            cached = memo.get((dep, remaining))
+            if cached is not None:
+                deps[names[dep]] = cached
+                hits += 1
+                continue
+            if on_path[dep]:
+                cycle = path[path.index(dep) :] + [dep]
+                raise CircularDependencyError([names[pkg] for pkg in cycle])
+            if debug:
+                logger.debug(f"Visiting package: {names[dep]}")
+            sub_deps: DependencyGraph = {}
+            deps[names[dep]] = sub_deps
+            on_path[dep] = 1
+            path.append(dep)
+            stack.append(
+                (iter(graph.successors(dep) if remaining else no_deps), sub_deps)
+            )
+            expanded += 1
+            if len(path) > deepest:
+                deepest = len(path)
+            break
+        else:
+            stack.pop()
+            done = path.pop()
+            on_path[done] = 0
+            memo[done, max_depth - len(path)] = deps
+    if stats is not None:
+        stats.nodes_expanded += expanded
+        stats.edges_traversed += expanded - 1 + hits
+        stats.memo_hits += hits
+        stats.max_depth = max(stats.max_depth, deepest)
+    return root
+
+
+def resolve_package(
+    node: int,
+    graph: CompactGraph,
+    memo: Memo,
+    on_path: bytearray,
+    stats: Optional[Stats] = None,
 ) -> DependencyGraph:
     """
-    Helper function to recursively resolve dependencies.
+    Resolves the dependencies of a single package with an explicit stack.
+
+    This is the building block of :func:`resolve_dependencies` for callers
+    that resolve packages one at a time and keep the memo between calls,
+    such as :class:`dep_resolver.lazy.LazyDependencyGraph`. The subtree of
+    every package resolved along the way is stored in ``memo``; entries
+    may be dropped between calls and are resolved again when needed.
+
+    The packages on the current path are flagged while they are on the
+    stack, so arbitrarily deep chains resolve without hitting the
+    interpreter's recursion limit. Counters are kept in local variables
+    and only added to ``stats`` at the end, and log messages are only
+    built when DEBUG logging is enabled.
 
     Args:
-        pkg (str): The package name.
-        dependencies (Dict[str, List[str]]): The dependency mapping.
-        visited (Set[str]): Set of visited packages to detect cycles.
+        node (int): The package id.
+        graph (CompactGraph): The dependency graph.
+        memo (Memo): Subtrees of already resolved packages, indexed by id.
+        on_path (bytearray): Flags of the packages on the current path,
+            indexed by id, all cleared. They are cleared again on return,
+            but not if an exception is raised.
+        stats (Optional[Stats]): Receives the resolver counters.
 
     Returns:
         DependencyGraph: Resolved dependencies for the package.
+
+    Raises:
+        CircularDependencyError: If a circular dependency is detected.
+    """
+    cached = memo[node]
+    if cached is not None:
+        return cached
+    names = graph.names
+    debug = logger.isEnabledFor(logging.DEBUG)
+    root: DependencyGraph = {}
+    on_path[node] = 1
+    path: List[int] = [node]
+    stack: List[Tuple[Iterator[int], DependencyGraph]] = [
+        (iter(graph.successors(node)), root)
+    ]
+    if debug:
+        logger.debug(f"Visiting package: {names[node]}")
+    expanded = 1
+    hits = 0
+    max_depth = 1
+    while stack:
+        dep_iter, deps = stack[-1]
+        for dep in dep_iter:
+            cached = memo[dep]
+            if cached is not None:
+                deps[names[dep]] = cached
+                hits += 1
+                continue
+            if on_path[dep]:
+                cycle = path[path.index(dep) :] + [dep]
+                raise CircularDependencyError([names[pkg] for pkg in cycle])
+            if debug:
+                logger.debug(f"Visiting package: {names[dep]}")
+            sub_deps: DependencyGraph = {}
+            deps[names[dep]] = sub_deps
+            on_path[dep] = 1
+            path.append(dep)
+            stack.append((iter(graph.successors(dep)), sub_deps))
+            expanded += 1
+            if len(path) > max_depth:
+                max_depth = len(path)
+            break
+        else:
+            stack.pop()
+            done = path.pop()
+            on_path[done] = 0
+            memo[done] = deps
+    if stats is not None:
+        stats.nodes_expanded += expanded
+        # Every edge either expanded a new package or hit the memo.
+        stats.edges_traversed += expanded - 1 + hits
+        stats.memo_hits += hits
+        stats.max_depth = max(stats.max_depth, max_depth)
+    return root
+
+
+def pack_graph(resolved_graph: DependencyGraph) -> PackedGraph:
+    """
+    Encodes a resolved dependency graph into flat arrays.
+
+    Args:
+        resolved_graph (DependencyGraph): The resolved dependency graph.
+
+    Returns:
+        PackedGraph: The packed graph.
+    """
+    index: Dict[int, int] = {}
+    order: List[DependencyGraph] = []
+    stack = [(resolved_graph, iter(resolved_graph.values()))]
+    while stack:
+        deps, sub_iter = stack[-1]
+        for sub_deps in sub_iter:
+            if id(sub_deps) not in index:
+                stack.append((sub_deps, iter(sub_deps.values())))
+                break
+        else:
+            stack.pop()
+            index[id(deps)] = len(order)
+            order.append(deps)
+    labels: List[str] = []
+    offsets = array("i", [0])
+    targets = array("i")
+    node_of = index.__getitem__
+    for deps in order:
+        labels.extend(deps)
+        targets.extend(map(node_of, map(id, deps.values())))
+        offsets.append(len(labels))
+    return PackedGraph(labels, offsets, targets)
+
+
+def unpack_graph(packed: PackedGraph) -> DependencyGraph:
+    """
+    Rebuilds the nested dictionaries of a packed graph.
+
+    Args:
+        packed (PackedGraph): The packed graph.
+
+    Returns:
+        DependencyGraph: The resolved dependency graph.
     """
-    if pkg in visited:
-        raise RecursionError(f"Circular dependency detected: {pkg} already visited")
-    visited.add(pkg)
-    logger.debug(f"Visiting package: {pkg}")
-    deps: DependencyGraph = {}
-    for dep in dependencies.get(pkg, []):
-        deps[dep] = _resolve_pkg(dep, dependencies, visited.copy())
-    return deps
+    labels, offsets, targets = packed
+    nodes: List[DependencyGraph] = []
+    append = nodes.append
+    subtree = nodes.__getitem__
+    start = 0
+    for end in offsets[1:]:
+        append(dict(zip(labels[start:end], map(subtree, targets[start:end]))))
+        start = end
+    return nodes[-1]
@@ -0,0 +1,624 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+import inspect
+import json
+import logging
+import os
+import signal
+import stat
+import sys
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Container,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .estimate import estimate_tree_size
+from .formats import GRAPH_FORMATS, TREE_FORMATS
+from .graph import CompactGraph
+from .loader import load_manifest
+from .order import install_order
+from .query import QueryIndex
+from .resolver import (
+    CircularDependencyError,
+    DependencyGraph,
+    prepare_graph,
+    resolve_dependencies,
+)
+
+logger = logging.getLogger(__name__)
+
+#: Seconds between two checks of the manifest for changes.
+DEFAULT_POLL_INTERVAL = 1.0
+
+#: Number of resolved graphs kept for different request parameters.
+DEFAULT_MAX_CACHED = 32
+
+#: Longest accepted request line in bytes.
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+#: Bytes read from stdin at once when it is a regular file.
+_READ_SIZE = 1 << 16
+
+#: JSON-RPC error codes. Negative codes are defined by JSON-RPC 2.0.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+CIRCULAR_DEPENDENCY = 1
+PACKAGE_NOT_FOUND = 2
+MANIFEST_ERROR = 3
+TOO_MANY_NODES = 4
+
+
+class RequestError(Exception):
+    """
+    Raised by request handlers to answer with a JSON-RPC error.
+
+    Attributes:
+        code (int): The JSON-RPC error code.
+        data (Any): Additional JSON-serializable details, or None.
+    """
+
+    def __init__(self, code: int, message: str, data: Any = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class ResolverService:
+    """
+    Answers resolver requests from a manifest kept in memory.
+
+    The manifest is loaded once and reloaded only when its size,
+    modification time or inode changes, which is checked before every
+    request with a single ``stat`` call. Resolved graphs, the query index
+    and the install order are cached until the next reload.
+
+    Every method takes the request parameters as keyword arguments and
+    returns a JSON-serializable result:
+
+    - ``resolve(roots=None, max_depth=None, collapse_cycles=False,
+      format="text", indent_size=4, dedupe=False, max_nodes=None)``:
+      the printed output as a string.
+    - ``estimate(roots=None, max_depth=None, collapse_cycles=False,
+      format="text")``: ``{"nodes", "lines", "roots"}``.
+    - ``order()``: the install layers.
+    - ``why(package)``, ``rdeps(package)``, ``closure(package)``: the
+      answers of :class:`dep_resolver.query.QueryIndex`.
+
+    Args:
+        path (Union[str, os.PathLike[str]]): Path of the manifest.
+        max_cached (int): Number of resolved graphs to keep.
+    """
+
+    def __init__(
+        self, path: Union[str, "os.PathLike[str]"], max_cached: int = DEFAULT_MAX_CACHED
+    ) -> None:
+        self.path = os.fspath(path)
+        self._max_cached = max_cached
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._graph: Optional[CompactGraph] = None
+        self._error: Optional[str] = None
+        self._resolved: OrderedDict[Any, DependencyGraph] = OrderedDict()
+        self._index: Optional[QueryIndex] = None
+        self._order: Optional[List[List[str]]] = None
+        self.methods: Dict[str, Callable[..., Any]] = {
+            "resolve": self.resolve,
+            "estimate": self.estimate,
+            "order": self.order,
+            "why": self.why,
+            "rdeps": self.rdeps,
+            "closure": self.closure,
+        }
+
+    def refresh(self) -> bool:
+        """
+        Reloads the manifest if it changed since it was last loaded.
+
+        A manifest that cannot be read or parsed is remembered as an error,
+        which every request reports until the file is fixed.
+
+        Returns:
+            bool: True if the manifest was (re)loaded.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            signature = None
+            error: Optional[str] = f"Could not read {self.path}: {e}"
+        else:
+            signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+            error = None
+        if signature is not None and signature == self._signature:
+            return False
+        self._signature = signature
+        self._graph = None
+        self._resolved.clear()
+        self._index = None
+        self._order = None
+        if error is None:
+            try:
+                self._graph = load_manifest(self.path)
+            except json.JSONDecodeError as e:
+                error = f"Invalid JSON file: {e}"
+            except (OSError, UnicodeDecodeError) as e:
+                error = f"Could not read {self.path}: {e}"
+        self._error = error
+        if self._graph is None:
+            logger.warning(error)
+        else:
+            logger.info(f"Loaded {len(self._graph.keys)} packages from {self.path}")
+        return True
+
+    @property
+    def graph(self) -> CompactGraph:
+        """CompactGraph: The current graph, reloaded if the manifest changed."""
+        self.refresh()
+        if self._graph is None:
+            raise RequestError(MANIFEST_ERROR, self._error or "No manifest loaded")
+        return self._graph
+
+    def resolve(
+        self,
+        roots: Optional[Sequence[str]] = None,
+        max_depth: Optional[int] = None,
+        collapse_cycles: bool = False,
+        format: str = "text",
+        indent_size: int = 4,
+        dedupe: bool = False,
+        max_nodes: Optional[int] = None,
+    ) -> str:
+        """
+        Resolves the graph and returns it as printed by the CLI.
+
+        Args:
+            roots (Optional[Sequence[str]]): Packages to resolve instead of
+                the top-level packages.
+            max_depth (Optional[int]): Number of dependency levels below
+                every root.
+            collapse_cycles (bool): Collapse circular dependencies.
+            format (str): A name from :data:`dep_resolver.formats.TREE_FORMATS`
+                or :data:`dep_resolver.formats.GRAPH_FORMATS`.
+            indent_size (int): Number of spaces for indentation.
+            dedupe (bool): Expand every package only once.
+            max_nodes (Optional[int]): Refuse trees of more nodes.
+
+        Returns:
+            str: The output.
+        """
+        graph = self.graph
+        _check_tree_params(graph, roots, max_depth, collapse_cycles)
+        _check_format(format, (*TREE_FORMATS, *GRAPH_FORMATS))
+        if format in GRAPH_FORMATS:
+            selected = prepare_graph(graph, collapse_cycles, roots)
+            return "".join(GRAPH_FORMATS[format](selected, max_depth))
+        _check_count("indent_size", indent_size)
+        _check_flag("dedupe", dedupe)
+        if max_nodes is not None:
+            _check_count("max_nodes", max_nodes)
+        if dedupe and max_depth is not None:
+            raise _invalid_params("dedupe cannot be combined with max_depth")
+        if max_nodes is not None and not dedupe:
+            size = estimate_tree_size(
+                graph, collapse_cycles, roots, max_depth, max_nodes
+            )
+            if size.nodes > max_nodes:
+                raise RequestError(
+                    TOO_MANY_NODES,
+                    f"The dependency tree has {'at least ' if size.truncated else ''}"
+                    f"{size.nodes} nodes, more than max_nodes {max_nodes}",
+                    {"nodes": str(size.nodes)},
+                )
+        key = (tuple(roots) if roots is not None else None, max_depth, collapse_cycles)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = resolve_dependencies(
+                graph,
+                collapse_cycles=collapse_cycles,
+                roots=roots,
+                max_depth=max_depth,
+            )
+            self._resolved[key] = resolved
+            if len(self._resolved) > self._max_cached:
+                self._resolved.popitem(last=False)
+        else:
+            self._resolved.move_to_end(key)
+        return "".join(TREE_FORMATS[format](resolved, indent_size, dedupe))
+
+    def estimate(
+        self,
+        roots: Optional[Sequence[str]] = None,
+        max_depth: Optional[int] = None,
+        collapse_cycles: bool = False,
+        format: str = "text",
+    ) -> Dict[str, Any]:
+        """
+        Counts the nodes of the tree :meth:`resolve` would print.
+
+        The counts are returned as strings, since they can exceed what JSON
+        readers store in a double.
+
+        Returns:
+            Dict[str, Any]: The total ``nodes``, the number of output
+            ``lines`` and the nodes of every root in ``roots``.
+        """
+        graph = self.graph
+        _check_tree_params(graph, roots, max_depth, collapse_cycles)
+        _check_format(format, TREE_FORMATS)
+        size = estimate_tree_size(graph, collapse_cycles, roots, max_depth)
+        return {
+            "nodes": str(size.nodes),
+            "lines": str(size.lines(format)),
+            "roots": {pkg: str(nodes) for pkg, nodes in size.roots.items()},
+        }
+
+    def order(self) -> List[List[str]]:
+        """Returns the layered install order."""
+        graph = self.graph
+        if self._order is None:
+            self._order = install_order(graph)
+        return self._order
+
+    def why(self, package: str) -> List[List[str]]:
+        """Returns a shortest path to a package from every root needing it."""
+        return self._query_index(package).why(package)
+
+    def rdeps(self, package: str) -> List[str]:
+        """Returns every package that transitively depends on a package."""
+        return self._query_index(package).dependents(package)
+
+    def closure(self, package: str) -> List[str]:
+        """Returns every package that a package transitively depends on."""
+        return self._query_index(package).closure(package)
+
+    def _query_index(self, package: str) -> QueryIndex:
+        graph = self.graph
+        _check_packages(graph, [package])
+        if self._index is None:
+            self._index = QueryIndex.build(graph)
+        return self._index
+
+    def handle(self, line: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+        """
+        Answers a single JSON-RPC 2.0 request.
+
+        Args:
+            line (Union[str, bytes]): The encoded request.
+
+        Returns:
+            Optional[Dict[str, Any]]: The response, or None for a
+            notification (a request without an id).
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return _error(None, PARSE_ERROR, f"Parse error: {e}")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get("id")
+        params = request.get("params", {})
+        method = self.methods.get(request["method"])
+        if method is None:
+            response = _error(
+                request_id, METHOD_NOT_FOUND, f"Method not found: {request['method']}"
+            )
+        elif not isinstance(params, (dict, list)):
+            response = _error(request_id, INVALID_PARAMS, "Invalid params")
+        else:
+            response = self._call(request_id, method, params)
+        return response if "id" in request else None
+
+    def _call(
+        self,
+        request_id: Any,
+        method: Callable[..., Any],
+        params: Union[Dict[str, Any], List[Any]],
+    ) -> Dict[str, Any]:
+        args = params if isinstance(params, list) else []
+        kwargs = params if isinstance(params, dict) else {}
+        try:
+            inspect.signature(method).bind(*args, **kwargs)
+        except TypeError as e:
+            return _error(request_id, INVALID_PARAMS, f"Invalid params: {e}")
+        try:
+            result = method(*args, **kwargs)
+        except RequestError as e:
+            return _error(request_id, e.code, str(e), e.data)
+        except CircularDependencyError as e:
+            return _error(request_id, CIRCULAR_DEPENDENCY, str(e), {"cycle": e.cycle})
+        except Exception as e:
+            logger.exception("Request failed")
+            return _error(request_id, INTERNAL_ERROR, f"Internal error: {e}")
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def _invalid_params(message: str) -> RequestError:
+    return RequestError(INVALID_PARAMS, f"Invalid params: {message}")
+
+
+def _check_count(name: str, value: Any) -> None:
+    # bool is a subclass of int, but never a valid count.
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise _invalid_params(f"{name} must be a non-negative integer")
+
+
+def _check_flag(name: str, value: Any) -> None:
+    if not isinstance(value, bool):
+        raise _invalid_params(f"{name} must be true or false")
+
+
+def _check_packages(graph: CompactGraph, packages: Any) -> None:
+    if not isinstance(packages, list) or not all(
+        isinstance(pkg, str) for pkg in packages
+    ):
+        raise _invalid_params("expected a list of package names")
+    for pkg in packages:
+        if pkg not in graph:
+            raise RequestError(PACKAGE_NOT_FOUND, f"Package not found: {pkg}")
+
+
+def _check_tree_params(
+    graph: CompactGraph, roots: Any, max_depth: Any, collapse_cycles: Any
+) -> None:
+    if roots is not None:
+        _check_packages(graph, roots)
+    if max_depth is not None:
+        _check_count("max_depth", max_depth)
+    _check_flag("collapse_cycles", collapse_cycles)
+
+
+def _check_format(output_format: Any, formats: Container[str]) -> None:
+    if not isinstance(output_format, str) or output_format not in formats:
+        raise _invalid_params(f"Unknown format: {output_format}")
+
+
+def _error(
+    request_id: Any, code: int, message: str, data: Any = None
+) -> Dict[str, Any]:
+    error: Dict[str, Any] = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+
+def _encode(response: Dict[str, Any]) -> bytes:
+    return json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """
+    Reads the next request line.
+
+    A line longer than the limit of ``reader`` is skipped up to its end.
+
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+
+    Returns:
+        Optional[bytes]: The line, an empty string at the end of the stream,
+        or None if the line was too long.
+    """
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        consumed = e.consumed
+    while True:
+        # The unread part of the line is still buffered.
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+
+
+async def _serve_requests(
+    service: ResolverService,
+    reader: asyncio.StreamReader,
+    send: Callable[[bytes], Awaitable[None]],
+    executor: Executor,
+) -> None:
+    """
+    Answers the requests of a stream in order until it is closed.
+
+    The requests are handled in ``executor``, so that the event loop keeps
+    accepting connections and watching the manifest meanwhile.
+
+    Args:
+        service (ResolverService): The service answering the requests.
+        reader (asyncio.StreamReader): The stream of request lines.
+        send (Callable[[bytes], Awaitable[None]]): Writes an encoded
+            response.
+        executor (Executor): Runs the requests.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await _read_request(reader)
+        if line is None:
+            response: Optional[Dict[str, Any]] = _error(
+                None,
+                INVALID_REQUEST,
+                f"Request longer than {MAX_REQUEST_SIZE} bytes",
+            )
+        elif not line:
+            break
+        else:
+            response = await loop.run_in_executor(executor, service.handle, line)
+        if response is not None:
+            await send(_encode(response))
+
+
+def _executor() -> ThreadPoolExecutor:
+    # A single worker handles one request at a time, since the service
+    # caches are not thread-safe, and keeps reloads from overlapping them.
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="dep_resolver")
+
+
+async def watch(
+    service: ResolverService,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    executor: Optional[Executor] = None,
+) -> None:
+    """
+    Reloads the manifest in the background whenever it changes.
+
+    Requests check the manifest themselves, so this only moves the cost
+    of reloading out of the first request after a change.
+
+    Args:
+        service (ResolverService): The service to refresh.
+        poll_interval (float): Seconds between two checks.
+        executor (Optional[Executor]): Runs the checks, so that they never
+            overlap with the requests it runs. If None, they run in the
+            event loop.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(poll_interval)
+        if executor is None:
+            service.refresh()
+        else:
+            await loop.run_in_executor(executor, service.refresh)
+
+
+async def serve_unix(
+    service: ResolverService,
+    path: Union[str, "os.PathLike[str]"],
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ready: Optional[asyncio.Event] = None,
+    stop: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Serves newline-delimited JSON-RPC requests on a Unix domain socket.
+
+    Every connection may send any number of requests, which are answered
+    in order. Requests are handled one at a time in a worker thread, so a
+    slow request delays the requests of other connections but not their
+    connecting. A request line longer than :data:`MAX_REQUEST_SIZE` is
+    answered with an error. The server stops on SIGTERM or when ``stop``
+    is set, and removes the socket file.
+
+    Args:
+        service (ResolverService): The service answering the requests.
+        path (Union[str, os.PathLike[str]]): Path of the socket.
+        poll_interval (float): Seconds between two checks of the manifest.
+        ready (Optional[asyncio.Event]): Set once the socket accepts
+            connections.
+        stop (Optional[asyncio.Event]): Stops the server when set.
+    """
+    executor = _executor()
+
+    async def on_connect(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        async def send(data: bytes) -> None:
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await _serve_requests(service, reader, send, executor)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    path = os.fspath(path)
+    if stop is None:
+        stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with contextlib.suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    service.refresh()
+    server = await asyncio.start_unix_server(on_connect, path, limit=MAX_REQUEST_SIZE)
+    watcher = asyncio.ensure_future(watch(service, poll_interval, executor))
+    logger.info(f"Listening on {path}")
+    try:
+        async with server:
+            if ready is not None:
+                ready.set()
+            await stop.wait()
+    finally:
+        watcher.cancel()
+        executor.shutdown(wait=False)
+        with contextlib.suppress(NotImplementedError):
+            loop.remove_signal_handler(signal.SIGTERM)
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+async def serve_stdio(
+    service: ResolverService, poll_interval: float = DEFAULT_POLL_INTERVAL
+) -> None:
+    """
+    Serves newline-delimited JSON-RPC requests on stdin and stdout.
+
+    Requests are handled in order in a worker thread, like with
+    :func:`serve_unix`. Returns when stdin is closed. If stdin is not a
+    pipe, socket or terminal, e.g. a regular file, which cannot be watched
+    by the event loop, it is read in a separate thread instead.
+
+    Args:
+        service (ResolverService): The service answering the requests.
+        poll_interval (float): Seconds between two checks of the manifest.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_REQUEST_SIZE)
+    feeder = None
+    fd = sys.stdin.fileno()
+    mode = os.fstat(fd).st_mode
+    if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or os.isatty(fd):
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+        )
+    else:
+        # Regular files, and devices such as /dev/null, cannot be polled.
+        feeder = asyncio.ensure_future(_feed(reader, fd))
+    output = sys.stdout.buffer
+
+    async def send(data: bytes) -> None:
+        output.write(data)
+        output.flush()
+
+    executor = _executor()
+    service.refresh()
+    watcher = asyncio.ensure_future(watch(service, poll_interval, executor))
+    try:
+        await _serve_requests(service, reader, send, executor)
+    finally:
+        if feeder is not None:
+            feeder.cancel()
+        watcher.cancel()
+        executor.shutdown(wait=False)
+
+
+async def _feed(reader: asyncio.StreamReader, fd: int) -> None:
+    """
+    Copies a file descriptor into a stream, reading it in a thread.
+
+    Args:
+        reader (asyncio.StreamReader): The stream to feed.
+        fd (int): The file descriptor, read until its end.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await loop.run_in_executor(None, os.read, fd, _READ_SIZE)
+        if not data:
+            break
+        reader.feed_data(data)
+    reader.feed_eof()
@@ -0,0 +1,391 @@
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import operator
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import islice
+from typing import IO, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+from .cycles import find_cycles
+from .graph import CompactGraph, as_array
+from .loader import load_manifest
+from .order import install_order
+
+#: Identifies snapshot files.
+MAGIC = b"DEPSNAP\0"
+
+#: Bumped whenever the layout of a snapshot changes.
+FORMAT_VERSION = 1
+
+#: Suffix appended to the manifest path for the default snapshot location.
+SNAPSHOT_SUFFIX = ".snap"
+
+#: Set in the header flags when the names are stored as a JSON array
+#: because a name contains the NUL separator.
+_NAMES_JSON = 1
+
+#: Magic, version, flags, source digest, then the number of ints in every
+#: int section followed by the byte size of the names.
+_HEADER = struct.Struct("<8sII32s7Q")
+
+#: Names of the int sections, in file order.
+_SECTIONS = ("keys", "offsets", "targets", "by_name", "layer_offsets", "layers")
+
+_ALIGNMENT = 8
+_CHUNK_SIZE = 1 << 20
+
+
+class Snapshot(NamedTuple):
+    """
+    A compiled manifest.
+
+    Attributes:
+        graph (CompactGraph): The dependency graph. Its arrays are views of
+            the mapped file.
+        source_digest (bytes): Digest of the manifest the snapshot was
+            compiled from.
+        layer_offsets (Sequence[int]): Start of every install layer in
+            ``layer_nodes``, followed by its length; empty if the install
+            order was not compiled into the snapshot.
+        layer_nodes (Sequence[int]): Ids of all packages, layer by layer.
+    """
+
+    graph: CompactGraph
+    source_digest: bytes
+    layer_offsets: Sequence[int]
+    layer_nodes: Sequence[int]
+
+    def install_order(self) -> Optional[List[List[str]]]:
+        """
+        Returns the compiled install order.
+
+        Returns:
+            Optional[List[List[str]]]: The layers as returned by
+            :func:`dep_resolver.order.install_order`, or None if the
+            snapshot does not contain them.
+        """
+        offsets = self.layer_offsets
+        if not len(offsets):
+            return None
+        names = self.graph.names
+        nodes = self.layer_nodes
+        return [
+            [names[node] for node in nodes[start:end]]
+            for start, end in zip(offsets, offsets[1:])
+        ]
+
+    def matches(self, source: Union[str, "os.PathLike[str]"]) -> bool:
+        """
+        Checks whether the snapshot was compiled from the current manifest.
+
+        Args:
+            source (Union[str, os.PathLike[str]]): Path of the manifest.
+
+        Returns:
+            bool: True if the manifest content is unchanged.
+        """
+        return source_digest(source) == self.source_digest
+
+
+class _NameIndex(Mapping[str, int]):
+    """
+    Name-to-id lookup by binary search over the ids sorted by name.
+
+    Stands in for the dictionary a CompactGraph normally builds, so loading
+    a snapshot does not hash every name.
+    """
+
+    def __init__(self, names: Sequence[str], by_name: Sequence[int]) -> None:
+        self._names = names
+        self._by_name = by_name
+
+    def __getitem__(self, name: str) -> int:
+        names, by_name = self._names, self._by_name
+        low, high = 0, len(by_name)
+        while low < high:
+            middle = (low + high) // 2
+            if names[by_name[middle]] < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(by_name) and names[by_name[low]] == name:
+            return by_name[low]
+        raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def snapshot_path(source: Union[str, "os.PathLike[str]"]) -> str:
+    """
+    Returns the default snapshot location of a manifest.
+
+    Args:
+        source (Union[str, os.PathLike[str]]): Path of the manifest.
+
+    Returns:
+        str: The manifest path with :data:`SNAPSHOT_SUFFIX` appended.
+    """
+    return os.fspath(source) + SNAPSHOT_SUFFIX
+
+
+def source_digest(source: Union[str, "os.PathLike[str]"]) -> bytes:
+    """
+    Hashes the content of a manifest.
+
+    Args:
+        source (Union[str, os.PathLike[str]]): Path of the manifest.
+
+    Returns:
+        bytes: The 32-byte BLAKE2b digest of the file.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def compile_snapshot(
+    source: Union[str, "os.PathLike[str]"],
+    output: Union[str, "os.PathLike[str]", None] = None,
+    order: bool = True,
+) -> str:
+    """
+    Compiles a manifest into a snapshot file.
+
+    Args:
+        source (Union[str, os.PathLike[str]]): Path of the manifest.
+        output (Union[str, os.PathLike[str], None]): Path of the snapshot.
+            Defaults to :func:`snapshot_path` of the manifest.
+        order (bool): Also store the install order. It is skipped if the
+            graph contains a cycle.
+
+    Returns:
+        str: The path of the written snapshot.
+
+    Raises:
+        ManifestDecodeError: If the manifest is malformed.
+    """
+    digest = source_digest(source)
+    graph = load_manifest(source)
+    layers = None
+    if order and not find_cycles(graph):
+        layers = install_order(graph)
+    if output is None:
+        output = snapshot_path(source)
+    write_snapshot(graph, output, digest, layers)
+    return os.fspath(output)
+
+
+def write_snapshot(
+    graph: CompactGraph,
+    path: Union[str, "os.PathLike[str]"],
+    digest: bytes,
+    layers: Optional[List[List[str]]] = None,
+) -> None:
+    """
+    Writes a graph to a snapshot file.
+
+    The file starts with a fixed header followed by little-endian 32-bit
+    int sections, each aligned to 8 bytes: the top-level package ids, the
+    CSR offsets and targets, all ids sorted by name, and the install order
+    as layer offsets and ids. The package names come last, separated by
+    NUL characters.
+
+    Args:
+        graph (CompactGraph): The dependency graph.
+        path (Union[str, os.PathLike[str]]): The file to write.
+        digest (bytes): The 32-byte :func:`source_digest` of the manifest.
+        layers (Optional[List[List[str]]]): The install order to store.
+    """
+    names = list(graph.names)
+    flags = 0
+    if any("\0" in name for name in names):
+        flags |= _NAMES_JSON
+        blob = json.dumps(names).encode("utf-8")
+    else:
+        blob = "\0".join(names).encode("utf-8", "surrogatepass")
+    by_name = array("i", sorted(range(len(names)), key=names.__getitem__))
+    layer_offsets = array("i", [0])
+    layer_nodes = array("i")
+    for layer in layers or ():
+        layer_nodes.extend(graph.id_of(pkg) for pkg in layer)
+        layer_offsets.append(len(layer_nodes))
+    sections = [
+        as_array(graph.keys),
+        as_array(graph.offsets),
+        as_array(graph.targets),
+        by_name,
+        layer_offsets if layers is not None else array("i"),
+        layer_nodes,
+    ]
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        flags,
+        digest,
+        *(len(section) for section in sections),
+        len(blob),
+    )
+    # Write to a temporary file first: processes that still have the old
+    # snapshot mapped must not see it change under them.
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            _write_sections(f, header, sections, blob)
+        # mkstemp creates the file readable only by its owner.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_sections(
+    f: IO[bytes], header: bytes, sections: List["array[int]"], blob: bytes
+) -> None:
+    """
+    Writes the parts of a snapshot, padding every part to the alignment.
+
+    Args:
+        f (IO[bytes]): The open snapshot file.
+        header (bytes): The packed header.
+        sections (List[array[int]]): The int sections in file order.
+        blob (bytes): The encoded names.
+    """
+    f.write(header)
+    f.write(_padding(len(header)))
+    for section in sections:
+        if sys.byteorder != "little":
+            section = array("i", section)
+            section.byteswap()
+        data = section.tobytes()
+        f.write(data)
+        f.write(_padding(len(data)))
+    f.write(blob)
+
+
+def load_snapshot(path: Union[str, "os.PathLike[str]"]) -> Snapshot:
+    """
+    Maps a snapshot file into memory.
+
+    The int sections are used in place as views of the mapped file;
+    only the names are decoded. The file stays mapped as long as the
+    graph is referenced.
+
+    Args:
+        path (Union[str, os.PathLike[str]]): The file to read.
+
+    Returns:
+        Snapshot: The snapshot.
+
+    Raises:
+        ValueError: If the file is not a snapshot, was written by an
+            incompatible version, is corrupt, or cannot be mapped on this
+            platform.
+    """
+    if sys.byteorder != "little" or array("i").itemsize != 4:
+        raise ValueError("Snapshots are not supported on this platform")
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"Not a snapshot file: {path}") from None
+    view = memoryview(mapped)
+    if len(view) < _HEADER.size:
+        raise ValueError(f"Not a snapshot file: {path}")
+    magic, version, flags, digest, *sizes = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"Not a snapshot file: {path}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {version}")
+    bounds = []
+    position = _aligned(_HEADER.size)
+    for size in sizes[:-1]:
+        bounds.append((position, position + 4 * size))
+        position = _aligned(position + 4 * size)
+    if position + sizes[-1] != len(view):
+        raise ValueError(f"Truncated snapshot file: {path}")
+    sections = {
+        name: view[start:end].cast("i") for name, (start, end) in zip(_SECTIONS, bounds)
+    }
+    blob = bytes(view[position:])
+
+    names: List[str] = []
+    try:
+        if flags & _NAMES_JSON:
+            names = json.loads(blob.decode("utf-8"))
+        elif len(sections["offsets"]) > 1:
+            names = blob.decode("utf-8", "surrogatepass").split("\0")
+    except ValueError:
+        raise ValueError(f"Corrupt snapshot file {path}: invalid names") from None
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise ValueError(f"Corrupt snapshot file {path}: invalid names")
+    problem = _check_sections(sections, len(names))
+    if problem is not None:
+        raise ValueError(f"Corrupt snapshot file {path}: {problem}")
+    index = _NameIndex(names, sections["by_name"])
+    graph = CompactGraph(
+        names, sections["keys"], sections["offsets"], sections["targets"], index
+    )
+    return Snapshot(graph, digest, sections["layer_offsets"], sections["layers"])
+
+
+def _check_sections(sections: Mapping[str, Sequence[int]], count: int) -> Optional[str]:
+    """
+    Checks that the int sections of a snapshot are consistent.
+
+    Every id must index the names, and the offsets of the dependencies and
+    of the install layers must be ascending and end at the length of the
+    section they index.
+
+    Args:
+        sections (Mapping[str, Sequence[int]]): The int sections by name.
+        count (int): Number of package names.
+
+    Returns:
+        Optional[str]: A description of the first problem found, or None.
+    """
+    offsets = sections["offsets"]
+    if len(offsets) != count + 1:
+        return "number of names does not match the offsets"
+    if len(sections["by_name"]) != count:
+        return "number of names does not match the name index"
+    if len(sections["layer_offsets"]) or len(sections["layers"]):
+        csr = [("offsets", "targets"), ("layer_offsets", "layers")]
+    else:
+        csr = [("offsets", "targets")]
+    for offsets_name, values_name in csr:
+        offsets, values = sections[offsets_name], sections[values_name]
+        if (
+            not len(offsets)
+            or offsets[0] != 0
+            or offsets[-1] != len(values)
+            or not all(map(operator.le, offsets, islice(offsets, 1, None)))
+        ):
+            return f"invalid {offsets_name}"
+    for name in ("keys", "targets", "by_name", "layers"):
+        ids = sections[name]
+        if len(ids) and (min(ids) < 0 or max(ids) >= count):
+            return f"package id out of range in {name}"
+    return None
+
+
+def _aligned(position: int) -> int:
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
+
+
+def _padding(size: int) -> bytes:
+    return bytes(_aligned(size) - size)
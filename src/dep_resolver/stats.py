@@ -0,0 +1,110 @@
+from __future__ import annotations
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+
+class Stats:
+    """
+    Counters and per-phase timers of a single run.
+
+    The counters are filled in by the functions that accept a ``stats``
+    argument; passing None skips the bookkeeping entirely.
+
+    Attributes:
+        packages (int): Number of top-level packages in the manifest.
+        dependencies (int): Number of dependency edges in the manifest.
+        nodes_expanded (int): Packages whose dependencies were resolved.
+        edges_traversed (int): Dependency edges followed by the resolver.
+        memo_hits (int): Lookups that reused an already resolved subtree.
+        max_depth (int): Most packages on the resolver stack at once.
+        phases (Dict[str, float]): Seconds spent in every phase, in the
+            order the phases were first entered.
+    """
+
+    def __init__(self) -> None:
+        self.packages = 0
+        self.dependencies = 0
+        self.nodes_expanded = 0
+        self.edges_traversed = 0
+        self.memo_hits = 0
+        self.max_depth = 0
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Times the enclosed block and adds it to the phase ``name``.
+
+        Args:
+            name (str): The phase name, e.g. "load".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Collects all counters, timers and the peak RSS.
+
+        Returns:
+            Dict[str, Any]: JSON-serializable statistics.
+        """
+        return {
+            "packages": self.packages,
+            "dependencies": self.dependencies,
+            "nodes_expanded": self.nodes_expanded,
+            "edges_traversed": self.edges_traversed,
+            "memo_hits": self.memo_hits,
+            "max_depth": self.max_depth,
+            "peak_rss_bytes": peak_rss(),
+            "phases": dict(self.phases),
+        }
+
+    def format(self) -> str:
+        """
+        Formats the statistics as a human-readable summary.
+
+        Returns:
+            str: The summary, one item per line.
+        """
+        data = self.as_dict()
+        rss = data["peak_rss_bytes"]
+        lines = [
+            f"Packages: {self.packages}",
+            f"Dependencies: {self.dependencies}",
+            f"Nodes expanded: {self.nodes_expanded}",
+            f"Edges traversed: {self.edges_traversed}",
+            f"Memo hits: {self.memo_hits}",
+            f"Max depth: {self.max_depth}",
+            "Peak RSS: "
+            + (f"{rss / (1024 * 1024):.1f} MiB" if rss is not None else "unknown"),
+        ]
+        width = max((len(name) for name in self.phases), default=0)
+        for name, seconds in self.phases.items():
+            lines.append(f"Time in {name + ':':{width + 1}} {seconds:.4f} s")
+        return "\n".join(lines) + "\n"
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Returns the peak resident set size of the current process.
+
+    Returns:
+        Optional[int]: The peak RSS in bytes, or None where the platform
+        does not report it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes, macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
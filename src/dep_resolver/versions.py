@@ -0,0 +1,799 @@
+from __future__ import annotations
+import functools
+import heapq
+from bisect import bisect_left, bisect_right
+import itertools
+import operator
+import os
+import re
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .graph import CompactGraph
+from .loader import CHUNK_SIZE, iter_manifest
+
+#: A parsed version: its numeric components without trailing zeros, so
+#: "1.2" and "1.2.0" compare equal.
+Version = Tuple[int, ...]
+
+_OPERATOR = re.compile(r"[<>=!]")
+_VERSION = re.compile(r"[0-9]+(?:\.[0-9]+)*\Z")
+_CONSTRAINT = re.compile(r"\s*(==|!=|>=|<=|>|<)\s*([0-9]+(?:\.[0-9]+)*)\s*\Z")
+_OPERATORS: Dict[str, Callable[[Version, Version], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_version(text: str) -> Version:
+    """
+    Parses a dotted numeric version such as "1.2.0".
+
+    Args:
+        text (str): The version.
+
+    Returns:
+        Version: The comparable version.
+
+    Raises:
+        ValueError: If the version is not a dotted sequence of numbers.
+    """
+    if not _VERSION.match(text):
+        raise ValueError(f"Invalid version: {text!r}")
+    parts = [int(part) for part in text.split(".")]
+    while len(parts) > 1 and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+
+class Requirement(NamedTuple):
+    """
+    A dependency on a range of versions of a package, e.g. "dep>=2,<3".
+
+    Attributes:
+        name (str): The package name.
+        constraints (Tuple[Tuple[str, Version], ...]): Comparison operators
+            and versions that every acceptable version satisfies. Empty if
+            any version is acceptable.
+        text (str): The requirement as written.
+    """
+
+    name: str
+    constraints: Tuple[Tuple[str, Version], ...]
+    text: str
+
+    @classmethod
+    def parse(cls, text: str) -> Requirement:
+        """
+        Parses a requirement.
+
+        The package name is followed by comma-separated constraints using
+        the operators ``==``, ``!=``, ``>=``, ``<=``, ``>`` and ``<``.
+
+        Args:
+            text (str): The requirement, e.g. "dep>=2,<3" or "dep".
+
+        Returns:
+            Requirement: The parsed requirement.
+
+        Raises:
+            ValueError: If the requirement is malformed.
+        """
+        match = _OPERATOR.search(text)
+        end = match.start() if match else len(text)
+        name = text[:end].strip()
+        if not name or "," in name:
+            raise ValueError(f"Invalid requirement: {text!r}")
+        constraints = []
+        if match:
+            for spec in text[end:].split(","):
+                constraint = _CONSTRAINT.match(spec)
+                if constraint is None:
+                    raise ValueError(f"Invalid requirement: {text!r}")
+                op, version = constraint.groups()
+                constraints.append((op, parse_version(version)))
+        return cls(name, tuple(constraints), text.strip())
+
+    def allows(self, version: Version) -> bool:
+        """
+        Checks whether a version satisfies the requirement.
+
+        Args:
+            version (Version): The parsed version.
+
+        Returns:
+            bool: True if every constraint holds.
+        """
+        for op, bound in self.constraints:
+            if not _OPERATORS[op](version, bound):
+                return False
+        return True
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class Release(NamedTuple):
+    """
+    One version of a package.
+
+    Attributes:
+        version (str): The version as written in the manifest.
+        key (Version): The parsed version.
+        requires (Tuple[Requirement, ...]): Its dependencies.
+    """
+
+    version: str
+    key: Version
+    requires: Tuple[Requirement, ...]
+
+
+#: Releases of every package, newest first.
+VersionedManifest = Dict[str, List[Release]]
+
+
+class VersionConflictError(Exception):
+    """
+    Raised when no combination of versions satisfies the requirements.
+
+    Attributes:
+        package (str): The package for which no version could be chosen.
+        reasons (List[str]): Why its versions were rejected.
+    """
+
+    def __init__(self, package: str, reasons: Sequence[str]) -> None:
+        self.package = package
+        self.reasons = list(reasons)
+        super().__init__(
+            f"No version of {package!r} can be installed: {'; '.join(self.reasons)}"
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return self.__class__, (self.package, self.reasons)
+
+
+class Solution(NamedTuple):
+    """
+    Versions chosen by :func:`solve`.
+
+    Attributes:
+        versions (Dict[str, str]): The chosen version of every required
+            package, starting with the roots.
+        roots (List[str]): Labels (``name==version``) of the root packages.
+        dependencies (Dict[str, List[str]]): Labels of the dependencies of
+            every chosen package, by label.
+        decisions (int): Number of versions tried successfully, including
+            those undone by backtracking.
+        conflicts (int): Number of incompatibilities learned.
+    """
+
+    versions: Dict[str, str]
+    roots: List[str]
+    dependencies: Dict[str, List[str]]
+    decisions: int
+    conflicts: int
+
+    def graph(self) -> CompactGraph:
+        """
+        Returns the chosen packages as a plain dependency graph.
+
+        Returns:
+            CompactGraph: The graph of labels, with the roots as top-level
+            packages.
+        """
+        graph = CompactGraph.from_mapping(self.dependencies)
+        return graph.with_keys([graph.id_of(root) for root in self.roots])
+
+
+def parse_releases(
+    pkg: str, versions: Any, cache: Optional[Dict[str, Requirement]] = None
+) -> List[Release]:
+    """
+    Parses the versions of a package in the versioned manifest format.
+
+    Args:
+        pkg (str): The package name.
+        versions (Any): The decoded value, a mapping of versions to lists of
+            requirements.
+        cache (Optional[Dict[str, Requirement]]): Requirements parsed so far,
+            by text. Manifests repeat the same requirements many times.
+
+    Returns:
+        List[Release]: The releases, newest first.
+
+    Raises:
+        ValueError: If the value is malformed or lists a version twice.
+    """
+    if not isinstance(versions, Mapping):
+        raise ValueError(
+            f"Versions of {pkg!r} must be an object mapping versions to "
+            "dependency lists"
+        )
+    releases: Dict[Version, Release] = {}
+    for version, requires in versions.items():
+        if not isinstance(requires, list) or not all(
+            isinstance(requirement, str) for requirement in requires
+        ):
+            raise ValueError(
+                f"Dependencies of {pkg!r} {version} must be a list of requirements"
+            )
+        key = parse_version(version)
+        if key in releases:
+            raise ValueError(f"Version {version} of {pkg!r} is listed twice")
+        if cache is None:
+            cache = {}
+        parsed = []
+        for text in requires:
+            requirement = cache.get(text)
+            if requirement is None:
+                requirement = cache[text] = Requirement.parse(text)
+            parsed.append(requirement)
+        releases[key] = Release(version, key, tuple(parsed))
+    return [releases[key] for key in sorted(releases, reverse=True)]
+
+
+def parse_versioned_manifest(
+    manifest: Mapping[str, Mapping[str, Sequence[str]]],
+) -> VersionedManifest:
+    """
+    Parses a decoded manifest in the versioned format.
+
+    Args:
+        manifest (Mapping[str, Mapping[str, Sequence[str]]]): Requirements
+            of every version of every package, e.g.
+            ``{"pkg": {"1.2.0": ["dep>=2,<3"]}}``.
+
+    Returns:
+        VersionedManifest: The releases of every package.
+
+    Raises:
+        ValueError: If the manifest is malformed.
+    """
+    cache: Dict[str, Requirement] = {}
+    return {
+        pkg: parse_releases(pkg, versions, cache) for pkg, versions in manifest.items()
+    }
+
+
+def load_versioned_manifest(
+    source: Union[str, "os.PathLike[str]", IO[str]], chunk_size: int = CHUNK_SIZE
+) -> VersionedManifest:
+    """
+    Loads a manifest in the versioned format one package at a time.
+
+    Args:
+        source (Union[str, os.PathLike[str], IO[str]]): Path of the manifest
+            or an open text stream.
+        chunk_size (int): Number of characters read at a time.
+
+    Returns:
+        VersionedManifest: The releases of every package.
+
+    Raises:
+        ManifestDecodeError: If the manifest is malformed.
+    """
+    manifest: VersionedManifest = {}
+    cache: Dict[str, Requirement] = {}
+
+    def check(pkg: str, versions: Any) -> Optional[str]:
+        try:
+            manifest[pkg] = parse_releases(pkg, versions, cache)
+        except ValueError as e:
+            return str(e)
+        return None
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8") as f:
+            for _ in iter_manifest(f, check, chunk_size):
+                pass
+    else:
+        for _ in iter_manifest(source, check, chunk_size):
+            pass
+    return manifest
+
+
+def is_versioned_manifest(source: Union[str, "os.PathLike[str]"]) -> bool:
+    """
+    Checks whether a manifest uses the versioned format.
+
+    Only the first package is decoded; the plain format maps packages to
+    lists, the versioned format to objects.
+
+    Args:
+        source (Union[str, os.PathLike[str]]): Path of the manifest.
+
+    Returns:
+        bool: True if the first package maps to an object.
+
+    Raises:
+        ManifestDecodeError: If the start of the manifest is malformed.
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        for _, value in iter_manifest(f):
+            return isinstance(value, dict)
+    return False
+
+
+def solve(
+    manifest: Union[VersionedManifest, Mapping[str, Mapping[str, Sequence[str]]]],
+    roots: Optional[Sequence[str]] = None,
+) -> Solution:
+    """
+    Chooses one version of every required package.
+
+    The search is a backtracking search over packages, newest versions
+    first, always deciding the package with the fewest remaining candidate
+    versions. Every decision immediately narrows the candidates of the
+    packages it requires, so a dead end is noticed as soon as a package runs
+    out of candidates. A dead end is explained by the set of decisions that
+    caused it: the search jumps straight back to the latest of them instead
+    of trying the alternatives of unrelated decisions in between, and the
+    combination is cached as a learned incompatibility, so it is never
+    tried again.
+
+    Args:
+        manifest (Union[VersionedManifest, Mapping[str, Mapping[str,
+            Sequence[str]]]]): Parsed releases, or the decoded versioned
+            manifest.
+        roots (Optional[Sequence[str]]): Requirements to satisfy, e.g.
+            "pkg>=2". Defaults to any version of every package.
+
+    Returns:
+        Solution: The chosen versions.
+
+    Raises:
+        VersionConflictError: If the requirements cannot be satisfied.
+        ValueError: If the manifest or a root requirement is malformed.
+    """
+    releases = _as_releases(manifest)
+    if roots is None:
+        requirements = [Requirement(pkg, (), pkg) for pkg in releases]
+    else:
+        requirements = [Requirement.parse(root) for root in roots]
+    return _Solver(releases).solve(requirements)
+
+
+def _as_releases(
+    manifest: Union[VersionedManifest, Mapping[str, Mapping[str, Sequence[str]]]],
+) -> VersionedManifest:
+    """
+    Returns parsed releases, parsing a decoded manifest if needed.
+
+    Args:
+        manifest (Union[VersionedManifest, Mapping[str, Mapping[str,
+            Sequence[str]]]]): Parsed releases or a decoded manifest.
+
+    Returns:
+        VersionedManifest: The releases of every package.
+    """
+    for versions in manifest.values():
+        if isinstance(versions, Mapping):
+            return parse_versioned_manifest(manifest)  # type: ignore[arg-type]
+        break
+    return manifest  # type: ignore[return-value]
+
+
+class _Frame:
+    """
+    A package being decided and the state of its candidate versions.
+
+    Attributes:
+        pkg (str): The package.
+        candidates (List[int]): Indexes of its candidate releases.
+        pos (int): Index of the next candidate to try.
+        conflict (Set[str]): Decided packages that explain why the
+            candidates tried so far failed.
+        pushed (List[str]): Packages narrowed by the current decision.
+        failures (List[_Reason]): Why the candidates tried so far failed.
+    """
+
+    __slots__ = ("pkg", "candidates", "pos", "conflict", "pushed", "failures")
+
+    def __init__(self, pkg: str, candidates: List[int], conflict: Set[str]) -> None:
+        self.pkg = pkg
+        self.candidates = candidates
+        self.pos = 0
+        self.conflict = conflict
+        self.pushed: List[str] = []
+        self.failures: List[_Reason] = []
+
+
+#: Number of rejected versions described in a VersionConflictError.
+_MAX_REASONS = 5
+
+#: Why a candidate failed: a kind followed by the details, formatted only
+#: for the error message.
+_Reason = Tuple[Any, ...]
+
+#: Learned incompatibility: decisions (package, release index) that cannot
+#: all hold at once.
+_Nogood = Tuple[Tuple[str, int], ...]
+
+
+class _Solver:
+    """
+    State of a search, see :func:`solve`.
+
+    Every package with at least one requirement on it keeps a stack of
+    candidate sets, narrowed by one requirement per entry, together with
+    the package that imposed it (None for roots). A candidate set is an int
+    with one bit per release, so narrowing it is a single AND with the set
+    of releases a requirement allows, which is computed once per
+    requirement. Undoing a decision pops the entries it pushed. Undecided
+    packages are queued by their number of candidates; entries are not
+    removed when the set changes, but skipped once they are out of date.
+
+    Args:
+        releases (VersionedManifest): The releases of every package.
+    """
+
+    def __init__(self, releases: VersionedManifest) -> None:
+        self.releases = releases
+        self.domains: Dict[str, List[int]] = {}
+        self.allowed: Dict[int, int] = {}
+        self.keys: Dict[str, List[Version]] = {}
+        self.sources: Dict[str, List[Optional[str]]] = {}
+        self.assigned: Dict[str, int] = {}
+        self.pending: Set[str] = set()
+        self.queue: List[Tuple[int, int, str, int]] = []
+        self.counter = itertools.count()
+        self.nogoods: Dict[Tuple[str, int], List[_Nogood]] = {}
+        self.reason: _Reason = ()
+        self.decisions = 0
+        self.conflicts = 0
+
+    def solve(self, requirements: Sequence[Requirement]) -> Solution:
+        """
+        Runs the search.
+
+        Args:
+            requirements (Sequence[Requirement]): The root requirements.
+
+        Returns:
+            Solution: The chosen versions.
+
+        Raises:
+            VersionConflictError: If the requirements cannot be satisfied.
+        """
+        for requirement in requirements:
+            if self._constrain(requirement, None, []) is not None:
+                reason = self._describe(self.reason)
+                raise VersionConflictError(requirement.name, [reason])
+        stack: List[_Frame] = []
+        descend = True
+        while True:
+            if descend:
+                pkg = self._select()
+                if pkg is None:
+                    return self._solution(requirements)
+                domain = self.domains[pkg][-1]
+                candidates = [i for i in range(domain.bit_length()) if domain >> i & 1]
+                sources = {source for source in self.sources[pkg] if source}
+                stack.append(_Frame(pkg, candidates, sources))
+            frame = stack[-1]
+            while frame.pos < len(frame.candidates):
+                index = frame.candidates[frame.pos]
+                frame.pos += 1
+                conflict = self._excluded(frame.pkg, index)
+                if conflict is None:
+                    conflict = self._assign(frame, index)
+                    if conflict is None:
+                        break
+                frame.conflict |= conflict
+                frame.failures.append(self.reason)
+            else:
+                stack.pop()
+                self._enqueue(frame.pkg)
+                conflict = frame.conflict
+                conflict.discard(frame.pkg)
+                if not conflict:
+                    raise self._error(frame)
+                self._learn(conflict)
+                culprit = frame.pkg
+                while stack[-1].pkg not in conflict:
+                    self._unassign(stack.pop())
+                frame = stack[-1]
+                failed = frame.candidates[frame.pos - 1]
+                self._unassign(frame)
+                frame.conflict |= conflict
+                frame.failures.append(("deep", frame.pkg, failed, culprit))
+                descend = False
+                continue
+            descend = True
+
+    def _select(self) -> Optional[str]:
+        """
+        Returns the required, undecided package with the fewest candidates.
+
+        Returns:
+            Optional[str]: The package, or None if every required package is
+            decided.
+        """
+        queue = self.queue
+        while queue:
+            _, _, pkg, domain = heapq.heappop(queue)
+            if pkg in self.pending and self.domains[pkg][-1] == domain:
+                return pkg
+        return None
+
+    def _enqueue(self, pkg: str) -> None:
+        """
+        Queues an undecided package with its current number of candidates.
+
+        Args:
+            pkg (str): The package.
+        """
+        domain = self.domains[pkg][-1]
+        entry = (bin(domain).count("1"), next(self.counter), pkg, domain)
+        heapq.heappush(self.queue, entry)
+
+    def _constrain(
+        self, requirement: Requirement, source: Optional[str], pushed: List[str]
+    ) -> Optional[Set[str]]:
+        """
+        Narrows the candidates of a required package.
+
+        Args:
+            requirement (Requirement): The requirement.
+            source (Optional[str]): The decided package that requires it, or
+                None for a root requirement.
+            pushed (List[str]): Packages whose candidates were narrowed; the
+                package is appended if its candidates are.
+
+        Returns:
+            Optional[Set[str]]: None if candidates remain; otherwise the
+            decided packages, besides ``source``, that explain the conflict.
+            ``self.reason`` describes it.
+        """
+        name = requirement.name
+        releases = self.releases.get(name)
+        if releases is None:
+            source_index = self.assigned.get(source)  # type: ignore[arg-type]
+            self.reason = ("undefined", source, source_index, requirement)
+            return set()
+        allowed = self.allowed.get(id(requirement))
+        if allowed is None:
+            allowed = self._allowed(requirement, releases)
+        index = self.assigned.get(name)
+        if index is not None:
+            if allowed >> index & 1:
+                return None
+            source_index = self.assigned.get(source)  # type: ignore[arg-type]
+            self.reason = ("selected", source, source_index, requirement, index)
+            return {name}
+        stack = self.domains.get(name)
+        if stack is None:
+            stack = self.domains[name] = [(1 << len(releases)) - 1]
+            self.sources[name] = []
+        domain = stack[-1] & allowed
+        stack.append(domain)
+        sources = self.sources[name]
+        sources.append(source)
+        pushed.append(name)
+        self.pending.add(name)
+        if not domain:
+            source_index = self.assigned.get(source)  # type: ignore[arg-type]
+            self.reason = ("narrowed", source, source_index, requirement)
+            return {pkg for pkg in sources if pkg and pkg != source}
+        if domain != stack[-2] or len(sources) == 1:
+            self._enqueue(name)
+        return None
+
+    def _allowed(self, requirement: Requirement, releases: List[Release]) -> int:
+        """
+        Computes and caches the releases a requirement allows.
+
+        Releases are sorted, so every constraint but ``!=`` allows a run of
+        consecutive releases, found by bisection.
+
+        Args:
+            requirement (Requirement): The requirement.
+            releases (List[Release]): The releases of its package.
+
+        Returns:
+            int: The set of allowed release indexes, as bits.
+        """
+        keys = self.keys.get(requirement.name)
+        if keys is None:
+            keys = self.keys[requirement.name] = [r.key for r in reversed(releases)]
+        size = len(keys)
+        full = (1 << size) - 1
+        allowed = full
+        for op, bound in requirement.constraints:
+            # Release i is the (size - 1 - i)-th smallest, so the n newest
+            # releases are the mask (1 << n) - 1.
+            if op == ">=" or op == "<":
+                newer = (1 << size - bisect_left(keys, bound)) - 1
+                allowed &= newer if op == ">=" else full ^ newer
+            elif op == ">" or op == "<=":
+                newer = (1 << size - bisect_right(keys, bound)) - 1
+                allowed &= newer if op == ">" else full ^ newer
+            else:
+                pos = bisect_left(keys, bound)
+                equal = 0
+                if pos < size and keys[pos] == bound:
+                    equal = 1 << size - 1 - pos
+                allowed &= equal if op == "==" else full ^ equal
+        # Requirements live as long as the manifest, so ids stay unique.
+        self.allowed[id(requirement)] = allowed
+        return allowed
+
+    def _assign(self, frame: _Frame, index: int) -> Optional[Set[str]]:
+        """
+        Decides a version of the frame's package and narrows its requirements.
+
+        Args:
+            frame (_Frame): The frame of the package.
+            index (int): Index of the release.
+
+        Returns:
+            Optional[Set[str]]: None on success; otherwise the decision is
+            undone and the explaining packages are returned.
+        """
+        pkg = frame.pkg
+        self.assigned[pkg] = index
+        self.pending.discard(pkg)
+        pushed = frame.pushed
+        for requirement in self.releases[pkg][index].requires:
+            conflict = self._constrain(requirement, pkg, pushed)
+            if conflict is not None:
+                self._unassign(frame)
+                return conflict
+        self.decisions += 1
+        return None
+
+    def _unassign(self, frame: _Frame) -> None:
+        """
+        Undoes the decision of a frame.
+
+        Args:
+            frame (_Frame): The frame.
+        """
+        pushed = frame.pushed
+        while pushed:
+            name = pushed.pop()
+            self.domains[name].pop()
+            sources = self.sources[name]
+            sources.pop()
+            if sources:
+                self._enqueue(name)
+            else:
+                self.pending.discard(name)
+        pkg = frame.pkg
+        del self.assigned[pkg]
+        self.pending.add(pkg)
+        self._enqueue(pkg)
+
+    def _excluded(self, pkg: str, index: int) -> Optional[Set[str]]:
+        """
+        Checks a candidate against the learned incompatibilities.
+
+        Args:
+            pkg (str): The package.
+            index (int): Index of the candidate release.
+
+        Returns:
+            Optional[Set[str]]: The other packages of a matching
+            incompatibility, or None.
+        """
+        nogoods = self.nogoods.get((pkg, index))
+        if nogoods is None:
+            return None
+        assigned = self.assigned
+        for nogood in nogoods:
+            for other, other_index in nogood:
+                if other != pkg and assigned.get(other) != other_index:
+                    break
+            else:
+                self.reason = ("nogood", pkg, index)
+                return {other for other, _ in nogood if other != pkg}
+        return None
+
+    def _learn(self, conflict: Set[str]) -> None:
+        """
+        Records the current versions of some packages as incompatible.
+
+        Args:
+            conflict (Set[str]): The decided packages.
+        """
+        nogood = tuple((pkg, self.assigned[pkg]) for pkg in conflict)
+        for decision in nogood:
+            self.nogoods.setdefault(decision, []).append(nogood)
+        self.conflicts += 1
+
+    def _describe(self, reason: _Reason) -> str:
+        """
+        Formats why a candidate failed.
+
+        Args:
+            reason (_Reason): The reason.
+
+        Returns:
+            str: The description.
+        """
+        kind = reason[0]
+        if kind == "deep":
+            _, pkg, index, culprit = reason
+            version = self.releases[pkg][index].version
+            return f"{pkg} {version} leads to a conflict on {culprit}"
+        if kind == "nogood":
+            _, pkg, index = reason
+            version = self.releases[pkg][index].version
+            return f"{pkg} {version} conflicts with earlier choices"
+        source, source_index, requirement = reason[1:4]
+        if source is None:
+            label = "root"
+        else:
+            label = f"{source} {self.releases[source][source_index].version}"
+        name = requirement.name
+        if kind == "undefined":
+            return f"{label} requires {name}, which is not defined"
+        if kind == "selected":
+            version = self.releases[name][reason[4]].version
+            return f"{label} requires {requirement}, but {name} {version} is selected"
+        return (
+            f"{label} requires {requirement}, which no version of {name} allowed "
+            "by the other requirements matches"
+        )
+
+    def _error(self, frame: _Frame) -> VersionConflictError:
+        """
+        Describes why no version of a package could be chosen.
+
+        Args:
+            frame (_Frame): The exhausted frame.
+
+        Returns:
+            VersionConflictError: The error.
+        """
+        reasons = [self._describe(reason) for reason in frame.failures[:_MAX_REASONS]]
+        if len(frame.failures) > _MAX_REASONS:
+            reasons.append(f"{len(frame.failures) - _MAX_REASONS} more versions failed")
+        return VersionConflictError(frame.pkg, reasons)
+
+    def _solution(self, requirements: Sequence[Requirement]) -> Solution:
+        """
+        Collects the decisions.
+
+        Args:
+            requirements (Sequence[Requirement]): The root requirements.
+
+        Returns:
+            Solution: The chosen versions, in breadth-first order from the
+            roots.
+        """
+        labels = {
+            pkg: f"{pkg}=={self.releases[pkg][index].version}"
+            for pkg, index in self.assigned.items()
+        }
+        order = list(dict.fromkeys(requirement.name for requirement in requirements))
+        roots = [labels[pkg] for pkg in order]
+        seen = set(order)
+        dependencies: Dict[str, List[str]] = {}
+        for pkg in order:
+            release = self.releases[pkg][self.assigned[pkg]]
+            deps = list(dict.fromkeys(req.name for req in release.requires))
+            dependencies[labels[pkg]] = [labels[dep] for dep in deps]
+            for dep in deps:
+                if dep not in seen:
+                    seen.add(dep)
+                    order.append(dep)
+        versions = {pkg: labels[pkg][len(pkg) + 2 :] for pkg in order}
+        return Solution(versions, roots, dependencies, self.decisions, self.conflicts)
@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from benchmarks import generators
+from benchmarks.suite import Benchmark, build_suite, compare, main, measure
+from dep_resolver.order import install_order
+from dep_resolver.versions import parse_version, parse_versioned_manifest, solve
+
+
+class TestGenerators(unittest.TestCase):
+    def test_shapes(self):
+        self.assertEqual(
+            generators.chain(2), {"pkg0": ["pkg1"], "pkg1": ["pkg2"], "pkg2": []}
+        )
+        self.assertEqual(
+            generators.fan_out(2), {"pkg0": ["pkg1", "pkg2"], "pkg1": [], "pkg2": []}
+        )
+        self.assertEqual(
+            generators.diamonds(1),
+            {
+                "tip0": ["left0", "right0"],
+                "left0": ["tip1"],
+                "right0": ["tip1"],
+                "tip1": [],
+            },
+        )
+
+    def test_random_graphs(self):
+        for generate in (generators.random_dag, generators.power_law):
+            with self.subTest(generate=generate.__name__):
+                deps = generate(1000, seed=1)
+                self.assertEqual(len(deps), 1000)
+                self.assertEqual(generate(1000, seed=1), deps)
+                self.assertNotEqual(generate(1000, seed=2), deps)
+                for dep_list in deps.values():
+                    self.assertEqual(len(set(dep_list)), len(dep_list))
+                # Raises CircularDependencyError if the graph has a cycle.
+                install_order(deps)
+
+    def test_power_law_popularity(self):
+        deps = generators.power_law(10_000)
+        dependents = sum(dep_list.count("pkg0") for dep_list in deps.values())
+        self.assertGreater(dependents, len(deps) // 10)
+
+    def test_version_space(self):
+        manifest = generators.version_space(200, versions=10, seed=1)
+        self.assertEqual(generators.version_space(200, versions=10, seed=1), manifest)
+        self.assertEqual(len(manifest), 200)
+        releases = parse_versioned_manifest(manifest)
+        self.assertTrue(all(len(pkg) == 10 for pkg in releases.values()))
+        solution = solve(releases)
+        for pkg, version in solution.versions.items():
+            release = next(r for r in releases[pkg] if r.version == version)
+            for requirement in release.requires:
+                chosen = parse_version(solution.versions[requirement.name])
+                self.assertTrue(requirement.allows(chosen))
+
+
+class TestSuite(unittest.TestCase):
+    def test_suite_names(self):
+        names = [benchmark.name for benchmark in build_suite()]
+        self.assertEqual(len(names), len(set(names)))
+        for prefix in ("resolve/", "solve/", "print/", "cli/"):
+            self.assertTrue(any(name.startswith(prefix) for name in names), prefix)
+
+    def test_measure(self):
+        calls = []
+        benchmark = Benchmark("test", lambda: 3, lambda n: calls.append([0] * n))
+        result = measure(benchmark, repeat=2)
+        self.assertEqual(len(calls), 3)
+        self.assertGreaterEqual(result["seconds"], 0)
+        self.assertGreater(result["peak_bytes"], 0)
+        self.assertNotIn("peak_bytes", measure(benchmark, repeat=1, memory=False))
+
+    def test_compare(self):
+        baseline = {"a": {"seconds": 1.0, "peak_bytes": 100}, "b": {"seconds": 1.0}}
+        results = {
+            "a": {"seconds": 1.2, "peak_bytes": 200},
+            "b": {"seconds": 0.5},
+            "c": {"seconds": 9.0},
+        }
+        self.assertEqual(
+            compare(results, baseline, 0.25), ["a peak_bytes: 100 -> 200 (+100.0%)"]
+        )
+        self.assertEqual(len(compare(results, baseline, 0.1)), 2)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            argv = ["--filter", "chain", "--scale", "0.01", "--repeat", "1"]
+            with redirect_stdout(StringIO()) as out:
+                self.assertEqual(main([*argv, "--output", output]), 0)
+            self.assertIn("resolve/chain-100k", out.getvalue())
+            with open(output, encoding="utf-8") as f:
+                document = json.load(f)
+            self.assertEqual(document["scale"], 0.01)
+            self.assertIn("cli/chain-1k", document["benchmarks"])
+
+            for metrics in document["benchmarks"].values():
+                metrics["peak_bytes"] = 1
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(document, f)
+            with redirect_stdout(StringIO()) as out:
+                self.assertEqual(main([*argv, "--baseline", output]), 1)
+            self.assertIn("Regression: resolve/chain-100k peak_bytes", out.getvalue())
+
+            with redirect_stdout(StringIO()):
+                self.assertEqual(main(["--scale", "2", "--baseline", output]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,38 @@
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open
 from io import StringIO
 from pathlib import Path
-from dep_resolver.cli import run
-import argparse
+import dep_resolver
+from dep_resolver import cli
+from dep_resolver.cli import build_parser, run
+from dep_resolver.formats import GRAPH_FORMATS, TREE_FORMATS
+from dep_resolver.graph import CompactGraph
+from dep_resolver.loader import CONFLICT_POLICIES
+from dep_resolver.parallel import resolve_parallel
+
+# Microseconds that importing the package and the command line may take
+# before printing the help, as reported by "python -X importtime".
+IMPORT_BUDGET_US = 50_000
+
+
+def _args(json_file, *options):
+    # parse_known_args keeps working while parse_args is patched by the tests.
+    argv = [str(json_file), "--log-level", "INFO", *options]
+    args, unknown = build_parser().parse_known_args(argv)
+    assert not unknown, unknown
+    return args
 
 
 class TestCLI(unittest.TestCase):
     @patch("argparse.ArgumentParser.parse_args")
     def test_cli_file_not_found(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("nonexistent.json"), log_level="INFO", indent_size=4
-        )
+        mock_args.return_value = _args(Path("nonexistent.json"))
         with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
             exit_code = run()
             self.assertEqual(exit_code, 1)
@@ -19,11 +40,7 @@ class TestCLI(unittest.TestCase):
 
     @patch("argparse.ArgumentParser.parse_args")
     def test_cli_invalid_json(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("tests/test_data/invalid.json"),
-            log_level="INFO",
-            indent_size=4,
-        )
+        mock_args.return_value = _args(Path("tests/test_data/invalid.json"))
         with patch("builtins.open", mock_open(read_data='{"invalid_json": ')):
             with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
                 exit_code = run()
@@ -32,12 +49,11 @@ class TestCLI(unittest.TestCase):
 
     @patch("argparse.ArgumentParser.parse_args")
     def test_cli_unexpected_exception(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("tests/test_data/dependencies.json"),
-            log_level="INFO",
-            indent_size=4,
-        )
-        with patch("json.load", side_effect=Exception("Unexpected error")):
+        mock_args.return_value = _args(Path("tests/test_data/dependencies.json"))
+        with patch(
+            "dep_resolver.loader.load_manifest",
+            side_effect=Exception("Unexpected error"),
+        ):
             with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
                 exit_code = run()
                 self.assertEqual(exit_code, 1)
@@ -47,13 +63,9 @@ class TestCLI(unittest.TestCase):
 
     @patch("argparse.ArgumentParser.parse_args")
     def test_cli_unexpected_resolution_exception(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("tests/test_data/dependencies.json"),
-            log_level="INFO",
-            indent_size=4,
-        )
+        mock_args.return_value = _args(Path("tests/test_data/dependencies.json"))
         with patch(
-            "dep_resolver.cli.resolve_dependencies",
+            "dep_resolver.resolver.resolve_dependencies",
             side_effect=Exception("Unexpected error"),
         ):
             with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
@@ -66,13 +78,9 @@ class TestCLI(unittest.TestCase):
 
     @patch("argparse.ArgumentParser.parse_args")
     def test_cli_print_exception(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("tests/test_data/dependencies.json"),
-            log_level="INFO",
-            indent_size=4,
-        )
+        mock_args.return_value = _args(Path("tests/test_data/dependencies.json"))
         with patch(
-            "dep_resolver.cli.print_dependency_graph",
+            "dep_resolver.printer.print_dependency_graph",
             side_effect=Exception("Print error"),
         ):
             with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
@@ -84,32 +92,629 @@ class TestCLI(unittest.TestCase):
                 )
 
     @patch("argparse.ArgumentParser.parse_args")
-    def test_cli_recursion_error(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("tests/test_data/circular.json"),
-            log_level="INFO",
-            indent_size=4,
-        )
+    def test_cli_circular_dependency(self, mock_args):
+        mock_args.return_value = _args(Path("tests/test_data/circular.json"))
         with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
             exit_code = run()
             self.assertEqual(exit_code, 1)
             self.assertIn(
                 "An error occurred while resolving dependencies", cm.output[0]
             )
+            self.assertIn("Cycle group 1 of 1", cm.output[1])
+            self.assertIn("pkg1 -> pkg2 -> pkg1", cm.output[1])
 
     @patch("argparse.ArgumentParser.parse_args")
     def test_cli_success(self, mock_args):
-        mock_args.return_value = argparse.Namespace(
-            json_file=Path("tests/test_data/dependencies.json"),
-            log_level="INFO",
-            indent_size=4,
-        )
+        mock_args.return_value = _args(Path("tests/test_data/dependencies.json"))
         with patch("sys.stdout", new=StringIO()) as fake_out:
             exit_code = run()
             self.assertEqual(exit_code, 0)
             output = fake_out.getvalue()
             self.assertIn("- pkg1", output)
 
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_collapse_cycles(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/circular.json"), "--collapse-cycles"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            with self.assertLogs("dep_resolver.cli", level="WARNING") as cm:
+                exit_code = run()
+            self.assertEqual(exit_code, 0)
+            self.assertIn("pkg1 -> pkg2 -> pkg1", cm.output[0])
+            self.assertEqual(fake_out.getvalue(), "- <cycle: pkg1, pkg2>\n")
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_dedupe(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--dedupe"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            exit_code = run()
+            self.assertEqual(exit_code, 0)
+            self.assertEqual(
+                fake_out.getvalue(),
+                "- pkg1\n    - pkg2\n        - pkg3\n    - pkg3\n"
+                "- pkg2 (deduped)\n- pkg3\n",
+            )
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_order(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--order"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            exit_code = run()
+            self.assertEqual(exit_code, 0)
+            self.assertEqual(
+                fake_out.getvalue(),
+                "Layer 1 (width 1): pkg3\n"
+                "Layer 2 (width 1): pkg2\n"
+                "Layer 3 (width 1): pkg1\n"
+                "Critical path length: 3\n",
+            )
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_why(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--why", "pkg3"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run(), 0)
+        self.assertEqual(fake_out.getvalue(), "pkg1 -> pkg3\n")
+
+    def test_cli_why_circular_dependency(self):
+        json_file = "tests/test_data/circular.json"
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run([json_file, "--why", "pkg2"]), 0)
+        self.assertEqual(fake_out.getvalue(), "pkg1 -> pkg2\n")
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_rdeps(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/circular.json"), "--rdeps", "pkg1"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run(), 0)
+        self.assertEqual(fake_out.getvalue(), "pkg1\npkg2\n")
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_query_unknown_package(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--rdeps", "missing"
+        )
+        with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+            self.assertEqual(run(), 1)
+        self.assertIn("Package not found: missing", cm.output[0])
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_stats(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--stats"
+        )
+        with patch("sys.stdout", new=StringIO()), patch(
+            "sys.stderr", new=StringIO()
+        ) as fake_err:
+            self.assertEqual(run(), 0)
+        summary = fake_err.getvalue()
+        self.assertIn("Packages: 3\n", summary)
+        self.assertIn("Nodes expanded: 3\n", summary)
+        for phase in ("load", "resolve", "print"):
+            self.assertIn(f"Time in {phase}:", summary)
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_stats_json(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--order", "--stats", "json"
+        )
+        with patch("sys.stdout", new=StringIO()), patch(
+            "sys.stderr", new=StringIO()
+        ) as fake_err:
+            self.assertEqual(run(), 0)
+        stats = json.loads(fake_err.getvalue())
+        self.assertEqual(stats["dependencies"], 3)
+        self.assertEqual(list(stats["phases"]), ["load", "order", "print"])
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_profile(self, mock_args):
+        with tempfile.TemporaryDirectory() as tmp:
+            profile = Path(tmp) / "run.prof"
+            mock_args.return_value = _args(
+                Path("tests/test_data/dependencies.json"), "--profile", str(profile)
+            )
+            with patch("sys.stdout", new=StringIO()):
+                self.assertEqual(run(), 0)
+            self.assertIn("resolve_dependencies", str(pstats.Stats(str(profile)).stats))
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_jobs(self, mock_args):
+        mock_args.return_value = _args(
+            Path("tests/test_data/dependencies.json"), "--jobs", "2"
+        )
+        with patch(
+            "dep_resolver.parallel.resolve_parallel", wraps=resolve_parallel
+        ) as parallel, patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run(), 0)
+        self.assertEqual(parallel.call_args.kwargs["jobs"], 2)
+        self.assertIn("- pkg1\n    - pkg2\n", fake_out.getvalue())
+
+    def test_cli_compile_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = Path(tmp) / "dependencies.json"
+            json_file.write_text(Path("tests/test_data/dependencies.json").read_text())
+            self.assertEqual(run(["compile", str(json_file)]), 0)
+            snapshot = Path(tmp) / "dependencies.json.snap"
+            self.assertTrue(snapshot.is_file())
+
+            with patch("dep_resolver.loader.load_manifest") as load, patch(
+                "sys.stdout", new=StringIO()
+            ) as fake_out:
+                self.assertEqual(run([str(json_file), "--order"]), 0)
+            load.assert_not_called()
+            self.assertIn("Layer 1 (width 1): pkg3\n", fake_out.getvalue())
+
+            json_file.write_text(json.dumps({"pkg1": ["pkg4"]}))
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run([str(json_file)]), 0)
+            self.assertEqual(fake_out.getvalue(), "- pkg1\n    - pkg4\n")
+
+    def test_cli_snapshot_option(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = Path(tmp) / "graph.snap"
+            json_file = "tests/test_data/dependencies.json"
+            self.assertEqual(run(["compile", json_file, "-o", str(snapshot)]), 0)
+            with patch("dep_resolver.loader.load_manifest") as load, patch(
+                "sys.stdout", new=StringIO()
+            ) as fake_out:
+                self.assertEqual(
+                    run([json_file, "--snapshot", str(snapshot), "--why", "pkg3"]), 0
+                )
+            load.assert_not_called()
+            self.assertEqual(fake_out.getvalue(), "pkg1 -> pkg3\n")
+
+            snapshot.write_bytes(b"garbage")
+            with self.assertLogs("dep_resolver.cli", level="WARNING") as cm, patch(
+                "sys.stdout", new=StringIO()
+            ):
+                self.assertEqual(run([json_file, "--snapshot", str(snapshot)]), 0)
+            self.assertIn("Ignoring snapshot", cm.output[0])
+
+    def test_cli_compile_invalid_json(self):
+        with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+            self.assertEqual(run(["compile", "tests/test_data/invalid.json"]), 1)
+        self.assertIn("Invalid JSON file", cm.output[0])
+
+    def test_cli_root_and_max_depth(self):
+        json_file = "tests/test_data/dependencies.json"
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            argv = [json_file, "--root", "pkg2", "--root", "pkg1", "--max-depth", "1"]
+            self.assertEqual(run(argv), 0)
+        self.assertEqual(
+            fake_out.getvalue(),
+            "- pkg2\n    - pkg3\n- pkg1\n    - pkg2\n    - pkg3\n",
+        )
+        with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+            self.assertEqual(run([json_file, "--root", "unknown"]), 1)
+        self.assertIn("Package not found: unknown", cm.output[0])
+
+    def test_cli_dedupe_with_max_depth(self):
+        json_file = "tests/test_data/dependencies.json"
+        for options in (["--dedupe"], ["--max-nodes", "1", "--overflow", "dedupe"]):
+            with self.subTest(options=options):
+                with patch("sys.stderr", new=StringIO()) as fake_err:
+                    with self.assertRaises(SystemExit) as cm:
+                        run([json_file, "--max-depth", "1", *options])
+                self.assertEqual(cm.exception.code, 2)
+                self.assertIn(
+                    "not allowed with argument --max-depth", fake_err.getvalue()
+                )
+
+    def test_cli_conflicting_strategies(self):
+        json_file = "tests/test_data/dependencies.json"
+        cases = [
+            (
+                ["--root", "pkg1", "--jobs", "2"],
+                "--jobs: not allowed with argument --root",
+            ),
+            (
+                ["--max-depth", "1", "--jobs", "0"],
+                "--jobs: not allowed with argument --max-depth",
+            ),
+        ]
+        for options, message in cases:
+            with self.subTest(options=options):
+                with patch("sys.stderr", new=StringIO()) as fake_err:
+                    with self.assertRaises(SystemExit) as cm:
+                        run([json_file, *options])
+                self.assertEqual(cm.exception.code, 2)
+                self.assertIn(message, fake_err.getvalue())
+
+    def test_cli_estimate_graph_format(self):
+        json_file = "tests/test_data/dependencies.json"
+        for output_format in ("ndjson", "dot"):
+            with self.subTest(format=output_format):
+                with patch("sys.stderr", new=StringIO()) as fake_err:
+                    with self.assertRaises(SystemExit) as cm:
+                        run([json_file, "--estimate", "--format", output_format])
+                self.assertEqual(cm.exception.code, 2)
+                self.assertIn(
+                    f"--estimate: not allowed with argument --format {output_format}",
+                    fake_err.getvalue(),
+                )
+
+    def test_cli_options_ignored_by_queries(self):
+        json_file = "tests/test_data/dependencies.json"
+        tree_options = [
+            ["--max-depth", "1"],
+            ["--format", "json"],
+            ["--dedupe"],
+            ["--indent-size", "2"],
+            ["--estimate"],
+            ["--max-nodes", "10"],
+            ["--jobs", "2"],
+        ]
+        cases = [
+            (["--order", "--why", "pkg3"], "--why: not allowed with argument --order"),
+            (
+                ["--order", "--rdeps", "pkg3"],
+                "--rdeps: not allowed with argument --order",
+            ),
+            (
+                ["--why", "pkg3", "--collapse-cycles"],
+                "--collapse-cycles: not allowed with argument --why",
+            ),
+            (
+                ["--rdeps", "pkg3", "--collapse-cycles"],
+                "--collapse-cycles: not allowed with argument --rdeps",
+            ),
+        ]
+        for query in (["--order"], ["--why", "pkg3"], ["--rdeps", "pkg3"]):
+            for options in tree_options:
+                message = f"{options[0]}: not allowed with argument {query[0]}"
+                cases.append(([*query, *options], message))
+        for options, message in cases:
+            with self.subTest(options=options):
+                with patch("sys.stderr", new=StringIO()) as fake_err:
+                    with self.assertRaises(SystemExit) as cm:
+                        run([json_file, *options])
+                self.assertEqual(cm.exception.code, 2)
+                self.assertIn(message, fake_err.getvalue())
+
+    def test_cli_queries_with_root(self):
+        json_file = "tests/test_data/dependencies.json"
+        cases = [
+            (["--order"], "Layer 1 (width 1): pkg3\nLayer 2 (width 1): pkg2\n"),
+            (["--why", "pkg3"], "pkg2 -> pkg3\n"),
+            (["--rdeps", "pkg3"], "pkg2\n"),
+        ]
+        for options, output in cases:
+            with self.subTest(options=options):
+                with patch("sys.stdout", new=StringIO()) as fake_out:
+                    self.assertEqual(run([json_file, "--root", "pkg2", *options]), 0)
+                self.assertTrue(fake_out.getvalue().startswith(output))
+
+    def test_cli_multiple_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "a.json").write_text(json.dumps({"pkg1": ["pkg2"]}))
+            Path(tmp, "b.json").write_text(json.dumps({"pkg2": ["pkg3"]}))
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run([tmp]), 0)
+            self.assertEqual(
+                fake_out.getvalue(),
+                "- pkg1\n    - pkg2\n        - pkg3\n- pkg2\n    - pkg3\n",
+            )
+
+            Path(tmp, "c.json").write_text(json.dumps({"pkg1": [], "pkg3": ["pkg1"]}))
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run([str(Path(tmp, "*.json"))]), 1)
+            self.assertIn("'pkg1' is defined in", cm.output[0])
+            self.assertIn("--on-conflict", cm.output[0])
+
+            pattern = str(Path(tmp, "*.json"))
+            argv = [pattern, "--on-conflict", "union", "--load-jobs", "2"]
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run(argv), 1)
+            self.assertIn("Cycle group 1 of 1", cm.output[1])
+            sources = ", ".join(str(Path(tmp, f"{name}.json")) for name in "abc")
+            self.assertIn(f"defined in: {sources}", cm.output[2])
+
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run([str(Path(tmp, "a.json")), "missing*.json"]), 1)
+            self.assertIn("File not found: missing*.json", cm.output[0])
+
+    def test_cli_versioned_manifest(self):
+        manifest = {
+            "app": {"1.0": ["lib>=2", "util"], "2.0": ["lib>=3", "util<2"]},
+            "lib": {"2.0": ["util>=2"], "3.1": ["util>=3"]},
+            "util": {"1.0": [], "3.0": []},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = str(Path(tmp, "versions.json"))
+            Path(json_file).write_text(json.dumps(manifest))
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run([json_file, "--root", "app", "--dedupe"]), 0)
+            self.assertEqual(
+                fake_out.getvalue(),
+                "- app==1.0\n    - lib==3.1\n        - util==3.0\n    - util==3.0\n",
+            )
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run([json_file, "--root", "lib<3", "--order"]), 0)
+            self.assertIn("Layer 2 (width 1): lib==2.0", fake_out.getvalue())
+
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run([json_file, "--root", "app>=2"]), 1)
+            self.assertIn("Cannot satisfy the version requirements", cm.output[0])
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run([json_file, "--root", "app>=x"]), 1)
+            self.assertIn("Invalid requirement: 'app>=x'", cm.output[0])
+
+    def test_cli_formats(self):
+        json_file = "tests/test_data/dependencies.json"
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run([json_file, "--format", "json"]), 0)
+        self.assertEqual(
+            json.loads(fake_out.getvalue()),
+            {
+                "pkg1": {"pkg2": {"pkg3": {}}, "pkg3": {}},
+                "pkg2": {"pkg3": {}},
+                "pkg3": {},
+            },
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run([json_file, "--format", "ndjson"]), 0)
+        self.assertEqual(len(fake_out.getvalue().splitlines()), 4)
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run([json_file, "--format", "dot", "--root", "pkg2"]), 0)
+        self.assertEqual(
+            fake_out.getvalue(),
+            'digraph dependencies {\n    "pkg2" -> "pkg3";\n    "pkg3";\n}\n',
+        )
+
+    def test_cli_graph_format_circular_dependency(self):
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(
+                run(["tests/test_data/circular.json", "--format", "ndjson"]), 0
+            )
+        self.assertIn('{"from": "pkg2", "to": "pkg1"}\n', fake_out.getvalue())
+
+    def test_cli_estimate(self):
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            argv = ["tests/test_data/dependencies.json", "--estimate"]
+            self.assertEqual(run(argv), 0)
+        self.assertEqual(
+            fake_out.getvalue(),
+            "pkg1: 4 nodes\npkg2: 2 nodes\npkg3: 1 node\n"
+            "Total: 7 nodes, 7 lines of text output\n",
+        )
+
+    def test_cli_max_nodes(self):
+        json_file = "tests/test_data/dependencies.json"
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            self.assertEqual(run([json_file, "--max-nodes", "7"]), 0)
+        self.assertEqual(fake_out.getvalue().count("\n"), 7)
+
+        with patch("dep_resolver.resolver.resolve_dependencies") as resolve:
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run([json_file, "--max-nodes", "6"]), 1)
+        resolve.assert_not_called()
+        self.assertIn("has 7 nodes, more than --max-nodes 6", cm.output[0])
+
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            with self.assertLogs("dep_resolver.cli", level="WARNING") as cm:
+                argv = [json_file, "--max-nodes", "6", "--overflow", "dedupe"]
+                self.assertEqual(run(argv), 0)
+        self.assertIn("printing it in --dedupe mode", cm.output[0])
+        self.assertIn("- pkg2 (deduped)\n", fake_out.getvalue())
+
+    def test_cli_serve_stdio(self):
+        requests = [
+            {"jsonrpc": "2.0", "id": 1, "method": "why", "params": {"package": "pkg3"}},
+            {"jsonrpc": "2.0", "id": 2, "method": "resolve", "params": [["pkg2"]]},
+        ]
+        env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1] / "src"))
+        process = subprocess.run(
+            [sys.executable, "-m", "dep_resolver", "serve"]
+            + ["tests/test_data/dependencies.json"],
+            input="".join(json.dumps(request) + "\n" for request in requests),
+            capture_output=True,
+            text=True,
+            env=env,
+            timeout=60,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        responses = [json.loads(line) for line in process.stdout.splitlines()]
+        self.assertEqual(responses[0]["result"], [["pkg1", "pkg3"]])
+        self.assertEqual(responses[1]["result"], "- pkg2\n    - pkg3\n")
+
+    def test_cli_serve_stdin_file(self):
+        request = {"jsonrpc": "2.0", "id": 1, "method": "order"}
+        env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1] / "src"))
+        with tempfile.TemporaryFile() as requests:
+            requests.write(json.dumps(request).encode() + b"\n")
+            requests.seek(0)
+            process = subprocess.run(
+                [sys.executable, "-m", "dep_resolver", "serve"]
+                + ["tests/test_data/dependencies.json"],
+                stdin=requests,
+                capture_output=True,
+                text=True,
+                env=env,
+                timeout=60,
+            )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        response = json.loads(process.stdout)
+        self.assertEqual(response["result"], [["pkg3"], ["pkg2"], ["pkg1"]])
+
+    def test_cli_client_without_server(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = os.path.join(tmp, "missing.sock")
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                self.assertEqual(run(["client", "--socket", socket_path, "order"]), 1)
+        self.assertIn("Could not reach the server", cm.output[0])
+
+    def test_cli_client_imports(self):
+        env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1] / "src"))
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = os.path.join(tmp, "missing.sock")
+            process = subprocess.run(
+                [sys.executable, "-X", "importtime", "-m", "dep_resolver"]
+                + ["client", "--socket", socket_path, "order"],
+                capture_output=True,
+                text=True,
+                env=env,
+                timeout=60,
+            )
+        self.assertEqual(process.returncode, 1, process.stderr)
+        modules = {
+            line.split("|")[2].strip()
+            for line in process.stderr.splitlines()
+            if line.startswith("import time:") and "dep_resolver" in line
+        }
+        # Neither the resolver nor the printer is loaded.
+        expected = ["dep_resolver", "dep_resolver.cli", "dep_resolver.client"]
+        self.assertEqual(sorted(modules), [*expected, "dep_resolver.output"])
+
+    def test_cli_client(self):
+        with patch("dep_resolver.client.Client") as client_class, patch(
+            "sys.stdout", new=StringIO()
+        ) as fake_out:
+            client = client_class.return_value.__enter__.return_value
+            client.call.return_value = "- pkg2\n"
+            argv = ["client", "--socket", "s", "resolve", 'roots=["pkg2"]']
+            self.assertEqual(run(argv + ["format=text"]), 0)
+        client.call.assert_called_once_with("resolve", roots=["pkg2"], format="text")
+        self.assertEqual(fake_out.getvalue(), "- pkg2\n")
+
+    def test_cli_diff(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            old_file = Path(tmp) / "old.json"
+            new_file = Path(tmp) / "new.json"
+            old_file.write_text(json.dumps({"app": ["lib"], "lib": [], "tool": []}))
+            new_file.write_text(json.dumps({"app": ["lib"], "lib": ["zlib"]}))
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run(["diff", str(old_file), str(new_file)]), 1)
+            self.assertEqual(
+                fake_out.getvalue(),
+                "+ zlib\n- tool\n+ lib -> zlib\n~ app\n~ lib\n"
+                "1 package added, 1 removed; 1 dependency added, 0 removed; "
+                "2 changed trees\n",
+            )
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                argv = ["diff", str(new_file), str(old_file), "--format", "json"]
+                self.assertEqual(run(argv), 1)
+            self.assertEqual(
+                json.loads(fake_out.getvalue()),
+                {
+                    "added": ["tool"],
+                    "removed": ["zlib"],
+                    "added_edges": [],
+                    "removed_edges": [["lib", "zlib"]],
+                    "changed": ["app", "lib"],
+                    "added_top_level": [],
+                    "removed_top_level": [],
+                },
+            )
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run(["diff", str(old_file), str(old_file)]), 0)
+            self.assertIn("0 changed trees", fake_out.getvalue())
+            # Only the top-level packages differ.
+            new_file.write_text(json.dumps({"app": ["lib"], "tool": []}))
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                self.assertEqual(run(["diff", str(old_file), str(new_file)]), 1)
+            self.assertIn("- lib (top-level)\n", fake_out.getvalue())
+            with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+                argv = ["diff", str(old_file), str(Path(tmp) / "missing.json")]
+                self.assertEqual(run(argv), 2)
+            self.assertIn("File not found", cm.output[0])
+
+    def test_cli_import_time(self):
+        env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1] / "src"))
+        argv = [sys.executable, "-X", "importtime", "-m", "dep_resolver", "--help"]
+        timings = []
+        for _ in range(3):
+            process = subprocess.run(
+                argv, capture_output=True, text=True, env=env, timeout=60
+            )
+            self.assertEqual(process.returncode, 0, process.stderr)
+            modules = {}
+            for line in process.stderr.splitlines():
+                fields = line.split("|")
+                # Top-level imports are indented by one space, nested ones by more.
+                if len(fields) == 3 and fields[1].strip().isdigit():
+                    if not fields[2].startswith("  "):
+                        modules[fields[2].strip()] = int(fields[1])
+            timings.append(
+                sum(us for name, us in modules.items() if name.startswith("dep_"))
+            )
+        self.assertEqual(
+            sorted(name for name in modules if name.startswith("dep_resolver")),
+            ["dep_resolver", "dep_resolver.cli"],
+        )
+        for name in ("asyncio", "json", "logging", "pathlib", "socket"):
+            self.assertNotIn(name, modules)
+        self.assertLess(min(timings), IMPORT_BUDGET_US)
+
+    def test_cli_choices_match_modules(self):
+        self.assertEqual(cli._TREE_FORMATS, tuple(TREE_FORMATS))
+        self.assertEqual(cli._GRAPH_FORMATS, tuple(GRAPH_FORMATS))
+        self.assertEqual(cli._CONFLICT_POLICIES, CONFLICT_POLICIES)
+
+    def test_lazy_package_exports(self):
+        self.assertIs(dep_resolver.CompactGraph, CompactGraph)
+        for name in dep_resolver.__all__:
+            self.assertIn(name, dir(dep_resolver))
+            getattr(dep_resolver, name)
+        with self.assertRaises(AttributeError):
+            dep_resolver.missing
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_order_circular_dependency(self, mock_args):
+        mock_args.return_value = _args(Path("tests/test_data/circular.json"), "--order")
+        with self.assertLogs("dep_resolver.cli", level="ERROR") as cm:
+            exit_code = run()
+            self.assertEqual(exit_code, 1)
+            self.assertIn("pkg1 -> pkg2 -> pkg1", cm.output[1])
+
+    def test_cli_order_collapse_cycles(self):
+        json_file = "tests/test_data/circular.json"
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            with self.assertLogs("dep_resolver.cli", level="WARNING") as cm:
+                self.assertEqual(run([json_file, "--order", "--collapse-cycles"]), 0)
+        self.assertIn("Collapsing circular dependency", cm.output[0])
+        self.assertIn("Layer 1 (width 1): <cycle: pkg1, pkg2>", fake_out.getvalue())
+
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_cli_broken_pipe(self, mock_args):
+        mock_args.return_value = _args(Path("tests/test_data/dependencies.json"))
+        with patch(
+            "dep_resolver.printer.print_dependency_graph", side_effect=BrokenPipeError
+        ):
+            with patch("logging.Logger.error") as mock_error:
+                exit_code = run()
+            self.assertEqual(exit_code, 1)
+            mock_error.assert_not_called()
+
+    def test_cli_closed_pipe(self):
+        leaves = [f"lib{i}" for i in range(1_000)]
+        dependencies = {f"pkg{i}": leaves for i in range(1_000)}
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = Path(tmp) / "dependencies.json"
+            json_file.write_text(json.dumps(dependencies))
+            env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1] / "src"))
+            process = subprocess.Popen(
+                [sys.executable, "-m", "dep_resolver", str(json_file)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+            )
+            self.assertEqual(process.stdout.readline(), b"- pkg0\n")
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            process.wait()
+            self.assertNotIn(b"Traceback", stderr)
+            self.assertNotIn(b"Exception ignored", stderr)
+
 
 if __name__ == "__main__":
     unittest.main()
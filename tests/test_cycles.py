@@ -0,0 +1,93 @@
+import unittest
+from dep_resolver.cycles import (
+    CycleGroup,
+    collapse_cycles,
+    cycle_label,
+    find_cycles,
+    strongly_connected_components,
+)
+from dep_resolver.graph import CompactGraph
+from dep_resolver.resolver import CircularDependencyError, resolve_dependencies
+
+
+class TestStronglyConnectedComponents(unittest.TestCase):
+    def test_reverse_topological_order(self):
+        graph = CompactGraph.from_mapping(
+            {"pkg1": ["pkg2"], "pkg2": ["pkg3"], "pkg3": ["pkg2", "pkg4"]}
+        )
+        components = [
+            sorted(graph.names[node] for node in component)
+            for component in strongly_connected_components(graph)
+        ]
+        self.assertEqual(components, [["pkg4"], ["pkg2", "pkg3"], ["pkg1"]])
+
+    def test_long_chain(self):
+        length = 100_000
+        graph = CompactGraph.from_mapping(
+            {f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)}
+        )
+        self.assertEqual(len(strongly_connected_components(graph)), length + 1)
+
+
+class TestFindCycles(unittest.TestCase):
+    def test_no_cycles(self):
+        self.assertEqual(find_cycles({"pkg1": ["pkg2"], "pkg2": []}), [])
+
+    def test_every_group_is_reported(self):
+        dependencies = {
+            "pkg1": ["pkg2", "pkg4"],
+            "pkg2": ["pkg3"],
+            "pkg3": ["pkg1"],
+            "pkg4": ["pkg5"],
+            "pkg5": ["pkg5"],
+            "pkg6": ["pkg7"],
+            "pkg7": ["pkg6", "pkg1"],
+        }
+        self.assertEqual(
+            find_cycles(dependencies),
+            [
+                CycleGroup(["pkg1", "pkg2", "pkg3"], ["pkg1", "pkg2", "pkg3", "pkg1"]),
+                CycleGroup(["pkg5"], ["pkg5", "pkg5"]),
+                CycleGroup(["pkg6", "pkg7"], ["pkg6", "pkg7", "pkg6"]),
+            ],
+        )
+
+    def test_sample_cycle_is_shortest(self):
+        dependencies = {
+            "pkg1": ["pkg2", "pkg4"],
+            "pkg2": ["pkg3"],
+            "pkg3": ["pkg1"],
+            "pkg4": ["pkg1"],
+        }
+        (group,) = find_cycles(dependencies)
+        self.assertEqual(group.cycle, ["pkg1", "pkg4", "pkg1"])
+
+
+class TestCollapseCycles(unittest.TestCase):
+    def test_collapse(self):
+        dependencies = {
+            "app": ["pkg1", "lib"],
+            "pkg1": ["pkg2"],
+            "pkg2": ["pkg1", "lib"],
+            "lib": [],
+        }
+        label = cycle_label(["pkg1", "pkg2"])
+        graph = collapse_cycles(dependencies)
+        self.assertEqual(
+            graph.to_mapping(),
+            {"app": [label, "lib"], label: ["lib"], "lib": []},
+        )
+
+    def test_resolve_with_collapsed_cycles(self):
+        dependencies = {"app": ["pkg1"], "pkg1": ["pkg2"], "pkg2": ["pkg1"]}
+        with self.assertRaises(CircularDependencyError):
+            resolve_dependencies(dependencies)
+        label = cycle_label(["pkg1", "pkg2"])
+        self.assertEqual(
+            resolve_dependencies(dependencies, collapse_cycles=True),
+            {"app": {label: {}}, label: {}},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from dep_resolver.diff import diff_graphs, iter_diff_chunks
+from dep_resolver.graph import CompactGraph
+
+OLD = {
+    "app": ["web", "db"],
+    "web": ["http"],
+    "http": [],
+    "db": [],
+    "cli": ["http"],
+    "legacy": ["db"],
+}
+
+
+class TestDiffGraphs(unittest.TestCase):
+    def test_identical(self):
+        diff = diff_graphs(OLD, CompactGraph.from_mapping(dict(OLD)))
+        self.assertFalse(diff)
+        self.assertEqual(diff.as_dict()["changed"], [])
+
+    def test_added_and_removed(self):
+        new = dict(OLD, http=["tls"], tls=[])
+        del new["legacy"]
+        diff = diff_graphs(OLD, new)
+        self.assertTrue(diff)
+        self.assertEqual(diff.added, ["tls"])
+        self.assertEqual(diff.removed, ["legacy"])
+        self.assertEqual(diff.added_edges, [("http", "tls")])
+        self.assertEqual(diff.removed_edges, [("legacy", "db")])
+        # Only the dependents of "http" have a different tree.
+        self.assertEqual(diff.changed, ["app", "web", "http", "cli"])
+
+    def test_edges_of_new_package(self):
+        new = dict(OLD, db=["sql"], sql=["db2"], db2=[])
+        diff = diff_graphs(OLD, new)
+        self.assertEqual(diff.added, ["sql", "db2"])
+        self.assertEqual(diff.added_edges, [("db", "sql"), ("sql", "db2")])
+        self.assertEqual(diff.changed, ["app", "db", "legacy"])
+
+    def test_reordered_dependencies(self):
+        diff = diff_graphs(OLD, dict(OLD, app=["db", "web"]))
+        self.assertEqual((diff.added_edges, diff.removed_edges), ([], []))
+        self.assertEqual(diff.changed, ["app"])
+
+    def test_replaced_dependency(self):
+        diff = diff_graphs(OLD, dict(OLD, cli=["db"]))
+        self.assertEqual(diff.added_edges, [("cli", "db")])
+        self.assertEqual(diff.removed_edges, [("cli", "http")])
+        self.assertEqual(diff.changed, ["cli"])
+
+    def test_cycles(self):
+        old = {"a": ["b"], "b": ["a"], "c": ["a"]}
+        diff = diff_graphs(old, dict(old, b=["a", "d"], d=[]))
+        self.assertEqual(diff.changed, ["a", "b", "c"])
+
+    def test_top_level_packages(self):
+        diff = diff_graphs({"a": ["b"], "b": []}, {"a": ["b"]})
+        self.assertTrue(diff)
+        self.assertEqual((diff.added, diff.removed, diff.changed), ([], [], []))
+        self.assertEqual(diff.removed_top_level, ["b"])
+        self.assertEqual(diff.as_dict()["removed_top_level"], ["b"])
+        diff = diff_graphs({"a": ["b"]}, {"a": ["b"], "b": []})
+        self.assertEqual((diff.added_top_level, diff.removed_top_level), (["b"], []))
+        self.assertEqual(
+            "".join(iter_diff_chunks(diff)),
+            "+ b (top-level)\n"
+            "0 packages added, 0 removed; 0 dependencies added, 0 removed; "
+            "0 changed trees; 1 top-level package added, 0 removed\n",
+        )
+
+    def test_text_output(self):
+        diff = diff_graphs({"a": ["b"], "b": []}, {"a": ["c"], "c": []})
+        self.assertEqual(
+            "".join(iter_diff_chunks(diff, chunk_lines=2)),
+            "+ c\n- b\n+ a -> c\n- a -> b\n~ a\n"
+            "1 package added, 1 removed; 1 dependency added, 1 removed; "
+            "1 changed tree\n",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
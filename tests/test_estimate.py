@@ -0,0 +1,102 @@
+import unittest
+from dep_resolver.estimate import TreeSize, estimate_tree_size
+from dep_resolver.formats import iter_json_chunks
+from dep_resolver.printer import iter_tree_chunks
+from dep_resolver.resolver import CircularDependencyError, resolve_dependencies
+
+
+def _diamonds(levels):
+    dependencies = {}
+    for level in range(levels):
+        dependencies[f"top{level}"] = [f"left{level}", f"right{level}"]
+        dependencies[f"left{level}"] = [f"top{level + 1}"]
+        dependencies[f"right{level}"] = [f"top{level + 1}"]
+    return dependencies
+
+
+class TestEstimateTreeSize(unittest.TestCase):
+    def setUp(self):
+        self.dependencies = {
+            "pkg1": ["pkg2", "pkg3"],
+            "pkg2": ["pkg3"],
+            "pkg3": [],
+            "pkg4": ["pkg1", "pkg2"],
+        }
+
+    def _printed_lines(self, resolved, output_format):
+        chunks = (
+            iter_tree_chunks(resolved)
+            if output_format == "text"
+            else iter_json_chunks(resolved)
+        )
+        return "".join(chunks).count("\n")
+
+    def test_matches_printed_tree(self):
+        for max_depth in (None, 0, 1, 2, 10):
+            resolved = resolve_dependencies(self.dependencies, max_depth=max_depth)
+            size = estimate_tree_size(self.dependencies, max_depth=max_depth)
+            for output_format in ("text", "json"):
+                with self.subTest(max_depth=max_depth, format=output_format):
+                    self.assertEqual(
+                        size.lines(output_format),
+                        self._printed_lines(resolved, output_format),
+                    )
+
+    def test_roots(self):
+        size = estimate_tree_size(self.dependencies)
+        self.assertEqual(size.roots, {"pkg1": 4, "pkg2": 2, "pkg3": 1, "pkg4": 7})
+        self.assertEqual(size.nodes, 14)
+        size = estimate_tree_size(self.dependencies, roots=["pkg2"])
+        self.assertEqual(size, TreeSize(2, 1, {"pkg2": 2}))
+
+    def test_empty(self):
+        size = estimate_tree_size({})
+        self.assertEqual(size, TreeSize(0, 0, {}))
+        self.assertEqual(size.lines("json"), self._printed_lines({}, "json"))
+
+    def test_exponential_tree(self):
+        size = estimate_tree_size(_diamonds(200), roots=["top0"])
+        self.assertEqual(size.nodes, 2**202 - 3)
+        limited = estimate_tree_size(_diamonds(200), roots=["top0"], max_depth=4)
+        self.assertEqual(limited.nodes, 1 + 2 + 2 + 4 + 4)
+
+    def test_long_chain(self):
+        length = 5_000
+        dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)}
+        size = estimate_tree_size(dependencies, roots=["pkg0"], max_depth=length)
+        self.assertEqual(size, TreeSize(length + 1, length, {"pkg0": length + 1}))
+
+    def test_limit(self):
+        dependencies = _diamonds(200)
+        size = estimate_tree_size(dependencies, max_depth=400, limit=1000)
+        self.assertTrue(size.truncated)
+        self.assertGreater(size.nodes, 1000)
+        self.assertLess(size.nodes, estimate_tree_size(dependencies).nodes)
+        size = estimate_tree_size(dependencies, roots=["top199"], max_depth=3)
+        self.assertEqual(
+            estimate_tree_size(
+                dependencies, roots=["top199"], max_depth=3, limit=size.nodes
+            ),
+            size,
+        )
+        self.assertFalse(estimate_tree_size(dependencies, limit=1).truncated)
+
+    def test_circular_dependency(self):
+        dependencies = {"pkg1": ["pkg2"], "pkg2": ["pkg1"], "app": ["pkg1"]}
+        with self.assertRaises(CircularDependencyError) as cm:
+            estimate_tree_size(dependencies)
+        self.assertEqual(cm.exception.cycle, ["pkg1", "pkg2", "pkg1"])
+        self.assertEqual(
+            estimate_tree_size(dependencies, collapse_cycles=True).roots,
+            {"<cycle: pkg1, pkg2>": 1, "app": 2},
+        )
+        limited = estimate_tree_size(dependencies, roots=["pkg1"], max_depth=3)
+        self.assertEqual(limited.nodes, 4)
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            estimate_tree_size(self.dependencies).lines("dot")
+
+
+if __name__ == "__main__":
+    unittest.main()
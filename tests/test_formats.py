@@ -0,0 +1,135 @@
+import json
+import unittest
+from dep_resolver.formats import (
+    GRAPH_FORMATS,
+    TREE_FORMATS,
+    iter_dot_chunks,
+    iter_json_chunks,
+    iter_ndjson_chunks,
+)
+from dep_resolver.graph import CompactGraph
+from dep_resolver.resolver import resolve_dependencies
+
+
+class TestJsonFormat(unittest.TestCase):
+    def setUp(self):
+        self.resolved = resolve_dependencies(
+            {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": [], "pkg4": ["pkg2"]}
+        )
+
+    def test_matches_json_dumps(self):
+        for indent_size in (0, 2, 4):
+            for chunk_lines in (1, 3, 1000):
+                with self.subTest(indent_size=indent_size, chunk_lines=chunk_lines):
+                    output = "".join(
+                        iter_json_chunks(
+                            self.resolved, indent_size, chunk_lines=chunk_lines
+                        )
+                    )
+                    self.assertEqual(
+                        output, json.dumps(self.resolved, indent=indent_size) + "\n"
+                    )
+
+    def test_empty(self):
+        self.assertEqual("".join(iter_json_chunks({})), "{}\n")
+
+    def test_dedupe(self):
+        output = "".join(iter_json_chunks(self.resolved, dedupe=True))
+        self.assertEqual(
+            json.loads(output),
+            {
+                "pkg1": {"pkg2": {"pkg3": {}}, "pkg3": {}},
+                "pkg2": None,
+                "pkg3": {},
+                "pkg4": {"pkg2": None},
+            },
+        )
+
+    def test_deep_chain(self):
+        dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(5_000)}
+        resolved = resolve_dependencies(dependencies, roots=["pkg0"])
+        output = "".join(iter_json_chunks(resolved, indent_size=0))
+        self.assertEqual(output.count("{"), 5_002)
+
+    def test_escaping(self):
+        resolved = {'quote"': {"new\nline": {}}, "ünïcode": {}}
+        output = "".join(iter_json_chunks(resolved))
+        self.assertEqual(json.loads(output), resolved)
+
+
+class TestGraphFormats(unittest.TestCase):
+    def setUp(self):
+        self.graph = CompactGraph.from_mapping(
+            {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg4": []}
+        )
+
+    def test_ndjson(self):
+        lines = "".join(iter_ndjson_chunks(self.graph)).splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {"from": "pkg1", "to": "pkg2"},
+                {"from": "pkg1", "to": "pkg3"},
+                {"from": "pkg2", "to": "pkg3"},
+                {"from": "pkg4", "to": None},
+                {"from": "pkg3", "to": None},
+            ],
+        )
+
+    def test_dot(self):
+        self.assertEqual(
+            "".join(iter_dot_chunks(self.graph)),
+            "digraph dependencies {\n"
+            '    "pkg1" -> "pkg2";\n'
+            '    "pkg1" -> "pkg3";\n'
+            '    "pkg2" -> "pkg3";\n'
+            '    "pkg4";\n'
+            '    "pkg3";\n'
+            "}\n",
+        )
+
+    def test_dot_escaping(self):
+        graph = CompactGraph.from_mapping({'a"b': ["c\\d"]})
+        self.assertIn('"a\\"b" -> "c\\\\d";', "".join(iter_dot_chunks(graph)))
+
+    def test_max_depth(self):
+        graph = self.graph.with_keys([self.graph.id_of("pkg1")])
+        self.assertEqual(
+            "".join(iter_dot_chunks(graph, max_depth=1)),
+            'digraph dependencies {\n    "pkg1" -> "pkg2";\n    "pkg1" -> "pkg3";\n}\n',
+        )
+        self.assertEqual(
+            "".join(iter_ndjson_chunks(graph, max_depth=0)),
+            '{"from": "pkg1", "to": null}\n',
+        )
+
+    def test_cycles_and_chunks(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"], "pkg2": ["pkg1"]})
+        chunks = list(iter_ndjson_chunks(graph, chunk_lines=1))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(
+            "".join(chunks),
+            '{"from": "pkg1", "to": "pkg2"}\n{"from": "pkg2", "to": "pkg1"}\n',
+        )
+
+    def test_streams_without_expanding(self):
+        # 2^40 paths through the stacked diamonds, but only 160 edges.
+        dependencies = {}
+        for level in range(40):
+            dependencies[f"top{level}"] = [f"left{level}", f"right{level}"]
+            dependencies[f"left{level}"] = [f"top{level + 1}"]
+            dependencies[f"right{level}"] = [f"top{level + 1}"]
+        graph = CompactGraph.from_mapping(dependencies)
+        for name, writer in GRAPH_FORMATS.items():
+            with self.subTest(format=name):
+                output = "".join(writer(graph, None))
+                edge = "->" if name == "dot" else '"to": "'
+                self.assertEqual(output.count(edge), 160)
+
+    def test_registries(self):
+        self.assertEqual(list(TREE_FORMATS), ["text", "json"])
+        self.assertEqual(list(GRAPH_FORMATS), ["ndjson", "dot"])
+
+
+if __name__ == "__main__":
+    unittest.main()
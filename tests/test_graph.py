@@ -0,0 +1,67 @@
+import unittest
+from array import array
+from dep_resolver.graph import CompactGraph, GraphBuilder, as_graph
+
+
+class TestCompactGraph(unittest.TestCase):
+    def test_from_mapping(self):
+        dependencies = {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": []}
+        graph = CompactGraph.from_mapping(dependencies)
+        self.assertEqual(len(graph), 3)
+        self.assertEqual(graph.num_edges, 3)
+        self.assertEqual(list(graph.names), ["pkg1", "pkg2", "pkg3"])
+        self.assertEqual(list(graph.keys), [0, 1, 2])
+        self.assertIsInstance(graph.offsets, array)
+        self.assertIsInstance(graph.targets, array)
+        self.assertEqual(list(graph.successors(graph.id_of("pkg1"))), [1, 2])
+        self.assertEqual(graph.to_mapping(), dependencies)
+
+    def test_missing_dependency_is_not_a_key(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"]})
+        self.assertIn("pkg2", graph)
+        self.assertEqual(list(graph.keys), [0])
+        self.assertEqual(list(graph.successors(graph.id_of("pkg2"))), [])
+        self.assertIsNone(graph.get_id("pkg3"))
+        with self.assertRaises(KeyError):
+            graph.id_of("pkg3")
+
+    def test_forward_reference_keeps_key_order(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"], "pkg2": []})
+        self.assertEqual([graph.names[key] for key in graph.keys], ["pkg1", "pkg2"])
+
+    def test_no_instance_dict(self):
+        graph = CompactGraph.from_mapping({})
+        self.assertFalse(hasattr(graph, "__dict__"))
+
+    def test_reversed(self):
+        graph = CompactGraph.from_mapping(
+            {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": []}
+        )
+        dependents = graph.reversed()
+        self.assertEqual(dependents.num_edges, 3)
+        self.assertEqual(list(dependents.successors(graph.id_of("pkg3"))), [0, 1])
+        self.assertEqual(list(dependents.successors(graph.id_of("pkg1"))), [])
+
+    def test_as_graph(self):
+        graph = CompactGraph.from_mapping({"pkg1": []})
+        self.assertIs(as_graph(graph), graph)
+        self.assertEqual(as_graph({"pkg1": []}).to_mapping(), {"pkg1": []})
+
+
+class TestGraphBuilder(unittest.TestCase):
+    def test_redefinition_replaces_dependencies(self):
+        builder = GraphBuilder()
+        builder.add("pkg1", ["pkg2"])
+        builder.add("pkg2", [])
+        builder.add("pkg1", ["pkg3"])
+        graph = builder.build()
+        self.assertEqual(graph.to_mapping(), {"pkg1": ["pkg3"], "pkg2": []})
+
+    def test_repeated_dependencies_are_kept_once(self):
+        builder = GraphBuilder()
+        builder.add("pkg1", ["pkg2", "pkg3", "pkg2"])
+        self.assertEqual(builder.build().to_mapping(), {"pkg1": ["pkg2", "pkg3"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from io import StringIO
+from dep_resolver.graph import CompactGraph
+from dep_resolver.lazy import LazyDependencyGraph
+from dep_resolver.printer import print_dependency_graph
+from dep_resolver.resolver import CircularDependencyError, resolve_dependencies
+
+
+class TestLazyDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.dependencies = {
+            "app": ["web", "db"],
+            "web": ["core"],
+            "db": ["driver", "core"],
+            "core": [],
+        }
+
+    def test_equals_eager_result(self):
+        lazy = LazyDependencyGraph(self.dependencies)
+        eager = resolve_dependencies(self.dependencies)
+        self.assertEqual(lazy, eager)
+        self.assertEqual(eager, lazy)
+        self.assertEqual(list(lazy), list(eager))
+        self.assertEqual(len(lazy), 4)
+
+    def test_resolves_on_access(self):
+        lazy = LazyDependencyGraph(self.dependencies)
+        self.assertEqual(len(lazy._memo), 0)
+        self.assertEqual(lazy["web"], {"core": {}})
+        ids = sorted(lazy.graph.id_of(pkg) for pkg in ("web", "core"))
+        self.assertEqual(sorted(lazy._memo), ids)
+        self.assertIs(lazy["web"], lazy["web"])
+
+    def test_shared_subtrees(self):
+        lazy = LazyDependencyGraph(self.dependencies, max_subtrees=None)
+        self.assertIs(lazy["app"]["db"], lazy["db"])
+
+    def test_lru_eviction(self):
+        lazy = LazyDependencyGraph(self.dependencies, max_subtrees=2)
+        app = lazy["app"]
+        self.assertEqual(len(lazy._memo), 2)
+        self.assertIs(lazy["app"], app)
+        self.assertEqual(lazy["core"], {})
+        self.assertEqual(lazy["web"], {"core": {}})
+        self.assertEqual(len(lazy._memo), 2)
+        self.assertIsNot(lazy["app"], app)
+        self.assertEqual(lazy["app"], app)
+
+    def test_membership(self):
+        lazy = LazyDependencyGraph({"app": ["lib"]})
+        self.assertIn("app", lazy)
+        self.assertNotIn("lib", lazy)
+        self.assertNotIn(1, lazy)
+        with self.assertRaises(KeyError):
+            lazy["lib"]
+        self.assertIsNone(lazy.get("missing"))
+
+    def test_circular_dependency(self):
+        lazy = LazyDependencyGraph({"app": ["lib"], "pkg1": ["pkg2"], "pkg2": ["pkg1"]})
+        self.assertEqual(lazy["app"], {"lib": {}})
+        for _ in range(2):
+            with self.assertRaises(CircularDependencyError) as cm:
+                lazy["pkg1"]
+            self.assertEqual(cm.exception.cycle, ["pkg1", "pkg2", "pkg1"])
+
+    def test_collapse_cycles(self):
+        dependencies = {"pkg1": ["pkg2"], "pkg2": ["pkg1", "lib"]}
+        self.assertEqual(
+            LazyDependencyGraph(dependencies, collapse_cycles=True),
+            resolve_dependencies(dependencies, collapse_cycles=True),
+        )
+
+    def test_compact_graph(self):
+        graph = CompactGraph.from_mapping(self.dependencies)
+        self.assertIs(LazyDependencyGraph(graph).graph, graph)
+
+    def test_print(self):
+        for dedupe in (False, True):
+            with self.subTest(dedupe=dedupe):
+                lazy, eager = StringIO(), StringIO()
+                print_dependency_graph(
+                    LazyDependencyGraph(self.dependencies, max_subtrees=1),
+                    dedupe=dedupe,
+                    stream=lazy,
+                )
+                print_dependency_graph(
+                    resolve_dependencies(self.dependencies), dedupe=dedupe, stream=eager
+                )
+                self.assertEqual(lazy.getvalue(), eager.getvalue())
+
+    def test_long_chain(self):
+        length = 10_000
+        lazy = LazyDependencyGraph({f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)})
+        self.assertEqual(list(lazy[f"pkg{length - 2}"]), [f"pkg{length - 1}"])
+        self.assertEqual(len(lazy._memo), 3)
+        depth = 0
+        subtree = lazy["pkg0"]
+        while subtree:
+            (subtree,) = subtree.values()
+            depth += 1
+        self.assertEqual(depth, length)
+
+
+if __name__ == "__main__":
+    unittest.main()
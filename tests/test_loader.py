@@ -0,0 +1,165 @@
+import json
+import pickle
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+from dep_resolver.loader import (
+    ManifestConflictError,
+    ManifestDecodeError,
+    expand_manifest_paths,
+    iter_manifest,
+    load_manifest,
+    load_manifests,
+)
+
+
+class TestLoadManifest(unittest.TestCase):
+    def test_load_path(self):
+        graph = load_manifest(Path("tests/test_data/dependencies.json"))
+        self.assertEqual(
+            graph.to_mapping(),
+            {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": []},
+        )
+
+    def test_matches_json_load(self):
+        dependencies = {
+            f"pkg{i}": [f"pkg{j}" for j in range(i + 1, min(i + 4, 500))]
+            for i in range(500)
+        }
+        dependencies['weird "name" é'] = ["pkg1"]
+        text = json.dumps(dependencies, indent=2)
+        for chunk_size in (1, 7, 4096):
+            graph = load_manifest(StringIO(text), chunk_size=chunk_size)
+            self.assertEqual(graph.to_mapping(), dependencies)
+
+    def test_numbers_split_across_chunks(self):
+        text = '{"pkg1": [], "count": 12345}'
+        pairs = list(iter_manifest(StringIO(text), chunk_size=4))
+        self.assertEqual(pairs, [("pkg1", []), ("count", 12345)])
+
+    def test_duplicate_keys_keep_last_value(self):
+        text = '{"pkg1": ["pkg2"], "pkg2": [], "pkg1": ["pkg3"]}'
+        graph = load_manifest(StringIO(text))
+        self.assertEqual(graph.to_mapping(), json.loads(text))
+
+    def test_empty_object(self):
+        self.assertEqual(load_manifest(StringIO(" { } ")).to_mapping(), {})
+
+    def test_error_positions(self):
+        cases = [
+            ('{"pkg1": ["pkg2"],\n "pkg2": [,]}', 2, 11),
+            ('{"pkg1": ["pkg2"]\n "pkg2": []}', 2, 2),
+            ('{"pkg1": []} []', 1, 14),
+            ("[]", 1, 1),
+            ('{"pkg1": ["pkg2"]', 1, 18),
+            ('{\n  "pkg1": {"pkg2": []}\n}', 2, 11),
+            ('{\n  "pkg1": ["pkg2", 3]\n}', 2, 11),
+        ]
+        for text, lineno, colno in cases:
+            for chunk_size in (1, 5, 4096):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(json.JSONDecodeError) as cm:
+                        load_manifest(StringIO(text), chunk_size=chunk_size)
+                    self.assertEqual(
+                        (cm.exception.lineno, cm.exception.colno), (lineno, colno)
+                    )
+
+    def test_matches_json_error_position(self):
+        text = '{\n  "pkg1": ["pkg2"],\n  "pkg2": ["pkg3" "pkg4"]\n}'
+        with self.assertRaises(json.JSONDecodeError) as expected:
+            json.loads(text)
+        with self.assertRaises(ManifestDecodeError) as cm:
+            load_manifest(StringIO(text), chunk_size=3)
+        self.assertEqual(str(cm.exception), str(expected.exception))
+
+    def test_error_is_picklable(self):
+        error = ManifestDecodeError("Expecting value", 10, 2, 3)
+        self.assertEqual(str(pickle.loads(pickle.dumps(error))), str(error))
+
+    def test_load_large_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "large.json"
+            dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(50_000)}
+            path.write_text(json.dumps(dependencies))
+            graph = load_manifest(str(path))
+        self.assertEqual(len(graph.keys), 50_000)
+        self.assertEqual(graph.num_edges, 50_000)
+
+
+class TestLoadManifests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def _write(self, name, dependencies):
+        path = self.dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(dependencies))
+        return path
+
+    def test_expand_paths(self):
+        first = self._write("a.json", {})
+        second = self._write("sub/b.json", {})
+        third = self._write("sub/deeper/c.json", {})
+        (self.dir / "notes.txt").write_text("")
+        self.assertEqual(expand_manifest_paths([self.dir]), [first, second, third])
+        self.assertEqual(
+            expand_manifest_paths([second, str(self.dir / "**" / "*.json")]),
+            [second, first, third],
+        )
+        with self.assertRaises(FileNotFoundError):
+            expand_manifest_paths([str(self.dir / "*.yaml")])
+        with self.assertRaises(FileNotFoundError):
+            expand_manifest_paths([self.dir / "missing.json"])
+
+    def test_merge_in_file_order(self):
+        paths = [
+            self._write(f"part{i:02}.json", {f"pkg{i}": [f"pkg{i + 1}"]})
+            for i in range(20)
+        ]
+        manifest = load_manifests(paths, jobs=4)
+        self.assertEqual(
+            manifest.graph.to_mapping(),
+            {f"pkg{i}": [f"pkg{i + 1}"] for i in range(20)},
+        )
+        self.assertEqual(manifest.source_of("pkg3"), str(paths[3]))
+        self.assertIsNone(manifest.source_of("pkg20"))
+
+    def test_conflicts(self):
+        first = self._write("a.json", {"pkg1": ["pkg2", "pkg3"], "pkg2": []})
+        second = self._write("b.json", {"pkg3": [], "pkg1": ["pkg3", "pkg4"]})
+        with self.assertRaises(ManifestConflictError) as cm:
+            load_manifests([first, second])
+        self.assertEqual(cm.exception.package, "pkg1")
+        self.assertEqual(cm.exception.sources, (str(first), str(second)))
+        self.assertIn("b.json", str(pickle.loads(pickle.dumps(cm.exception))))
+        expected = {
+            "first": ["pkg2", "pkg3"],
+            "last": ["pkg3", "pkg4"],
+            "union": ["pkg2", "pkg3", "pkg4"],
+        }
+        for conflict, deps in expected.items():
+            with self.subTest(conflict=conflict):
+                manifest = load_manifests([first, second], conflict=conflict)
+                mapping = manifest.graph.to_mapping()
+                self.assertEqual(list(mapping), ["pkg1", "pkg2", "pkg3"])
+                self.assertEqual(mapping["pkg1"], deps)
+                origin = second if conflict == "last" else first
+                self.assertEqual(manifest.source_of("pkg1"), str(origin))
+        with self.assertRaises(ValueError):
+            load_manifests([first], conflict="newest")
+
+    def test_decode_error_names_file(self):
+        good = self._write("good.json", {"pkg1": []})
+        bad = self.dir / "bad.json"
+        bad.write_text('{"pkg2": [1]}')
+        with self.assertRaises(ManifestDecodeError) as cm:
+            load_manifests([good, bad])
+        self.assertTrue(str(cm.exception).startswith(f"{bad}: Dependencies of"))
+        self.assertEqual((cm.exception.lineno, cm.exception.colno), (1, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
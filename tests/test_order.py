@@ -0,0 +1,61 @@
+import unittest
+from dep_resolver.graph import CompactGraph
+from dep_resolver.order import install_order
+from dep_resolver.resolver import CircularDependencyError
+
+
+class TestInstallOrder(unittest.TestCase):
+    def test_layers(self):
+        dependencies = {
+            "app": ["web", "db"],
+            "web": ["core"],
+            "db": ["core", "driver"],
+            "core": [],
+        }
+        self.assertEqual(
+            install_order(dependencies),
+            [["core", "driver"], ["web", "db"], ["app"]],
+        )
+
+    def test_compact_graph(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"], "pkg2": []})
+        self.assertEqual(install_order(graph), [["pkg2"], ["pkg1"]])
+
+    def test_empty(self):
+        self.assertEqual(install_order({}), [])
+
+    def test_long_chain(self):
+        length = 100_000
+        dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)}
+        layers = install_order(dependencies)
+        self.assertEqual(len(layers), length + 1)
+        self.assertEqual(layers[0], [f"pkg{length}"])
+        self.assertEqual(layers[-1], ["pkg0"])
+
+    def test_cycle(self):
+        dependencies = {"app": ["pkg1"], "pkg1": ["pkg2"], "pkg2": ["pkg1"]}
+        with self.assertRaises(CircularDependencyError) as cm:
+            install_order(dependencies)
+        self.assertEqual(cm.exception.cycle, ["pkg1", "pkg2", "pkg1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+    def test_roots(self):
+        dependencies = {
+            "app": ["web", "db"],
+            "web": ["core"],
+            "db": ["core", "driver"],
+            "core": [],
+            "tool": ["cycle"],
+            "cycle": ["tool"],
+        }
+        self.assertEqual(
+            install_order(dependencies, roots=["web"]), [["core"], ["web"]]
+        )
+        with self.assertRaises(CircularDependencyError) as cm:
+            install_order(dependencies, roots=["app", "tool"])
+        self.assertEqual(cm.exception.cycle, ["tool", "cycle", "tool"])
+        with self.assertRaises(KeyError):
+            install_order(dependencies, roots=["missing"])
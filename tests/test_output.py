@@ -0,0 +1,26 @@
+import io
+import unittest
+from dep_resolver.output import write_chunks
+from unittest.mock import MagicMock
+
+
+class TestOutput(unittest.TestCase):
+    def test_write_chunks(self):
+        stream = io.StringIO()
+        write_chunks(["- pkg1\n", "- pkg\u00e9\n"], stream)
+        self.assertEqual(stream.getvalue(), "- pkg1\n- pkg\u00e9\n")
+        stream = io.BytesIO()
+        write_chunks(["- pkg\u00e9\n"], stream)
+        self.assertEqual(stream.getvalue(), "- pkg\u00e9\n".encode())
+
+    def test_broken_pipe(self):
+        stream = MagicMock()
+        stream.write.side_effect = BrokenPipeError
+        with self.assertRaises(BrokenPipeError):
+            write_chunks(["- pkg1\n"], stream)
+        # The stream is left alone; redirecting it is up to the caller.
+        stream.fileno.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
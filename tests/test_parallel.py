@@ -0,0 +1,90 @@
+import pickle
+import unittest
+from unittest.mock import patch
+from dep_resolver.graph import CompactGraph
+from dep_resolver.parallel import resolve_parallel, weakly_connected_components
+from dep_resolver.resolver import CircularDependencyError, resolve_dependencies
+from dep_resolver.stats import Stats
+
+
+def _clusters(count, size):
+    # Independent clusters, interleaved so that their keys alternate.
+    dependencies = {}
+    for i in range(size):
+        for c in range(count):
+            deps = [f"c{c}-{j}" for j in (i + 1, i + 2) if j < size]
+            dependencies[f"c{c}-{i}"] = deps
+    return dependencies
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        # Run the workers even on machines with a single CPU.
+        cpus = patch("dep_resolver.parallel.available_cpus", return_value=8)
+        cpus.start()
+        self.addCleanup(cpus.stop)
+
+    def test_weakly_connected_components(self):
+        graph = CompactGraph.from_mapping(
+            {"app": ["lib"], "tool": ["lib"], "cli": ["util"], "alone": []}
+        )
+        components = [
+            [graph.names[node] for node in component]
+            for component in weakly_connected_components(graph)
+        ]
+        self.assertEqual(
+            components, [["app", "lib", "tool"], ["cli", "util"], ["alone"]]
+        )
+
+    def test_matches_serial(self):
+        dependencies = _clusters(5, 30)
+        for jobs in (2, 3, 8):
+            with self.subTest(jobs=jobs):
+                resolved = resolve_parallel(dependencies, jobs=jobs, min_packages=0)
+                expected = resolve_dependencies(dependencies)
+                self.assertEqual(resolved, expected)
+                self.assertEqual(list(resolved), list(dependencies))
+
+    def test_stats(self):
+        dependencies = _clusters(3, 20)
+        parallel_stats, serial_stats = Stats(), Stats()
+        resolve_parallel(dependencies, jobs=2, stats=parallel_stats, min_packages=0)
+        resolve_dependencies(dependencies, stats=serial_stats)
+        self.assertEqual(parallel_stats.nodes_expanded, serial_stats.nodes_expanded)
+        self.assertEqual(parallel_stats.edges_traversed, serial_stats.edges_traversed)
+
+    def test_collapse_cycles(self):
+        dependencies = {"pkg1": ["pkg2"], "pkg2": ["pkg1"], "app": ["lib"], "lib": []}
+        self.assertEqual(
+            resolve_parallel(
+                dependencies, jobs=2, collapse_cycles=True, min_packages=0
+            ),
+            resolve_dependencies(dependencies, collapse_cycles=True),
+        )
+
+    def test_circular_dependency(self):
+        dependencies = {"app": ["lib"], "pkg1": ["pkg2"], "pkg2": ["pkg1"]}
+        with self.assertRaises(CircularDependencyError) as cm:
+            resolve_parallel(dependencies, jobs=2, min_packages=0)
+        self.assertEqual(cm.exception.cycle, ["pkg1", "pkg2", "pkg1"])
+
+    def test_small_input_is_serial(self):
+        dependencies = _clusters(4, 10)
+        with patch("dep_resolver.parallel.ProcessPoolExecutor") as executor:
+            resolved = resolve_parallel(dependencies, jobs=4)
+            resolve_parallel(dependencies, jobs=1, min_packages=0)
+            resolve_parallel({"app": ["lib"], "lib": []}, jobs=4, min_packages=0)
+            with patch("dep_resolver.parallel.available_cpus", return_value=1):
+                resolve_parallel(dependencies, jobs=4, min_packages=0)
+                resolve_parallel(dependencies, min_packages=0)
+        executor.assert_not_called()
+        self.assertEqual(resolved, resolve_dependencies(dependencies))
+
+    def test_pickle_circular_dependency_error(self):
+        error = pickle.loads(pickle.dumps(CircularDependencyError(["a", "b", "a"])))
+        self.assertEqual(error.cycle, ["a", "b", "a"])
+        self.assertEqual(str(error), "Circular dependency detected: a -> b -> a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,12 @@
+import io
 import unittest
-from dep_resolver.printer import print_dependency_graph
+from dep_resolver.graph import CompactGraph
+from dep_resolver.resolver import CircularDependencyError, resolve_dependencies
+from dep_resolver.printer import (
+    iter_tree_chunks,
+    print_dependency_graph,
+    print_install_order,
+)
 from io import StringIO
 from unittest.mock import patch
 
@@ -24,6 +31,94 @@ class TestPrinter(unittest.TestCase):
             print_dependency_graph(resolved_graph)
             self.assertEqual(fake_out.getvalue(), expected_output)
 
+    def test_print_compact_graph(self):
+        graph = CompactGraph.from_mapping(
+            {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": []}
+        )
+        expected_output = (
+            "- pkg1\n"
+            "  - pkg2\n"
+            "    - pkg3\n"
+            "  - pkg3\n"
+            "- pkg2\n"
+            "  - pkg3\n"
+            "- pkg3\n"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            print_dependency_graph(graph, indent_size=2)
+            self.assertEqual(fake_out.getvalue(), expected_output)
+
+    def test_print_compact_graph_cycle(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"], "pkg2": ["pkg1"]})
+        with patch("sys.stdout", new=StringIO()):
+            with self.assertRaises(CircularDependencyError):
+                print_dependency_graph(graph)
+
+    def test_print_deduped(self):
+        dependencies = {
+            "pkg1": ["pkg2", "pkg3"],
+            "pkg2": ["pkg3"],
+            "pkg3": ["pkg4"],
+        }
+        expected_output = (
+            "- pkg1\n"
+            "    - pkg2\n"
+            "        - pkg3\n"
+            "            - pkg4\n"
+            "    - pkg3 (deduped)\n"
+            "- pkg2 (deduped)\n"
+            "- pkg3 (deduped)\n"
+        )
+        for graph in (
+            resolve_dependencies(dependencies),
+            CompactGraph.from_mapping(dependencies),
+        ):
+            with patch("sys.stdout", new=StringIO()) as fake_out:
+                print_dependency_graph(graph, dedupe=True)
+                self.assertEqual(fake_out.getvalue(), expected_output)
+
+    def test_print_deduped_compact_graph_cycle(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"], "pkg2": ["pkg1"]})
+        with patch("sys.stdout", new=StringIO()):
+            with self.assertRaises(CircularDependencyError):
+                print_dependency_graph(graph, dedupe=True)
+
+    def test_print_long_chain(self):
+        length = 100_000
+        dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)}
+        compact = CompactGraph.from_mapping(dependencies)
+        for graph in (
+            {"pkg0": resolve_dependencies(dependencies)["pkg0"]},
+            CompactGraph(compact.names, [0], compact.offsets, compact.targets),
+        ):
+            stream = StringIO()
+            print_dependency_graph(graph, indent_size=0, stream=stream)
+            lines = stream.getvalue().splitlines()
+            self.assertEqual(lines[length], f"- pkg{length}")
+
+    def test_chunks_contain_complete_lines(self):
+        resolved_graph = {f"pkg{i}": {"dep": {}} for i in range(10)}
+        chunks = list(iter_tree_chunks(resolved_graph, chunk_lines=3))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.endswith("\n"))
+        self.assertEqual("".join(chunks).count("\n"), 20)
+
+    def test_print_to_binary_stream(self):
+        stream = io.BytesIO()
+        print_dependency_graph({"pkg\u00e9": {"pkg2": {}}}, stream=stream)
+        self.assertEqual(stream.getvalue(), "- pkg\u00e9\n    - pkg2\n".encode())
+
+    def test_print_install_order(self):
+        expected_output = (
+            "Layer 1 (width 2): pkg3, pkg4\n"
+            "Layer 2 (width 1): pkg1\n"
+            "Critical path length: 2\n"
+        )
+        with patch("sys.stdout", new=StringIO()) as fake_out:
+            print_install_order([["pkg3", "pkg4"], ["pkg1"]])
+            self.assertEqual(fake_out.getvalue(), expected_output)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import unittest
+from dep_resolver.graph import CompactGraph
+from dep_resolver.query import QueryIndex
+
+
+class TestQueryIndex(unittest.TestCase):
+    def setUp(self):
+        self.dependencies = {
+            "app": ["web", "db"],
+            "web": ["core"],
+            "db": ["driver", "core"],
+            "cli": ["core"],
+            "core": [],
+        }
+        self.index = QueryIndex.build(self.dependencies)
+
+    def test_closure(self):
+        self.assertEqual(self.index.closure("app"), ["web", "db", "core", "driver"])
+        self.assertEqual(self.index.closure("db"), ["core", "driver"])
+        self.assertEqual(self.index.closure("core"), [])
+
+    def test_dependents(self):
+        self.assertEqual(self.index.dependents("core"), ["app", "web", "db", "cli"])
+        self.assertEqual(self.index.dependents("driver"), ["app", "db"])
+        self.assertEqual(self.index.dependents("app"), [])
+
+    def test_depends_on(self):
+        self.assertTrue(self.index.depends_on("app", "driver"))
+        self.assertTrue(self.index.depends_on("cli", "core"))
+        self.assertFalse(self.index.depends_on("cli", "db"))
+        self.assertFalse(self.index.depends_on("core", "app"))
+        self.assertFalse(self.index.depends_on("app", "app"))
+
+    def test_unknown_package(self):
+        with self.assertRaises(KeyError):
+            self.index.closure("unknown")
+        with self.assertRaises(KeyError):
+            self.index.depends_on("app", "unknown")
+
+    def test_why(self):
+        self.assertEqual(
+            self.index.why("core"), [["app", "web", "core"], ["cli", "core"]]
+        )
+        self.assertEqual(self.index.why("driver"), [["app", "db", "driver"]])
+        self.assertEqual(self.index.why("cli"), [["cli"]])
+
+    def test_why_from_roots(self):
+        self.assertEqual(
+            self.index.why("core", roots=["db", "cli", "db"]),
+            [["db", "core"], ["cli", "core"]],
+        )
+        self.assertEqual(self.index.why("driver", roots=["web"]), [])
+
+    def test_cycles(self):
+        index = QueryIndex.build(
+            {
+                "app": ["pkg1"],
+                "pkg1": ["pkg2"],
+                "pkg2": ["pkg1", "lib"],
+                "self": ["self"],
+            }
+        )
+        self.assertTrue(index.depends_on("pkg1", "pkg1"))
+        self.assertTrue(index.depends_on("self", "self"))
+        self.assertEqual(index.closure("pkg2"), ["pkg1", "pkg2", "lib"])
+        self.assertEqual(index.dependents("pkg1"), ["app", "pkg1", "pkg2"])
+        self.assertEqual(index.dependents("lib"), ["app", "pkg1", "pkg2"])
+        self.assertEqual(index.why("lib"), [["app", "pkg1", "pkg2", "lib"]])
+        self.assertEqual(index.why("self"), [["self"]])
+
+    def test_why_cycle_roots(self):
+        with open("tests/test_data/circular.json") as file:
+            index = QueryIndex.build(json.load(file))
+        self.assertEqual(index.why("pkg1"), [["pkg1"]])
+        self.assertEqual(index.why("pkg2"), [["pkg1", "pkg2"]])
+        index = QueryIndex.build(
+            {"pkg2": ["pkg1", "lib"], "pkg1": ["pkg2"], "cli": ["lib"], "lib": []}
+        )
+        self.assertEqual(index.why("lib"), [["pkg2", "lib"], ["cli", "lib"]])
+
+    def test_compact_graph(self):
+        index = QueryIndex.build(CompactGraph.from_mapping(self.dependencies))
+        self.assertEqual(index.closure("app"), self.index.closure("app"))
+
+    def test_matches_traversal(self):
+        dependencies = {
+            f"pkg{i}": [f"pkg{j}" for j in range(i + 1, 60) if (i * j) % 7 == 1]
+            for i in range(60)
+        }
+        index = QueryIndex.build(dependencies)
+        for pkg in dependencies:
+            seen = set()
+            stack = list(dependencies[pkg])
+            while stack:
+                dep = stack.pop()
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.extend(dependencies[dep])
+            self.assertEqual(set(index.closure(pkg)), seen)
+            for dep in seen:
+                self.assertIn(pkg, index.dependents(dep))
+
+    def test_long_chain(self):
+        length = 10_000
+        index = QueryIndex.build({f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)})
+        self.assertTrue(index.depends_on("pkg0", f"pkg{length}"))
+        self.assertEqual(len(index.closure("pkg0")), length)
+        self.assertEqual(len(index.dependents(f"pkg{length}")), length)
+        self.assertEqual(len(index.why(f"pkg{length}")[0]), length + 1)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.pickle")
+            self.index.save(path)
+            loaded = QueryIndex.load(path)
+        self.assertEqual(loaded.closure("app"), self.index.closure("app"))
+        self.assertEqual(loaded.dependents("core"), self.index.dependents("core"))
+        self.assertEqual(loaded.why("driver"), self.index.why("driver"))
+        self.assertEqual(loaded.graph.to_mapping(), self.dependencies)
+
+
+if __name__ == "__main__":
+    unittest.main()
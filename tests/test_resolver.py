@@ -1,5 +1,11 @@
 import unittest
-from dep_resolver.resolver import resolve_dependencies
+from dep_resolver.graph import CompactGraph
+from dep_resolver.resolver import (
+    CircularDependencyError,
+    resolve_dependencies,
+    resolve_package,
+)
+from dep_resolver.stats import Stats
 
 
 class TestDependencyResolver(unittest.TestCase):
@@ -14,9 +20,27 @@ class TestDependencyResolver(unittest.TestCase):
         result = resolve_dependencies(dependencies)
         self.assertEqual(result, expected_output)
 
+    def test_resolve_compact_graph(self):
+        dependencies = {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg4": ["pkg2"]}
+        graph = CompactGraph.from_mapping(dependencies)
+        self.assertEqual(
+            resolve_dependencies(graph), resolve_dependencies(dependencies)
+        )
+
+    def test_resolve_package(self):
+        graph = CompactGraph.from_mapping({"pkg1": ["pkg2"], "pkg2": ["pkg3"]})
+        memo = [None] * len(graph)
+        on_path = bytearray(len(graph))
+        pkg2 = graph.id_of("pkg2")
+        self.assertEqual(resolve_package(pkg2, graph, memo, on_path), {"pkg3": {}})
+        self.assertIs(memo[pkg2]["pkg3"], memo[graph.id_of("pkg3")])
+        self.assertEqual(on_path, bytearray(len(graph)))
+        pkg1 = graph.id_of("pkg1")
+        self.assertIs(resolve_package(pkg1, graph, memo, on_path)["pkg2"], memo[pkg2])
+
     def test_circular_dependency(self):
         dependencies = {"pkg1": ["pkg2"], "pkg2": ["pkg1"]}
-        with self.assertRaises(RecursionError):
+        with self.assertRaises(CircularDependencyError):
             resolve_dependencies(dependencies)
 
     def test_missing_dependency(self):
@@ -36,7 +60,7 @@ class TestDependencyResolver(unittest.TestCase):
 
     def test_self_dependency(self):
         dependencies = {"pkg1": ["pkg1"]}
-        with self.assertRaises(RecursionError):
+        with self.assertRaises(CircularDependencyError):
             resolve_dependencies(dependencies)
 
     def test_nonexistent_dependency(self):
@@ -56,14 +80,136 @@ class TestDependencyResolver(unittest.TestCase):
 
     def test_recursion_error_handling(self):
         dependencies = {"pkg1": ["pkg2"], "pkg2": ["pkg3"], "pkg3": ["pkg1"]}
-        with self.assertRaises(RecursionError):
+        with self.assertRaises(CircularDependencyError):
             resolve_dependencies(dependencies)
 
+    def test_shared_subtrees_are_resolved_once(self):
+        dependencies = {"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": ["pkg4"]}
+        result = resolve_dependencies(dependencies)
+        self.assertIs(result["pkg1"]["pkg3"], result["pkg3"])
+        self.assertIs(result["pkg1"]["pkg2"]["pkg3"], result["pkg3"])
+        self.assertIs(result["pkg2"], result["pkg1"]["pkg2"])
+
+    def test_deep_diamonds(self):
+        # Every level doubles the number of root-to-leaf paths.
+        depth = 64
+        dependencies = {}
+        for i in range(depth):
+            dependencies[f"top{i}"] = [f"left{i}", f"right{i}"]
+            dependencies[f"left{i}"] = [f"top{i + 1}"]
+            dependencies[f"right{i}"] = [f"top{i + 1}"]
+        result = resolve_dependencies(dependencies)
+        node = result["top0"]
+        for i in range(1, depth + 1):
+            node = node[f"left{i - 1}"][f"top{i}"]
+        self.assertEqual(node, {})
+        self.assertIs(result["top0"]["left0"]["top1"], result["top0"]["right0"]["top1"])
+
+    def test_cycle_path_is_reported(self):
+        dependencies = {"pkg1": ["pkg2"], "pkg2": ["pkg3"], "pkg3": ["pkg2"]}
+        with self.assertRaises(CircularDependencyError) as cm:
+            resolve_dependencies(dependencies)
+        self.assertEqual(cm.exception.cycle, ["pkg2", "pkg3", "pkg2"])
+        self.assertIn("pkg2 -> pkg3 -> pkg2", str(cm.exception))
+
+    def test_long_chain(self):
+        length = 100_000
+        dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(length)}
+        result = resolve_dependencies(dependencies)
+        node = result["pkg0"]
+        for i in range(1, length + 1):
+            node = node[f"pkg{i}"]
+        self.assertEqual(node, {})
+
+    def test_long_cycle(self):
+        length = 100_000
+        dependencies = {f"pkg{i}": [f"pkg{(i + 1) % length}"] for i in range(length)}
+        with self.assertRaises(CircularDependencyError) as cm:
+            resolve_dependencies(dependencies)
+        self.assertEqual(len(cm.exception.cycle), length + 1)
+
     def test_already_visited_package(self):
         dependencies = {"pkg1": ["pkg1"]}  # Self-dependency
-        with self.assertRaises(RecursionError):
+        with self.assertRaises(CircularDependencyError):
             resolve_dependencies(dependencies)
 
+    def test_stats(self):
+        dependencies = {"app": ["web", "db"], "web": ["core"], "db": ["core"]}
+        stats = Stats()
+        resolve_dependencies(dependencies, stats=stats)
+        self.assertEqual(stats.nodes_expanded, 4)
+        self.assertEqual(stats.edges_traversed, 4)
+        # db -> core inside the tree, then the top-level web and db.
+        self.assertEqual(stats.memo_hits, 3)
+        self.assertEqual(stats.max_depth, 3)
+
+    def test_roots(self):
+        dependencies = {
+            "app": ["web"],
+            "web": ["core"],
+            "cli": ["core"],
+            "bad": ["bad"],
+        }
+        stats = Stats()
+        result = resolve_dependencies(dependencies, roots=["web", "core"], stats=stats)
+        self.assertEqual(result, {"web": {"core": {}}, "core": {}})
+        self.assertEqual(stats.nodes_expanded, 2)
+        with self.assertRaises(KeyError):
+            resolve_dependencies(dependencies, roots=["unknown"])
+
+    def test_roots_collapse_cycles(self):
+        dependencies = {"app": ["pkg1"], "pkg1": ["pkg2"], "pkg2": ["pkg1", "lib"]}
+        result = resolve_dependencies(
+            dependencies, collapse_cycles=True, roots=["pkg2", "pkg1"]
+        )
+        self.assertEqual(result, {"<cycle: pkg1, pkg2>": {"lib": {}}})
+
+    def test_max_depth(self):
+        dependencies = {"a": ["b", "c"], "b": ["c"], "c": ["d"], "d": ["e"]}
+        self.assertEqual(
+            resolve_dependencies(dependencies, max_depth=0),
+            {"a": {}, "b": {}, "c": {}, "d": {}},
+        )
+        self.assertEqual(
+            resolve_dependencies(dependencies, max_depth=2),
+            {
+                "a": {"b": {"c": {}}, "c": {"d": {}}},
+                "b": {"c": {"d": {}}},
+                "c": {"d": {"e": {}}},
+                "d": {"e": {}},
+            },
+        )
+        self.assertEqual(
+            resolve_dependencies(dependencies, max_depth=10),
+            resolve_dependencies(dependencies),
+        )
+        with self.assertRaises(ValueError):
+            resolve_dependencies(dependencies, max_depth=-1)
+
+    def test_max_depth_prunes_traversal(self):
+        dependencies = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(100_000)}
+        dependencies["pkg100000"] = ["pkg0"]
+        stats = Stats()
+        result = resolve_dependencies(
+            dependencies, roots=["pkg0"], max_depth=2, stats=stats
+        )
+        self.assertEqual(result, {"pkg0": {"pkg1": {"pkg2": {}}}})
+        self.assertEqual(stats.nodes_expanded, 3)
+        with self.assertRaises(CircularDependencyError):
+            resolve_dependencies({"a": ["b"], "b": ["a"]}, max_depth=5)
+
+    def test_debug_logging(self):
+        with self.assertLogs("dep_resolver.resolver", "DEBUG") as cm:
+            resolve_dependencies({"pkg1": ["pkg2"]})
+        self.assertEqual(
+            cm.output,
+            [
+                "INFO:dep_resolver.resolver:Resolving dependencies for package: pkg1",
+                "DEBUG:dep_resolver.resolver:Visiting package: pkg1",
+                "DEBUG:dep_resolver.resolver:Visiting package: pkg2",
+            ],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+from dep_resolver.client import Client, ClientError
+from dep_resolver.server import (
+    CIRCULAR_DEPENDENCY,
+    INTERNAL_ERROR,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    MANIFEST_ERROR,
+    METHOD_NOT_FOUND,
+    PACKAGE_NOT_FOUND,
+    PARSE_ERROR,
+    TOO_MANY_NODES,
+    ResolverService,
+    serve_unix,
+)
+
+
+class TestResolverService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.json_file = Path(self.tmp.name) / "dependencies.json"
+        self._write({"pkg1": ["pkg2", "pkg3"], "pkg2": ["pkg3"], "pkg3": []})
+        self.service = ResolverService(self.json_file)
+
+    def _write(self, dependencies, mtime=None):
+        self.json_file.write_text(json.dumps(dependencies))
+        if mtime is not None:
+            os.utime(self.json_file, ns=(mtime, mtime))
+
+    def _call(self, method, params=None, request_id=1):
+        request = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            request["params"] = params
+        return self.service.handle(json.dumps(request))
+
+    def test_resolve(self):
+        response = self._call("resolve", {"roots": ["pkg2"]})
+        self.assertEqual(
+            response, {"jsonrpc": "2.0", "id": 1, "result": "- pkg2\n    - pkg3\n"}
+        )
+        result = self._call("resolve", {"format": "json", "max_depth": 0})["result"]
+        self.assertEqual(json.loads(result), {"pkg1": {}, "pkg2": {}, "pkg3": {}})
+        result = self._call("resolve", {"format": "ndjson"})["result"]
+        self.assertEqual(len(result.splitlines()), 4)
+
+    def test_queries(self):
+        self.assertEqual(self._call("order")["result"], [["pkg3"], ["pkg2"], ["pkg1"]])
+        self.assertEqual(self._call("why", ["pkg3"])["result"], [["pkg1", "pkg3"]])
+        rdeps = self._call("rdeps", {"package": "pkg3"})["result"]
+        self.assertEqual(rdeps, ["pkg1", "pkg2"])
+        closure = self._call("closure", {"package": "pkg1"})["result"]
+        self.assertEqual(closure, ["pkg2", "pkg3"])
+        self.assertEqual(
+            self._call("estimate")["result"],
+            {
+                "nodes": "7",
+                "lines": "7",
+                "roots": {"pkg1": "4", "pkg2": "2", "pkg3": "1"},
+            },
+        )
+
+    def test_errors(self):
+        cases = [
+            (self.service.handle("not json"), PARSE_ERROR),
+            (self._call("unknown"), METHOD_NOT_FOUND),
+            (self._call("why", {"pkg": "pkg1"}), INVALID_PARAMS),
+            (self._call("resolve", {"format": "yaml"}), INVALID_PARAMS),
+            (self._call("resolve", ["pkg1"]), INVALID_PARAMS),
+            (self._call("resolve", {"dedupe": True, "max_depth": 1}), INVALID_PARAMS),
+            (self._call("resolve", {"max_depth": "1"}), INVALID_PARAMS),
+            (self._call("resolve", {"indent_size": -1}), INVALID_PARAMS),
+            (self._call("resolve", {"roots": "pkg1"}), INVALID_PARAMS),
+            (self._call("estimate", {"format": "dot"}), INVALID_PARAMS),
+            (self._call("closure", [["pkg1"]]), INVALID_PARAMS),
+            (self._call("why", {"package": "missing"}), PACKAGE_NOT_FOUND),
+            (self._call("resolve", {"roots": ["missing"]}), PACKAGE_NOT_FOUND),
+            (self._call("resolve", {"max_nodes": 6}), TOO_MANY_NODES),
+        ]
+        for response, code in cases:
+            with self.subTest(code=code):
+                self.assertEqual(response["error"]["code"], code)
+
+    def test_unexpected_errors(self):
+        for error in (KeyError("pkg1"), ValueError("bug"), TypeError("bug")):
+            with self.subTest(error=error):
+                with patch.object(self.service, "_query_index", side_effect=error):
+                    with self.assertLogs("dep_resolver.server", level="ERROR"):
+                        response = self._call("why", {"package": "pkg1"})
+                self.assertEqual(response["error"]["code"], INTERNAL_ERROR)
+
+    def test_notification(self):
+        self.assertIsNone(self.service.handle('{"jsonrpc": "2.0", "method": "order"}'))
+
+    def test_reload(self):
+        self.assertIn("pkg1", self._call("resolve")["result"])
+        self._write({"app": ["lib"]}, mtime=1)
+        self.assertEqual(self._call("resolve")["result"], "- app\n    - lib\n")
+        self.assertFalse(self.service.refresh())
+
+        self._write({"pkg1": ["pkg2"], "pkg2": ["pkg1"]}, mtime=2)
+        error = self._call("order")["error"]
+        self.assertEqual(error["code"], CIRCULAR_DEPENDENCY)
+        self.assertEqual(error["data"], {"cycle": ["pkg1", "pkg2", "pkg1"]})
+
+        self.json_file.write_text('{"pkg1": ')
+        os.utime(self.json_file, ns=(3, 3))
+        error = self._call("resolve")["error"]
+        self.assertEqual(error["code"], MANIFEST_ERROR)
+        self.assertIn("Invalid JSON file", error["message"])
+
+        self.json_file.unlink()
+        self.assertEqual(self._call("resolve")["error"]["code"], MANIFEST_ERROR)
+
+    def test_resolved_graphs_are_cached(self):
+        self._call("resolve", {"roots": ["pkg1"]})
+        with patch("dep_resolver.server.resolve_dependencies") as resolve:
+            result = self._call("resolve", {"roots": ["pkg1"], "format": "json"})
+        resolve.assert_not_called()
+        self.assertIn('"pkg1"', result["result"])
+
+
+class TestUnixServer(unittest.TestCase):
+    def _serve(self, service, use_socket, during=None):
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = os.path.join(tmp, "resolver.sock")
+
+            async def main():
+                ready = asyncio.Event()
+                stop = asyncio.Event()
+                server = asyncio.ensure_future(
+                    serve_unix(service, socket_path, ready=ready, stop=stop)
+                )
+                await asyncio.wait_for(ready.wait(), 5)
+                try:
+                    loop = asyncio.get_running_loop()
+                    client = loop.run_in_executor(None, use_socket, socket_path)
+                    if during is not None:
+                        await during()
+                    return await client
+                finally:
+                    stop.set()
+                    await server
+
+            result = asyncio.run(main())
+            self.assertFalse(os.path.exists(socket_path))
+        return result
+
+    def test_client_round_trip(self):
+        def use_client(socket_path):
+            with Client(socket_path, timeout=5) as client:
+                tree = client.call("resolve", roots=["pkg2"])
+                order = client.call("order")
+                with self.assertRaises(ClientError) as cm:
+                    client.call("why", package="missing")
+            return tree, order, cm.exception.code
+
+        service = ResolverService("tests/test_data/dependencies.json")
+        tree, order, code = self._serve(service, use_client)
+        self.assertEqual(tree, "- pkg2\n    - pkg3\n")
+        self.assertEqual(order, [["pkg3"], ["pkg2"], ["pkg1"]])
+        self.assertEqual(code, PACKAGE_NOT_FOUND)
+
+    @patch("dep_resolver.server.MAX_REQUEST_SIZE", 64)
+    def test_oversized_request(self):
+        def send_lines(socket_path):
+            with socket.socket(socket.AF_UNIX) as sock:
+                sock.settimeout(5)
+                sock.connect(socket_path)
+                # Longer than the limit both with and without the newline
+                # arriving in the same read.
+                sock.sendall(b"x" * 1000 + b"\n")
+                sock.sendall(b"y" * 100)
+                sock.sendall(b"y" * 100 + b"\n")
+                sock.sendall(b'{"jsonrpc": "2.0", "id": 1, "method": "order"}\n')
+                with sock.makefile("rb") as f:
+                    return [json.loads(f.readline()) for _ in range(3)]
+
+        service = ResolverService("tests/test_data/dependencies.json")
+        first, second, third = self._serve(service, send_lines)
+        self.assertEqual(first["error"]["code"], INVALID_REQUEST)
+        self.assertEqual(second["error"]["code"], INVALID_REQUEST)
+        self.assertEqual(third["result"], [["pkg3"], ["pkg2"], ["pkg1"]])
+
+    def test_requests_do_not_block_the_event_loop(self):
+        service = ResolverService("tests/test_data/dependencies.json")
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_order():
+            started.set()
+            # Only set by the event loop, which must keep running meanwhile.
+            return release.wait(5)
+
+        service.methods["order"] = slow_order
+
+        def call_order(socket_path):
+            with Client(socket_path, timeout=10) as client:
+                return client.call("order")
+
+        async def release_when_started():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, started.wait, 5)
+            release.set()
+
+        self.assertTrue(self._serve(service, call_order, release_when_started))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from dep_resolver.graph import CompactGraph
+from dep_resolver.order import install_order
+from dep_resolver.parallel import resolve_parallel
+from dep_resolver.query import QueryIndex
+from dep_resolver.resolver import resolve_dependencies
+from dep_resolver.snapshot import (
+    FORMAT_VERSION,
+    MAGIC,
+    compile_snapshot,
+    load_snapshot,
+    snapshot_path,
+    write_snapshot,
+)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.dependencies = {
+            "app": ["web", "db"],
+            "web": ["core"],
+            "db": ["driver", "core"],
+            "core": [],
+        }
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.json_file = Path(self.tmp.name) / "dependencies.json"
+        self._write(self.dependencies)
+
+    def _write(self, dependencies):
+        self.json_file.write_text(json.dumps(dependencies))
+
+    def test_round_trip(self):
+        path = compile_snapshot(self.json_file)
+        self.assertEqual(path, snapshot_path(self.json_file))
+        snapshot = load_snapshot(path)
+        graph = snapshot.graph
+        expected = CompactGraph.from_mapping(self.dependencies)
+        self.assertEqual(list(graph.names), list(expected.names))
+        self.assertEqual(list(graph.keys), list(expected.keys))
+        self.assertEqual(list(graph.offsets), list(expected.offsets))
+        self.assertEqual(list(graph.targets), list(expected.targets))
+        self.assertEqual(
+            resolve_dependencies(graph), resolve_dependencies(self.dependencies)
+        )
+
+    def test_name_lookup(self):
+        graph = load_snapshot(compile_snapshot(self.json_file)).graph
+        for node, name in enumerate(graph.names):
+            self.assertEqual(graph.id_of(name), node)
+        self.assertIn("driver", graph)
+        self.assertNotIn("unknown", graph)
+        self.assertIsNone(graph.get_id("unknown"))
+        with self.assertRaises(KeyError):
+            graph.id_of("unknown")
+
+    def test_install_order(self):
+        snapshot = load_snapshot(compile_snapshot(self.json_file))
+        self.assertEqual(snapshot.install_order(), install_order(self.dependencies))
+
+    def test_no_order(self):
+        snapshot = load_snapshot(compile_snapshot(self.json_file, order=False))
+        self.assertIsNone(snapshot.install_order())
+
+    def test_circular_skips_order(self):
+        self._write({"pkg1": ["pkg2"], "pkg2": ["pkg1"]})
+        snapshot = load_snapshot(compile_snapshot(self.json_file))
+        self.assertIsNone(snapshot.install_order())
+        self.assertEqual(len(snapshot.graph), 2)
+
+    def test_empty_manifest(self):
+        self._write({})
+        snapshot = load_snapshot(compile_snapshot(self.json_file))
+        self.assertEqual(len(snapshot.graph), 0)
+        self.assertEqual(snapshot.install_order(), [])
+
+    def test_unusual_names(self):
+        dependencies = {"a\0b": ["ünïcode"], "": ["a\0b"]}
+        self._write(dependencies)
+        graph = load_snapshot(compile_snapshot(self.json_file)).graph
+        self.assertEqual(
+            resolve_dependencies(graph), resolve_dependencies(dependencies)
+        )
+
+    def test_matches(self):
+        snapshot = load_snapshot(compile_snapshot(self.json_file))
+        self.assertTrue(snapshot.matches(self.json_file))
+        self._write({"app": []})
+        self.assertFalse(snapshot.matches(self.json_file))
+
+    def test_output_path(self):
+        output = Path(self.tmp.name) / "graph.bin"
+        self.assertEqual(compile_snapshot(self.json_file, output), str(output))
+        self.assertTrue(output.is_file())
+        self.assertFalse(os.path.exists(snapshot_path(self.json_file)))
+
+    def test_invalid_file(self):
+        path = Path(self.tmp.name) / "invalid.snap"
+        for data in (b"", b"not a snapshot", b"\0" * 256):
+            path.write_bytes(data)
+            with self.assertRaises(ValueError):
+                load_snapshot(path)
+
+    def test_unsupported_version(self):
+        path = Path(compile_snapshot(self.json_file))
+        data = bytearray(path.read_bytes())
+        data[len(MAGIC)] = FORMAT_VERSION + 1
+        path.write_bytes(bytes(data))
+        with self.assertRaises(ValueError) as cm:
+            load_snapshot(path)
+        self.assertIn("version", str(cm.exception))
+
+    def test_truncated_file(self):
+        path = Path(compile_snapshot(self.json_file))
+        path.write_bytes(path.read_bytes()[:-1])
+        with self.assertRaises(ValueError):
+            load_snapshot(path)
+
+    def test_corrupt_sections(self):
+        path = Path(self.tmp.name) / "corrupt.snap"
+        names = ["pkg1", "pkg2"]
+        cases = [
+            (([0, 5], [0, 1, 1], [1]), "package id out of range in keys"),
+            (([0], [0, 1, 1], [2]), "package id out of range in targets"),
+            (([0], [0, 2, 1], [1]), "invalid offsets"),
+            (([0], [0, 1, 2], [1]), "invalid offsets"),
+            (([0], [0, 1], []), "number of names does not match the offsets"),
+        ]
+        for (keys, offsets, targets), message in cases:
+            with self.subTest(message=message):
+                graph = CompactGraph(names, keys, offsets, targets)
+                write_snapshot(graph, path, bytes(32))
+                with self.assertRaises(ValueError) as cm:
+                    load_snapshot(path)
+                self.assertIn(f"Corrupt snapshot file {path}", str(cm.exception))
+                self.assertIn(message, str(cm.exception))
+
+    def test_mapped_graph_can_be_pickled(self):
+        dependencies = dict(self.dependencies, cli=["argparse"])
+        self._write(dependencies)
+        graph = load_snapshot(compile_snapshot(self.json_file)).graph
+        index = QueryIndex.build(graph)
+        path = Path(self.tmp.name) / "index.pickle"
+        index.save(path)
+        self.assertEqual(QueryIndex.load(path).closure("app"), index.closure("app"))
+        self.assertEqual(
+            resolve_parallel(graph, jobs=2, min_packages=0),
+            resolve_dependencies(dependencies),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
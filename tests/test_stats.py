@@ -0,0 +1,49 @@
+import json
+import unittest
+from unittest.mock import patch
+from dep_resolver.stats import Stats, peak_rss
+
+
+class TestStats(unittest.TestCase):
+    def test_phases(self):
+        stats = Stats()
+        with patch("dep_resolver.stats.time.perf_counter", side_effect=[1, 3, 5, 6]):
+            with stats.phase("load"):
+                pass
+            with stats.phase("load"):
+                pass
+        with self.assertRaises(ValueError):
+            with stats.phase("print"):
+                raise ValueError
+        self.assertEqual(list(stats.phases), ["load", "print"])
+        self.assertEqual(stats.phases["load"], 3)
+
+    def test_as_dict(self):
+        stats = Stats()
+        stats.nodes_expanded = 5
+        data = stats.as_dict()
+        self.assertEqual(data["nodes_expanded"], 5)
+        self.assertEqual(data["phases"], {})
+        json.dumps(data)
+
+    def test_format(self):
+        stats = Stats()
+        stats.packages = 2
+        stats.phases = {"load": 0.5, "resolve": 0.25}
+        with patch("dep_resolver.stats.peak_rss", return_value=3 * 1024 * 1024):
+            text = stats.format()
+        self.assertIn("Packages: 2\n", text)
+        self.assertIn("Peak RSS: 3.0 MiB\n", text)
+        self.assertIn("Time in load:    0.5000 s\n", text)
+        self.assertIn("Time in resolve: 0.2500 s\n", text)
+        with patch("dep_resolver.stats.peak_rss", return_value=None):
+            self.assertIn("Peak RSS: unknown\n", stats.format())
+
+    def test_peak_rss(self):
+        rss = peak_rss()
+        if rss is not None:
+            self.assertGreater(rss, 1024 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import pickle
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+from dep_resolver.loader import ManifestDecodeError
+from dep_resolver.versions import (
+    Requirement,
+    VersionConflictError,
+    is_versioned_manifest,
+    load_versioned_manifest,
+    parse_version,
+    parse_versioned_manifest,
+    solve,
+)
+
+MANIFEST = {
+    "app": {"1.0": ["lib>=2", "util"], "2.0": ["lib>=3", "util<2"]},
+    "lib": {"2.0": ["util>=2"], "3.0": ["util>=2"], "3.1": ["util>=3"]},
+    "util": {"1.0": [], "2.0": [], "3.0": []},
+}
+
+
+class TestParsing(unittest.TestCase):
+    def test_parse_version(self):
+        self.assertEqual(parse_version("1.2.0"), (1, 2))
+        self.assertEqual(parse_version("1.10"), (1, 10))
+        self.assertGreater(parse_version("1.10"), parse_version("1.9"))
+        self.assertEqual(parse_version("0"), (0,))
+        for text in ("", "1.", "v1", "1.2-beta"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_version(text)
+
+    def test_parse_requirement(self):
+        requirement = Requirement.parse("dep >= 2, <3.1")
+        self.assertEqual(requirement.name, "dep")
+        self.assertEqual(requirement.constraints, ((">=", (2,)), ("<", (3, 1))))
+        self.assertEqual(str(requirement), "dep >= 2, <3.1")
+        self.assertTrue(requirement.allows((2,)))
+        self.assertTrue(requirement.allows((3, 0, 9)))
+        self.assertFalse(requirement.allows((3, 1)))
+        self.assertFalse(requirement.allows((1, 9)))
+        self.assertEqual(Requirement.parse("dep").constraints, ())
+        self.assertFalse(Requirement.parse("dep!=1.0").allows((1,)))
+        for text in ("", ">=1", "dep>=", "dep=>1", "dep>=1,", "a,b"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                Requirement.parse(text)
+
+    def test_releases_newest_first(self):
+        releases = parse_versioned_manifest({"pkg": {"1.9": [], "1.10": [], "1": []}})
+        self.assertEqual([r.version for r in releases["pkg"]], ["1.10", "1.9", "1"])
+
+    def test_invalid_manifest(self):
+        for manifest in (
+            {"pkg": ["dep"]},
+            {"pkg": {"1.0": "dep"}},
+            {"pkg": {"1.0": [], "1.0.0": []}},
+            {"pkg": {"latest": []}},
+        ):
+            with self.subTest(manifest=manifest), self.assertRaises(ValueError):
+                parse_versioned_manifest(manifest)
+
+    def test_load(self):
+        text = json.dumps(MANIFEST, indent=2)
+        for chunk_size in (1, 4096):
+            manifest = load_versioned_manifest(StringIO(text), chunk_size=chunk_size)
+            self.assertEqual(manifest, parse_versioned_manifest(MANIFEST))
+        with self.assertRaises(ManifestDecodeError) as cm:
+            load_versioned_manifest(StringIO('{"pkg": {"1.0": ["dep>="]}}'))
+        self.assertEqual((cm.exception.lineno, cm.exception.colno), (1, 9))
+
+    def test_is_versioned_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            for manifest, expected in ((MANIFEST, True), ({"pkg": []}, False)):
+                path.write_text(json.dumps(manifest))
+                self.assertEqual(is_versioned_manifest(path), expected)
+            path.write_text("{}")
+            self.assertFalse(is_versioned_manifest(path))
+
+
+class TestSolve(unittest.TestCase):
+    def test_newest_compatible_versions(self):
+        solution = solve(MANIFEST, ["app"])
+        self.assertEqual(solution.versions, {"app": "1.0", "lib": "3.1", "util": "3.0"})
+        self.assertEqual(solution.roots, ["app==1.0"])
+        self.assertEqual(
+            solution.dependencies,
+            {
+                "app==1.0": ["lib==3.1", "util==3.0"],
+                "lib==3.1": ["util==3.0"],
+                "util==3.0": [],
+            },
+        )
+        graph = solution.graph()
+        self.assertEqual([graph.names[key] for key in graph.keys], ["app==1.0"])
+
+    def test_default_roots(self):
+        solution = solve(MANIFEST)
+        self.assertEqual(solution.roots, ["app==1.0", "lib==3.1", "util==3.0"])
+
+    def test_root_constraints(self):
+        solution = solve(MANIFEST, ["lib<3.1", "util<3"])
+        self.assertEqual(solution.versions, {"lib": "3.0", "util": "2.0"})
+
+    def test_backjumping_learns_conflicts(self):
+        # Every version of "a" except the oldest needs a "c" that "b" rules
+        # out, but the conflict only shows after deciding the unrelated "x".
+        manifest = {
+            "root": {"1": ["a", "b", "x"]},
+            "a": {str(v): [f"c=={v}"] for v in range(1, 6)},
+            "b": {"1": ["c<2"]},
+            "c": {str(v): [] for v in range(1, 6)},
+            "x": {str(v): [] for v in range(1, 4)},
+        }
+        solution = solve(manifest, ["root"])
+        self.assertEqual(solution.versions["a"], "1")
+        self.assertEqual(solution.versions["x"], "3")
+        self.assertEqual(solution.versions["c"], "1")
+
+    def test_conflict(self):
+        with self.assertRaises(VersionConflictError) as cm:
+            solve(MANIFEST, ["app>=2"])
+        self.assertEqual(cm.exception.package, "app")
+        self.assertIn("app 2.0 leads to a conflict", str(cm.exception))
+        error = pickle.loads(pickle.dumps(cm.exception))
+        self.assertEqual(str(error), str(cm.exception))
+
+    def test_root_conflicts(self):
+        with self.assertRaises(VersionConflictError) as cm:
+            solve(MANIFEST, ["util>=4"])
+        self.assertIn("root requires util>=4", str(cm.exception))
+        with self.assertRaises(VersionConflictError) as cm:
+            solve(MANIFEST, ["missing"])
+        self.assertIn("root requires missing, which is not defined", str(cm.exception))
+
+    def test_selected_version_conflict(self):
+        manifest = {
+            "a": {"1": ["b==1", "c"]},
+            "b": {"1": [], "2": []},
+            "c": {"1": ["b>=2"]},
+        }
+        with self.assertRaises(VersionConflictError) as cm:
+            solve(manifest, ["a"])
+        self.assertIn("a 1 leads to a conflict on b", str(cm.exception))
+        with self.assertRaises(VersionConflictError) as cm:
+            solve({"a": {"1": ["a>=2"]}})
+        self.assertIn("a 1 requires a>=2, but a 1 is selected", str(cm.exception))
+
+    def test_self_dependency(self):
+        manifest = {"a": {"2": ["a<2"], "1": ["a==1"]}}
+        self.assertEqual(solve(manifest).versions, {"a": "1"})
+
+    def test_long_chain(self):
+        manifest = {
+            f"pkg{i}": {"1": [f"pkg{i + 1}"], "2": [f"pkg{i + 1}>=2"]}
+            for i in range(5_000)
+        }
+        manifest["pkg5000"] = {"1": []}
+        solution = solve(manifest, ["pkg0"])
+        self.assertEqual(len(solution.versions), 5_001)
+        self.assertEqual(solution.versions["pkg0"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()